@@ -0,0 +1,647 @@
+"""
+Headless conversions, sharing the engine with the GUI.
+
+Never imports PySide6, so it runs on render nodes and from cron without a display server.
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Set
+
+from constant import Option
+from constant.File import Audio, File, Image, Video
+from engine import Benchmark, Calibrate, Scheduler, Watch
+from engine.Batch import Batch
+from engine.Calibrate import Calibration, Trial, pareto, recommend
+from engine.Cache import get_output_cache
+from engine.Job import Job, JobState, create_jobs
+from engine.Journal import Journal, get_journal
+from engine.Process import FFmpegError
+from engine.Progress import JsonLinesSink, Metrics, Usage, parse_seconds
+from engine.Scheduler import Limits
+from engine.Spec import ConversionSpec, Rendition
+from engine.Stream import StreamError, open_stream
+from engine.Watch import Watcher
+from util.system import get_metrics_log_path, get_output_cache_limit, walk_files
+
+# Seconds between progress lines on a terminal
+PROGRESS_INTERVAL = 1.0
+
+# Seconds between scans of watched folders, unchanged directories cost a stat each
+WATCH_INTERVAL = 2.0
+
+
+def _expand(patterns: List[str]) -> Iterator[str]:
+    """Expands globs (`**` included) and walks directories, in a stable order"""
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            yield from walk_files(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            yield from walk_files([pattern])
+
+
+def _target(value: str) -> File:
+    target = File.from_str(value)
+    if target is None:
+        raise argparse.ArgumentTypeError(f"unsupported format: {value}")
+    return target
+
+
+def _resolution(value: str) -> Option.ResolutionItem:
+    item = Option.find_resolution(value)
+    if item is None:
+        names = ", ".join(f"{item.width}x{item.height}" for item in Option.RESOLUTIONS if item.width)
+        raise argparse.ArgumentTypeError(f"unknown resolution {value!r}, use 'no change' or one of {names}")
+    return item
+
+
+def _rendition(value: str) -> Rendition:
+    size, _, frame_rate = value.partition("@")
+    width, _, height = size.partition("x")
+    try:
+        rendition = Rendition(width=int(width), height=int(height), frame_rate=int(frame_rate) if frame_rate else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rendition {value!r}, use WxH or WxH@FPS, e.g. 1280x720@30")
+    if rendition.width <= 0 or rendition.height <= 0:
+        raise argparse.ArgumentTypeError(f"invalid rendition {value!r}, the size must be positive")
+    return rendition
+
+
+def _time(value: str) -> float:
+    try:
+        return parse_seconds(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time {value!r}, use [[HH:]MM:]SS[.mmm]")
+
+
+def _positive(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"invalid number {value!r}, it must be at least 1")
+    return number
+
+
+def _choice(choices: List[int | str]):
+    def parse(value: str) -> int | str:
+        for choice in choices:
+            if value == str(choice):
+                return choice
+        raise argparse.ArgumentTypeError(f"invalid value {value!r}, use one of {', '.join(map(str, choices))}")
+    return parse
+
+
+def _add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    formats = ", ".join(file.value.lower() for file in [*Image, *Video, *Audio])
+    parser.add_argument("-t", "--to", required=True, type=_target, metavar="FORMAT",
+                        help=f"target format: {formats}")
+    parser.add_argument("--crf", type=int, default=Option.DEFAULT_CRF,
+                        choices=range(Option.CRF_MIN, Option.CRF_MAX + 1), metavar="0-51",
+                        help=f"constant quality, lower is better (default: {Option.DEFAULT_CRF})")
+    parser.add_argument("--resolution", type=_resolution, default=Option.RESOLUTIONS[0], metavar="WxH",
+                        help="output size, e.g. 1280x720 (default: no change)")
+    parser.add_argument("--fit", choices=list(Option.FITS), default=Option.DEFAULT_FIT,
+                        help=f"how other aspect ratios are brought to --resolution, sources are never upscaled "
+                             f"except when stretching (default: {Option.DEFAULT_FIT})")
+    parser.add_argument("--scaler", choices=list(Option.SCALERS), default=Option.DEFAULT_SCALER,
+                        help=f"scaling algorithm, fastest first (default: {Option.DEFAULT_SCALER})")
+    parser.add_argument("--preset", choices=Option.PRESETS, default=Option.DEFAULT_PRESET,
+                        help=f"encoding speed/efficiency trade-off (default: {Option.DEFAULT_PRESET})")
+    parser.add_argument("--fps", type=_choice(Option.FRAME_RATES), default="auto",
+                        help="frame rate (default: auto)")
+    parser.add_argument("--chunks", type=_choice(Option.CHUNKS), default="off",
+                        help="encode long videos as parallel keyframe-aligned chunks (default: off)")
+    parser.add_argument("--size", type=float, default=0.0, metavar="MB",
+                        help="fit each video under this many megabytes with a two-pass encode, instead of --crf")
+    parser.add_argument("--start", type=_time, default=0.0, metavar="TIME",
+                        help="trim, start at this time ([[HH:]MM:]SS[.mmm])")
+    parser.add_argument("--end", type=_time, default=0.0, metavar="TIME",
+                        help="trim, stop at this time; copied videos are only re-encoded around the cuts")
+    parser.add_argument("--strip-exif", action="store_true",
+                        help="drop the EXIF metadata of converted JPEG and PNG images")
+    parser.add_argument("--rendition", dest="renditions", action="append", type=_rendition, default=[],
+                        metavar="WxH[@FPS]",
+                        help="also write the video at this size, e.g. 1280x720 as NAME-1280x720.mp4; repeatable. "
+                             "The source is decoded once for all outputs")
+    parser.add_argument("--audio", choices=list(Option.AUDIO_MODES), default=Option.DEFAULT_AUDIO,
+                        help="copy the audio when the container accepts it (auto), always re-encode it (encode) "
+                             "or drop it (none); the video is left untouched either way (default: auto)")
+    parser.add_argument("--audio-bitrate", type=_choice(Option.AUDIO_BITRATES), default="auto", metavar="KBPS",
+                        help="bitrate of re-encoded audio, sources already below it are copied (default: auto)")
+    parser.add_argument("--sample-rate", type=_choice(Option.SAMPLE_RATES), default="auto", metavar="HZ",
+                        help="resample the audio (default: auto)")
+    parser.add_argument("--channels", type=_choice(list(Option.CHANNELS)), default="auto",
+                        help="downmix the audio, e.g. 1 for mono (default: auto)")
+
+
+def _add_worker_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("-j", "--jobs", type=_positive, default=None,
+                        help="conversions to run at once (default: planned from the core count)")
+    parser.add_argument("--threads", type=_positive, default=None,
+                        help="ffmpeg -threads per conversion (default: planned from the core count)")
+    parser.add_argument("--pin", action="store_true",
+                        help="give each running conversion cores of its own, its threads then never compete "
+                             "with the other conversions (Linux)")
+    parser.add_argument("--nice", type=int, default=0, choices=range(0, 20), metavar="0-19",
+                        help="lower the priority of the ffmpeg processes, e.g. to keep working meanwhile")
+    parser.add_argument("--idle-io", action="store_true",
+                        help="only let the ffmpeg processes use the disk when nothing else does (Linux)")
+
+
+def _spec(parser: argparse.ArgumentParser, args: argparse.Namespace) -> ConversionSpec:
+    if args.end and args.end <= args.start:
+        parser.error("--end must come after --start")
+    if args.renditions and args.size:
+        parser.error("--size cannot be combined with --rendition")
+    if args.audio == "none" and isinstance(args.to, Audio):
+        parser.error(f"--audio none leaves nothing to write to {args.to.value.lower()}")
+    return ConversionSpec(
+        target=args.to,
+        crf=args.crf,
+        width=args.resolution.width,
+        height=args.resolution.height,
+        fit=args.fit,
+        scaler=args.scaler,
+        preset=args.preset,
+        frame_rate=args.fps,
+        chunks=args.chunks,
+        target_size=args.size,
+        exif=not args.strip_exif,
+        start=args.start,
+        end=args.end,
+        audio=args.audio,
+        audio_bitrate=args.audio_bitrate,
+        sample_rate=args.sample_rate,
+        channels=args.channels,
+        renditions=tuple(args.renditions),
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mediarage",
+        description="Convert media files without the GUI.",
+        epilog="Run 'mediarage calibrate --help' to find a preset and CRF for a kind of input, "
+               "'mediarage cache --help' to inspect or purge the cache of converted outputs, "
+               "'mediarage resume' to finish the conversions of an interrupted run, "
+               "'mediarage watch --help' to convert files as they are copied into a folder, "
+               "and 'mediarage bench --help' to time the conversion paths.",
+    )
+    parser.add_argument("inputs", nargs="+", metavar="INPUT",
+                        help="files, directories (searched recursively) or glob patterns such as 'clips/**/*.mov', "
+                             "or - to convert standard input to standard output, e.g. 'curl URL | mediarage - --to mp4'")
+    _add_spec_arguments(parser)
+    _add_worker_arguments(parser)
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="directory for the outputs (default: next to each input)")
+    parser.add_argument("--metrics-log", default=get_metrics_log_path(),
+                        help="append JSON-lines progress metrics to this file")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always convert, without reusing or keeping outputs in the output cache")
+    parser.add_argument("--full-hash", action="store_true",
+                        help="identify inputs by hashing all of their content instead of sampled blocks")
+    parser.add_argument("--redo", action="store_true",
+                        help="convert inputs again even when an identical conversion already finished")
+    return parser
+
+
+def build_resume_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mediarage resume",
+        description="Resume the conversions an interrupted run left unfinished, after Ctrl+C or a crash.",
+    )
+    parser.add_argument("--discard", action="store_true",
+                        help="forget the unfinished conversions and delete their partial outputs instead")
+    _add_worker_arguments(parser)
+    parser.add_argument("--metrics-log", default=get_metrics_log_path(),
+                        help="append JSON-lines progress metrics to this file")
+    return parser
+
+
+def build_watch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mediarage watch",
+        description="Convert every file copied into the watched folders, once it stopped growing. "
+                    "Files are converted once, also across restarts; runs until interrupted.",
+    )
+    parser.add_argument("folders", nargs="+", metavar="FOLDER", help="folders to watch, with their subfolders")
+    _add_spec_arguments(parser)
+    _add_worker_arguments(parser)
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="directory for the outputs (default: next to each input)")
+    parser.add_argument("--settle", type=float, default=Watch.SETTLE_SECONDS, metavar="SECONDS",
+                        help=f"wait until a file kept its size this long (default: {Watch.SETTLE_SECONDS:g})")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, metavar="SECONDS",
+                        help=f"seconds between scans of the folders (default: {WATCH_INTERVAL:g})")
+    parser.add_argument("--metrics-log", default=get_metrics_log_path(),
+                        help="append JSON-lines progress metrics to this file")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always convert, without reusing or keeping outputs in the output cache")
+    return parser
+
+
+def build_bench_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mediarage bench",
+        description="Time the conversion paths on synthetic sources generated locally with ffmpeg, "
+                    "offline and on the CPU. Compare against an earlier report to catch regressions.",
+    )
+    parser.add_argument("--sizes", nargs="+", default=Benchmark.SIZES, metavar="WxH",
+                        help=f"source sizes (default: {' '.join(Benchmark.SIZES)})")
+    parser.add_argument("--duration", type=float, default=Benchmark.DURATION, metavar="SECONDS",
+                        help=f"length of the synthetic videos (default: {Benchmark.DURATION:g})")
+    parser.add_argument("--kinds", nargs="+", choices=Benchmark.KINDS, default=Benchmark.KINDS,
+                        help="convert paths to time (default: all)")
+    parser.add_argument("--repeats", type=int, default=Benchmark.REPEATS,
+                        help=f"runs per case, the median is reported (default: {Benchmark.REPEATS})")
+    parser.add_argument("--tree-files", type=int, default=Benchmark.TREE_FILES, metavar="N",
+                        help=f"files in the classification tree (default: {Benchmark.TREE_FILES})")
+    parser.add_argument("-o", "--output", default=None, metavar="FILE", help="write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, metavar="FILE",
+                        help="earlier JSON report, exit with 1 when a case got slower than its threshold")
+    parser.add_argument("--threshold", type=float, default=None, metavar="FRACTION",
+                        help=f"allowed slowdown, e.g. 0.1 for 10%% (default: the baseline's, else "
+                             f"{Benchmark.THRESHOLD:g})")
+    return parser
+
+
+def bench_main(argv: List[str]) -> int:
+    args = build_bench_parser().parse_args(argv)
+    baseline = None
+    try:
+        if args.baseline:
+            baseline = Benchmark.load(args.baseline)
+        print("Preparing the synthetic sources...", file=sys.stderr)
+        cases = Benchmark.cases(args.sizes, args.duration, args.kinds, args.tree_files)
+
+        def on_result(result: Benchmark.Result) -> None:
+            rate = f"{result.rate:.1f} files/s" if result.kind == "classify" else f"{result.rate:.2f}x realtime"
+            print(f"{result.seconds:8.3f}s  {result.name} ({result.path}, {rate if result.rate else '-'})", flush=True)
+
+        results = Benchmark.run(cases, args.repeats, on_result)
+    except Benchmark.BenchmarkError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    settings = {"sizes": args.sizes, "duration": args.duration, "repeats": args.repeats, "tree_files": args.tree_files}
+    report = Benchmark.report(results, settings)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if baseline is None:
+        return 0
+    regressions = Benchmark.regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def build_cache_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mediarage cache",
+        description="Inspect or purge the cache of converted outputs.",
+    )
+    commands = parser.add_subparsers(dest="command")
+    info = commands.add_parser("info", help="show the cache size (default)")
+    info.add_argument("--list", action="store_true", help="also list the stored outputs")
+    purge = commands.add_parser("purge", help="remove stored outputs")
+    purge.add_argument("--unused-for", type=float, default=None, metavar="DAYS",
+                       help="only remove outputs not reused for this many days")
+    return parser
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def cache_main(argv: List[str]) -> int:
+    args = build_cache_parser().parse_args(argv)
+    cache = get_output_cache()
+    if cache is None:
+        print("The output cache is disabled or not writable", file=sys.stderr)
+        return 1
+
+    if args.command == "purge":
+        unused_for = args.unused_for * 86400 if args.unused_for is not None else None
+        print(f"Freed {_megabytes(cache.purge(unused_for))}")
+        return 0
+
+    count, size = cache.usage()
+    print(f"{cache.directory}: {count} output(s), {_megabytes(size)} of {_megabytes(get_output_cache_limit())}")
+    if getattr(args, "list", False):
+        for entry in cache.entries():
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.accessed))
+            print(f"  {_megabytes(entry.size):>10}  {entry.hits:>4} hit(s)  {used}  {entry.source}")
+    return 0
+
+
+def build_calibrate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mediarage calibrate",
+        description="Encode short excerpts of INPUT with several presets and CRFs, and recommend the "
+                    "fastest setting meeting a bitrate or quality target. Results are kept per machine.",
+    )
+    parser.add_argument("input", metavar="INPUT")
+    parser.add_argument("--presets", nargs="+", choices=Option.PRESETS, default=Calibrate.PRESETS)
+    parser.add_argument("--crfs", nargs="+", type=int, default=Calibrate.CRFS, metavar="CRF")
+    parser.add_argument("--metric", choices=Calibrate.METRICS, default="ssim",
+                        help="quality measured against the excerpts, vmaf needs ffmpeg built with libvmaf "
+                             "(default: ssim)")
+    parser.add_argument("--max-bitrate", type=float, default=None, metavar="KBPS",
+                        help="recommend settings producing at most this bitrate")
+    parser.add_argument("--min-quality", type=float, default=None, metavar="SCORE",
+                        help="recommend settings scoring at least this, e.g. 0.98 SSIM, 40 PSNR or 93 VMAF")
+    parser.add_argument("--refresh", action="store_true", help="calibrate again instead of reusing the profile")
+    return parser
+
+
+def calibrate_main(argv: List[str]) -> int:
+    parser = build_calibrate_parser()
+    args = parser.parse_args(argv)
+    if args.metric not in Calibrate.available_metrics():
+        parser.error(f"--metric {args.metric} needs ffmpeg built with lib{args.metric}, use ssim or psnr instead")
+    calibration = Calibration(args.input, args.presets, args.crfs, args.metric)
+
+    def on_trial(trial: Trial) -> None:
+        print(f"  {trial.preset} crf {trial.crf}: {trial.fps:.1f} fps, {trial.bitrate:.0f} kbit/s", file=sys.stderr)
+
+    try:
+        trials = calibration.run(on_trial, refresh=args.refresh)
+    except KeyboardInterrupt:
+        calibration.cancel()
+        return 130
+    except Exception as e:
+        print(f"Calibration failed: {e}", file=sys.stderr)
+        return 1
+
+    best = recommend(trials, args.max_bitrate, args.min_quality)
+    metric = args.metric if args.metric != "none" else "quality"
+    print(f"{'preset':<10} {'crf':>4} {'fps':>8} {'kbit/s':>9} {metric:>8}")
+    for trial in pareto(trials):
+        quality = f"{trial.quality:.4g}" if trial.quality is not None else "-"
+        mark = "  <- recommended" if trial == best else ""
+        print(f"{trial.preset:<10} {trial.crf:>4} {trial.fps:>8.1f} {trial.bitrate:>9.0f} {quality:>8}{mark}")
+    if best is None:
+        print("No setting meets the targets", file=sys.stderr)
+        return 1
+    print(f"--preset {best.preset} --crf {best.crf}")
+    return 0
+
+
+def resume_main(argv: List[str]) -> int:
+    args = build_resume_parser().parse_args(argv)
+    journal = get_journal()
+    if journal is None:
+        print("The job journal cannot be opened", file=sys.stderr)
+        return 1
+    jobs = journal.unfinished()
+    if not jobs:
+        print("Nothing to resume", file=sys.stderr)
+        return 0
+    if args.discard:
+        journal.discard(jobs)
+        print(f"Discarded {len(jobs)} unfinished conversion(s)")
+        return 0
+    print(f"Resuming {len(jobs)} unfinished conversion(s)", file=sys.stderr)
+    return _run_batch(jobs, args, journal)
+
+
+def watch_main(argv: List[str]) -> int:
+    parser = build_watch_parser()
+    args = parser.parse_args(argv)
+    spec = _spec(parser, args)
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"not a folder: {folder}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    try:
+        watcher = Watcher(args.folders, spec, args.output_dir, settle=args.settle)
+    except (OSError, sqlite3.Error) as e:
+        print(f"The watch index cannot be opened: {e}", file=sys.stderr)
+        return 1
+    journal = get_journal()
+    sink = JsonLinesSink(args.metrics_log) if args.metrics_log else None
+    # Files keep coming, plan for a full queue
+    schedule = Scheduler.plan(Scheduler.get_cpu_count(), threads=args.threads)
+    batch = Batch([], concurrency=args.jobs or schedule.concurrency, threads=schedule.threads, sink=sink,
+                  journal=journal, pin=args.pin, nice=args.nice, idle_io=args.idle_io)
+    reserved: Set[str] = set()
+
+    def on_finished(job: Job) -> None:
+        print(_outcome(job), flush=True)
+
+    if journal is not None:
+        # Conversions of the watched folders cut short by a crash or Ctrl+C
+        roots = tuple(os.path.join(root, "") for root in watcher.roots)
+        resumed = [job for job in journal.unfinished() if job.spec == spec and job.input.startswith(roots)
+                   and (not args.output_dir or os.path.dirname(job.output) == os.path.abspath(args.output_dir))]
+        if resumed:
+            print(f"Resuming {len(resumed)} interrupted conversion(s)", file=sys.stderr)
+            for job in resumed:
+                job.cache = not args.no_cache
+                reserved.add(job.output)
+            batch.submit(resumed, on_finished=on_finished)
+
+    print(f"Watching {', '.join(watcher.roots)} for files to convert to {spec.target.value}, "
+          f"press Ctrl+C to stop", file=sys.stderr)
+    try:
+        while True:
+            watcher.scan()
+            settled = watcher.settled()
+            if settled:
+                paths = [path for path in settled
+                         if journal is None or journal.completed(path, spec, args.output_dir) is None]
+                jobs = create_jobs(paths, spec, reserved=reserved, output_dir=args.output_dir,
+                                   cache=not args.no_cache)
+                batch.submit(jobs, on_finished=on_finished)
+                watcher.handled(settled, {job.input for job in jobs})
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        # Converting and waiting files are left to the journal, the next watch resumes them
+        print("Stopping, unfinished conversions are resumed by the next watch...", file=sys.stderr)
+        batch.interrupt()
+        batch.shutdown()
+        return 130
+    finally:
+        watcher.close()
+        if sink is not None:
+            sink.close()
+
+
+def _outcome(job: Job) -> str:
+    detail = " (cached)" if job.cached else f" ({job.plan.name})" if job.plan else ""
+    if job.state == JobState.FAILED:
+        detail += f": {job.error.splitlines()[-1] if job.error else 'failed'}"
+    elif job.state == JobState.DONE and job.usage.processes:
+        cores = f" on {len(job.limits.cores)} pinned cores" if job.limits.cores else ""
+        detail += f" [{job.usage.summary(job.metrics.elapsed if job.metrics else 0.0)}{cores}]"
+    outputs = ", ".join([job.output, *(rendition.output for rendition in job.renditions)])
+    return f"{job.state.value} {job.input} -> {outputs}{detail}"
+
+
+def _run_batch(jobs: List[Job], args: argparse.Namespace, journal: Journal | None) -> int:
+    sink = JsonLinesSink(args.metrics_log) if args.metrics_log else None
+    batch = Batch(jobs, concurrency=args.jobs, threads=args.threads, sink=sink, journal=journal,
+                  pin=args.pin, nice=args.nice, idle_io=args.idle_io)
+    done = 0
+    lock = threading.Lock()
+    last_progress: Dict[int, float] = {}
+    interactive = sys.stderr.isatty()
+
+    def on_progress(job: Job, metrics: Metrics) -> None:
+        now = time.monotonic()
+        if not interactive or now - last_progress.get(job.id, 0) < PROGRESS_INTERVAL:
+            return
+        last_progress[job.id] = now
+        print(f"  {os.path.basename(job.input)}: {metrics.summary()}", file=sys.stderr)
+        for rendition in job.renditions:
+            if rendition.metrics is not None:
+                print(f"    {os.path.basename(rendition.output)}: {_megabytes(rendition.metrics.total_size)}, "
+                      f"{rendition.metrics.bitrate:.0f} kbit/s", file=sys.stderr)
+
+    def on_finished(job: Job) -> None:
+        nonlocal done
+        with lock:
+            done += 1
+            print(f"[{done}/{len(jobs)}] {_outcome(job)}", flush=True)
+
+    runner = threading.Thread(target=batch.run, kwargs={"on_progress": on_progress, "on_finished": on_finished})
+    runner.start()
+    try:
+        while runner.is_alive():
+            runner.join(0.2)
+    except KeyboardInterrupt:
+        # Left pending in the journal with their completed chunks, like after a crash
+        print("Stopping, run 'mediarage resume' to finish the unfinished conversions...", file=sys.stderr)
+        batch.interrupt()
+        runner.join()
+        return 130
+    finally:
+        if sink is not None:
+            sink.close()
+
+    return 0 if all(job.state == JobState.DONE for job in jobs) else 1
+
+
+def _stream(parser: argparse.ArgumentParser, args: argparse.Namespace, spec: ConversionSpec) -> int:
+    """Converts standard input to standard output, status and progress go to standard error"""
+    if args.inputs != ["-"]:
+        parser.error("- converts standard input and cannot be combined with other inputs")
+    if sys.stdout.isatty():
+        parser.error("- writes the output to standard output, redirect or pipe it")
+
+    usage = Usage()
+    try:
+        process = open_stream(spec, sys.stdin.buffer, sys.stdout.buffer,
+                              threads=args.threads or Scheduler.plan(1).threads,
+                              limits=Limits(nice=args.nice, idle_io=args.idle_io), usage=usage)
+    except StreamError as e:
+        parser.error(str(e))
+    print(f"Streaming to {spec.target.value}{f' ({process.plan.name})' if process.plan else ''}", file=sys.stderr)
+
+    started = time.monotonic()
+    last_progress = 0.0
+    interactive = sys.stderr.isatty()
+
+    def on_progress(block: Dict[str, str]) -> None:
+        nonlocal last_progress
+        now = time.monotonic()
+        if not interactive or now - last_progress < PROGRESS_INTERVAL:
+            return
+        last_progress = now
+        metrics = Metrics.from_block(block, elapsed=now - started)
+        print(f"  {_megabytes(metrics.total_size)} · {metrics.summary()}", file=sys.stderr)
+
+    try:
+        process.run(on_progress)
+    except KeyboardInterrupt:
+        process.cancel()
+        return 130
+    except BrokenPipeError:
+        # The reader went away, e.g. `| head`. Python's own flush of stdout at exit would fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        print("Stopped, the output was closed", file=sys.stderr)
+        return 1
+    except (FFmpegError, OSError) as e:
+        print(f"Streaming failed: {e}", file=sys.stderr)
+        return 1
+    summary = usage.summary(time.monotonic() - started)
+    print(f"Done{f' [{summary}]' if summary else ''}", file=sys.stderr)
+    return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["cache"]:
+        return cache_main(argv[1:])
+    if argv[:1] == ["calibrate"]:
+        return calibrate_main(argv[1:])
+    if argv[:1] == ["resume"]:
+        return resume_main(argv[1:])
+    if argv[:1] == ["watch"]:
+        return watch_main(argv[1:])
+    if argv[:1] == ["bench"]:
+        return bench_main(argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    spec = _spec(parser, args)
+    target: File = spec.target
+    if "-" in args.inputs:
+        return _stream(parser, args, spec)
+    if args.full_hash and (cache := get_output_cache()) is not None:
+        cache.full_hash = True
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    inputs = list(dict.fromkeys(_expand(args.inputs)))
+    journal = get_journal()
+    resumed: List[Job] = []
+    if journal is not None and not args.redo:
+        # Re-running an interrupted batch skips what it finished and picks up what it left halfway
+        pending = [path for path in inputs if journal.completed(path, spec, args.output_dir) is None]
+        if len(pending) < len(inputs):
+            print(f"Skipping {len(inputs) - len(pending)} file(s) converted before, use --redo to convert them again",
+                  file=sys.stderr)
+        if not pending:
+            return 0
+        wanted = {os.path.abspath(path): path for path in pending}
+        output_dir = os.path.abspath(args.output_dir) if args.output_dir else None
+        for job in journal.unfinished():
+            if (job.spec == spec and job.input in wanted
+                    and (output_dir is None or os.path.dirname(job.output) == output_dir)):
+                job.cache = not args.no_cache
+                resumed.append(job)
+                del wanted[job.input]
+        inputs = list(wanted.values())
+
+    jobs = create_jobs(inputs, spec, reserved={job.output for job in resumed}, output_dir=args.output_dir,
+                       cache=not args.no_cache)
+    skipped = len(inputs) - len(jobs)
+    if resumed:
+        print(f"Resuming {len(resumed)} interrupted conversion(s)", file=sys.stderr)
+    jobs = resumed + jobs
+    if skipped:
+        print(f"Skipping {skipped} file(s) that cannot be converted to {target.value}", file=sys.stderr)
+    if not jobs:
+        print("Nothing to convert", file=sys.stderr)
+        return 1
+
+    return _run_batch(jobs, args, journal)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,53 @@
-import os.path
+from typing import TYPE_CHECKING, Callable, Iterable, List, cast
 
 from PySide6.QtCore import QUrl, QSize, Qt, Signal
-from PySide6.QtGui import QPixmap
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtMultimediaWidgets import QVideoWidget
+from PySide6.QtGui import QImage, QPixmap, QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QSizePolicy, QPushButton, QFileDialog
 
+from components.ui import Text
 from constant.File import File, Image, Video
-from util.system import get_home_directory
+from engine.Probe import MediaInfo, probe_cached
+from engine.Progress import format_seconds
+from util.system import get_home_directory, walk_files
+from util.ui import Task, load_scaled_image, run_in_background
+
+if TYPE_CHECKING:
+    from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
+    from PySide6.QtMultimediaWidgets import QVideoWidget
+
+_FILE_FILTER = "Media Files ({})".format(
+    " ".join(f"*.{file.value.lower()}" for file in [*Image, *Video])
+)
+
+
+def _load_strip(path: str, bounds: QSize) -> QImage:
+    from engine.Preview import thumbnail_strip
+    return load_scaled_image(thumbnail_strip(path), bounds)
 
 
 class FileInput(QWidget):
     MIN_VIEW_SIZE = QSize(680, 380)
     MIN_PLAYER_SIZE = QSize(480, 270)
 
-    # Videos
-    media: QMediaPlayer
-    audio: QAudioOutput
+    # Videos, the player is only created (and Qt Multimedia imported) once the user asks to play
+    media: "QMediaPlayer | None" = None
+    audio: "QAudioOutput | None" = None
+    video: "QVideoWidget | None" = None
+    playButton: QPushButton
 
-    # Images
+    # Images, and the thumbnail strips of videos
     image: QLabel
+    previewTask: Task | None = None
+    previewPath: str = ""
+
+    # Metadata
+    info: Text
+    infoTask: Task | None = None
 
     # Signals
-    onChange = Signal(object)
+    onChange = Signal(object)  # Previewed file path
+    onFilesChange = Signal(list)  # All selected file paths
+    onInfo = Signal(object)  # MediaInfo of the previewed file, None when it cannot be probed
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -31,79 +56,166 @@ class FileInput(QWidget):
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # type: ignore
         self.setAcceptDrops(True)
 
-        self.media = QMediaPlayer()
-        self.audio = QAudioOutput()
-        self.media.setAudioOutput(self.audio)
-
-        self.video = QVideoWidget()
-        self.media.setVideoOutput(self.video)
-        self.video.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)  # type: ignore
-        self.video.setFixedSize(self.MIN_PLAYER_SIZE)
-        self.video.hide()
-
         self.image = QLabel()
-        self.image.setScaledContents(True)
+        self.image.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.image.setMinimumSize(self.MIN_VIEW_SIZE)
         self.image.hide()
 
+        self.playButton = QPushButton("Play")
+        self.playButton.clicked.connect(self.play)
+        self.playButton.hide()
+
         self.button = QPushButton("Open a file")
         self.button.clicked.connect(self.handleClick)
-        self.label = QLabel("or\ndrag and drop a file here")
+        self.label = QLabel("or\ndrag and drop files here")
         self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
+        self.info = Text("", size=10, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.info.setStyleSheet("color: grey;")
+        self.info.hide()
+
         layout = QVBoxLayout()
         layout.setAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignHCenter)
         layout.setSpacing(16)
         layout.addWidget(self.button, alignment=Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.label, alignment=Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.image)
-        layout.addWidget(self.video)
+        layout.addWidget(self.playButton, alignment=Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.info, alignment=Qt.AlignmentFlag.AlignCenter)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
         self.setLayout(layout)
 
+    def play(self):
+        """Plays the original of the previewed video, the player is created on first use"""
+        if not self.previewPath:
+            return
+        if self.media is None:
+            from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
+            from PySide6.QtMultimediaWidgets import QVideoWidget
+
+            self.media = QMediaPlayer()
+            self.audio = QAudioOutput()
+            self.media.setAudioOutput(self.audio)
+            self.video = QVideoWidget()
+            self.media.setVideoOutput(self.video)
+            self.video.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)  # type: ignore
+            self.video.setFixedSize(self.MIN_PLAYER_SIZE)
+            layout = cast(QVBoxLayout, self.layout())
+            layout.insertWidget(layout.indexOf(self.image) + 1, self.video, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        self.image.hide()
+        self.playButton.hide()
+        self.media.setSource(QUrl.fromLocalFile(self.previewPath))
+        self.media.play()
+        self.video.show()
+
     def handleClick(self):
-        file_path, _ = QFileDialog.getOpenFileName(
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select File",
+            "Select Files",
             get_home_directory(),
-            "Video Files (*.mp4 *.mkv *.avi *.mov)",
+            _FILE_FILTER,
         )
-        if File.from_path(file_path) is None:
+        self._select(file_paths)
+
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event: QDropEvent):
+        self._select(url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile())
+        event.acceptProposedAction()
+
+    def _select(self, paths: Iterable[str]):
+        """Keeps the supported files, directories are expanded recursively"""
+        file_paths: List[str] = [path for path in walk_files(paths) if File.from_path(path, sniff=True) is not None]
+        if not file_paths:
             # TODO: Handle if file type is not supported
             return
 
-        self.onChange.emit(file_path if file_path else None)
+        self.onFilesChange.emit(file_paths)
+        self.onChange.emit(file_paths[0])
         self.button.hide()
         self.label.hide()
-        self._view(file_path)
+        self._view(file_paths[0])
+        self._probe(file_paths[0])
+
+    def _probe(self, url: str):
+        """Reads the metadata off the GUI thread, cached probes return almost immediately"""
+        self.info.hide()
+        task = run_in_background(
+            probe_cached, url,
+            onDone=lambda info: self._showInfo(task, info),
+            onFailed=lambda _: self._showInfo(task, None),
+        )
+        self.infoTask = task
 
-    def _view(self, url: str | None):
-        if not url:
-            self.video.hide()
-            self.image.hide()
-            self.image.setPixmap(QPixmap())
+    def _showInfo(self, task: Task, info: MediaInfo | None):
+        if task is not self.infoTask:
+            # A newer file was selected meanwhile
+            return
+        self.infoTask = None
+        self.onInfo.emit(info)
+        if info is None:
             return
 
-        _, filename = os.path.split(url)
-        _, ext = os.path.splitext(filename)
-        ext = ext.upper().strip(".")
-
-        file_type = File.from_str(ext)
-        if isinstance(file_type, Image):
+        details = []
+        if info.video is not None:
+            width, height = info.video.display_size
+            details.append(f"{width}x{height}")
+            details.append(info.video.codec)
+            if info.video.frame_rate:
+                details.append(f"{info.video.frame_rate:.3g} fps")
+        if info.audio is not None:
+            details.append(f"{info.audio.codec} {info.audio.channels}ch")
+        if info.duration:
+            details.append(format_seconds(info.duration))
+        self.info.setText(" · ".join(details))
+        self.info.show()
+
+    def _stop(self):
+        if self.media is not None:
             self.media.stop()
+            self.media.setSource(QUrl())
             self.video.hide()
 
-            pixmap = QPixmap(url)
-            self.image.setPixmap(pixmap)
-            self.image.show()
-        elif isinstance(file_type, Video):
-            self.image.hide()
-            self.image.setPixmap(QPixmap())
+    def _view(self, url: str | None):
+        self._stop()
+        self.previewPath = url or ""
+        self.previewTask = None
+        self.playButton.hide()
+        self.image.hide()
+        self.image.setPixmap(QPixmap())
+        if not url:
+            return
 
-            self.media.setSource(QUrl.fromLocalFile(url))
-            self.media.play()
-            self.video.show()
+        file_type = File.from_path(url, sniff=True)
+        if isinstance(file_type, Image):
+            self._preview(load_scaled_image, url, self.MIN_VIEW_SIZE)
+        elif isinstance(file_type, Video):
+            # A strip of frames instead of decoding the whole source, the original plays on request
+            self._preview(_load_strip, url, self.MIN_VIEW_SIZE)
+            self.playButton.show()
         else:
             # TODO: Add warning dialog
             pass
+
+    def _preview(self, load: Callable[[str, QSize], QImage], url: str, bounds: QSize):
+        """Decodes the preview image off the GUI thread, at display size"""
+        task = run_in_background(
+            load, url, bounds,
+            onDone=lambda image: self._showPreview(task, image),
+            onFailed=lambda _: self._showPreview(task, None),
+        )
+        self.previewTask = task
+
+    def _showPreview(self, task: Task, image: QImage | None):
+        if task is not self.previewTask:
+            # A newer file was selected meanwhile
+            return
+        self.previewTask = None
+        if image is None:
+            return
+        self.image.setPixmap(QPixmap.fromImage(image))
+        self.image.show()
@@ -0,0 +1,135 @@
+from typing import List
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QComboBox, QDialog, QDialogButtonBox, QDoubleSpinBox, QHBoxLayout, QTableWidget, QTableWidgetItem, QVBoxLayout,
+)
+
+from components.ui import Text
+from engine.Calibrate import Calibration, Trial, available_metrics, pareto, recommend
+from util.ui import Task, run_in_background
+
+
+class CalibrationDialog(QDialog):
+    """
+    Calibrates the encoder on excerpts of the input and lists the settings worth
+    picking, with the fastest one meeting the quality target selected.
+    """
+
+    # Defaults of the quality target per metric
+    TARGETS = {"ssim": 0.98, "psnr": 40.0, "vmaf": 93.0}
+    COLUMNS = ["Preset", "CRF", "fps", "kbit/s", "Quality"]
+
+    trials: List[Trial] = []
+    selected: Trial | None = None  # Picked trial once accepted
+
+    def __init__(self, input_file: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setWindowTitle("Calibrate Preset and CRF")
+        self.setMinimumWidth(480)
+
+        self.metric = QComboBox()
+        # vmaf needs ffmpeg built with libvmaf, it is added once the build is checked off the GUI thread
+        self.metric.addItems([metric for metric in self.TARGETS if metric != "vmaf"])
+        self.metricsTask: Task | None = run_in_background(available_metrics, onDone=self.__onMetrics)
+        self.metric.currentTextChanged.connect(self.__onMetricChanged)
+        self.target = QDoubleSpinBox()
+        self.target.setDecimals(3)
+        self.target.setRange(0, 100)
+        self.target.setValue(self.TARGETS["ssim"])
+        self.target.valueChanged.connect(lambda _: self.__showTrials())
+
+        targets = QHBoxLayout()
+        targets.addWidget(Text("Minimum"))
+        targets.addWidget(self.metric)
+        targets.addWidget(self.target)
+
+        self.status = Text("", size=10, alignment=Qt.AlignmentFlag.AlignLeft)
+        self.status.setStyleSheet("color: grey;")
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addLayout(targets)
+        layout.addWidget(self.status)
+        layout.addWidget(self.table)
+        layout.addWidget(self.buttons)
+        self.setLayout(layout)
+
+        self.input = input_file
+        self.calibration: Calibration | None = None
+        self.task: Task | None = None
+        self.__calibrate()
+
+    def accept(self):
+        row = self.table.currentRow()
+        front = pareto(self.trials)
+        self.selected = front[row] if 0 <= row < len(front) else None
+        super().accept()
+
+    def reject(self):
+        if self.calibration is not None:
+            self.calibration.cancel()
+        super().reject()
+
+    def __onMetrics(self, metrics: List[str]):
+        self.metricsTask = None
+        for metric in self.TARGETS:
+            if metric in metrics and self.metric.findText(metric) < 0:
+                self.metric.addItem(metric)
+
+    def __onMetricChanged(self, metric: str):
+        self.target.setValue(self.TARGETS[metric])
+        self.__calibrate()
+
+    def __calibrate(self):
+        if self.calibration is not None:
+            self.calibration.cancel()
+        self.trials = []
+        self.__showTrials()
+        self.buttons.button(QDialogButtonBox.StandardButton.Ok).setEnabled(False)
+        self.status.setText("Encoding excerpts with each setting, this takes a minute...")
+
+        calibration = Calibration(self.input, metric=self.metric.currentText())
+        task = run_in_background(
+            calibration.run,
+            onDone=lambda trials: self.__onCalibrated(task, trials),
+            onFailed=lambda e: self.__onFailed(task, e),
+        )
+        self.calibration = calibration
+        self.task = task
+
+    def __onCalibrated(self, task: Task, trials: List[Trial]):
+        if task is not self.task or self.calibration is None or self.calibration.cancelled:
+            return
+        self.trials = trials
+        self.status.setText("Settings no other setting beats on speed, size and quality at once")
+        self.buttons.button(QDialogButtonBox.StandardButton.Ok).setEnabled(bool(trials))
+        self.__showTrials()
+
+    def __onFailed(self, task: Task, error: Exception):
+        if task is not self.task:
+            return
+        self.status.setText(f"Calibration failed: {error}")
+
+    def __showTrials(self):
+        front = pareto(self.trials)
+        best = recommend(front, min_quality=self.target.value())
+        self.table.setRowCount(len(front))
+        for row, trial in enumerate(front):
+            quality = f"{trial.quality:.4g}" if trial.quality is not None else "-"
+            values = [trial.preset, str(trial.crf), f"{trial.fps:.1f}", f"{trial.bitrate:.0f}", quality]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+            if trial == best:
+                self.table.selectRow(row)
+        if best is None and front:
+            self.status.setText("No setting reaches the quality target, pick one yourself")
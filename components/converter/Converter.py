@@ -1,41 +1,103 @@
-from typing import cast, Dict, List, Type, Union
+from typing import TYPE_CHECKING, cast, Dict, List, Tuple, Type, Union
 from dataclasses import dataclass
-from unittest import case
 
 from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QWidget, QGridLayout, QPushButton, QSpacerItem, QSizePolicy, QVBoxLayout
+from PySide6.QtWidgets import (
+    QWidget, QFileDialog, QGridLayout, QHBoxLayout, QProgressBar, QPushButton, QSpacerItem, QSizePolicy, QVBoxLayout,
+)
 
 from components.ui import Text
-from constant.File import File, Video
+from constant.File import Audio, File, Image, Video
+from engine.Cache import get_output_cache
+from engine.Job import Job, JobState, create_jobs
+from engine.Probe import MediaInfo
+from engine.Process import FFmpegProcess
+from engine.Spec import ConversionSpec
 
-from .Option import CRF, Resolution, Preset, FrameRate, VideoForm
+from util.system import get_home_directory
+from util.ui import Task, run_in_background
+
+from .Option import (
+    CRF, Resolution, Fit, Scaler, Preset, FrameRate, Chunks, TargetSize, Colors, Dither, Metadata, Trim, Renditions,
+    AudioMode, AudioBitrate, SampleRate, Channels, VideoForm,
+)
+from .Queue import Queue
 from .Select import Select
 
+if TYPE_CHECKING:
+    from .FolderWatch import FolderWatch
+
 _spacer = QSpacerItem(0, 20, QSizePolicy.Minimum, QSizePolicy.Fixed)  # type: ignore
 
 
+def _cache_usage() -> Tuple[int, int] | None:
+    cache = get_output_cache()
+    return cache.usage() if cache is not None else None
+
+
 class Converter(QWidget):
     @dataclass
     class Form:
-        element: Union[Type[VideoForm] | QWidget]
+        element: Union[Type[VideoForm] | str]  # A string is a heading
         full: bool = False
 
-    # Constant
-    forms: Dict[Type[File], List[Form]] = {
+    # Constant, forms of a single target take precedence over those of its type.
+    # Only classes and headings, the widgets are built when a group is first shown
+    forms: Dict[Type[File] | File, List[Form]] = {
         Video: [
-            Form(element=Text("Video", size=16, alignment=Qt.AlignmentFlag.AlignLeft), full=True),
+            Form(element="Video", full=True),
             Form(element=CRF), Form(element=Resolution),
+            Form(element=Fit), Form(element=Scaler),
             Form(element=Preset), Form(element=FrameRate),
-        ]
+            Form(element=Chunks), Form(element=TargetSize),
+            Form(element=Trim), Form(element=Renditions),
+            Form(element="Audio", full=True),
+            Form(element=AudioMode), Form(element=AudioBitrate),
+            Form(element=SampleRate), Form(element=Channels),
+        ],
+        Image.GIF: [
+            Form(element="GIF", full=True),
+            Form(element=FrameRate), Form(element=Resolution),
+            Form(element=Fit), Form(element=Scaler),
+            Form(element=Colors), Form(element=Dither),
+            Form(element=TargetSize), Form(element=Trim),
+        ],
+        Image: [
+            Form(element="Image", full=True),
+            Form(element=Resolution), Form(element=Fit),
+            Form(element=Scaler), Form(element=Metadata),
+        ],
+        Audio: [
+            Form(element="Audio", full=True),
+            Form(element=AudioBitrate), Form(element=SampleRate),
+            Form(element=Channels), Form(element=Trim),
+        ],
     }
 
     # Components
     select: Select
     button: QPushButton
+    pauseButton: QPushButton
+    cancelButton: QPushButton
+    calibrateButton: QPushButton
+    watchButton: QPushButton
+    status: Text
+    progress: QProgressBar
+    metrics: Text
+    queue: Queue
+    cacheStatus: Text
+    clearCacheButton: QPushButton
+    interruptedStatus: Text
+    resumeButton: QPushButton
+    discardButton: QPushButton
 
     # State
-    input: str  # Input file path
-    output: str  # Output file path
+    input: str = ""  # Input file path
+    inputs: List[str] = []  # Input file paths, each becomes a job
+    output: str = ""  # Output file path of the latest job
+    sourceInfo: MediaInfo | None = None  # Probed metadata of `input`
+    spec: ConversionSpec | None = None  # Current settings, kept up to date by the forms
+    watch: "FolderWatch | None" = None  # Folder whose new files are converted with the settings it started with
     currRow: int = 0
     currColumn: int = 0
     MAX_COLUMN: int = 2
@@ -46,6 +108,7 @@ class Converter(QWidget):
         # Reading kwargs
         if "input" in kwargs:
             self.input = kwargs["input"]
+        self.formWidgets: Dict[Type[File] | File, List[QWidget]] = {}  # Built forms of each group
 
         # VBox to house the convert button
         self.vbox = QVBoxLayout()
@@ -60,25 +123,129 @@ class Converter(QWidget):
 
         # Select Component
         self.select = Select()
-        self.select.onSelected.connect(lambda _: self.__showForm())
+        self.select.onSelected.connect(self.__onSelected)
         self.__addToGrid(self.select, full=True)
         self.grid.addItem(_spacer)
 
-        # Convert Button
+        # Convert, Pause and Cancel Buttons
         self.button = QPushButton("Convert")
         self.button.hide()
         self.button.clicked.connect(self.convert)
-        self.vbox.addWidget(self.button, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.pauseButton = QPushButton("Pause")
+        self.pauseButton.hide()
+        self.pauseButton.setEnabled(FFmpegProcess.supports_pause())
+        self.pauseButton.clicked.connect(self.togglePause)
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.hide()
+        self.cancelButton.clicked.connect(self.cancel)
+        self.calibrateButton = QPushButton("Calibrate")
+        self.calibrateButton.setToolTip("Find the fastest preset and CRF reaching a quality target for this input")
+        self.calibrateButton.hide()
+        self.calibrateButton.clicked.connect(self.calibrate)
+        self.watchButton = QPushButton("Watch Folder")
+        self.watchButton.setToolTip("Convert every file copied into a folder with these settings")
+        self.watchButton.hide()
+        self.watchButton.clicked.connect(self.toggleWatch)
+
+        buttons = QHBoxLayout()
+        buttons.setSpacing(8)
+        buttons.addWidget(self.calibrateButton)
+        buttons.addWidget(self.button)
+        buttons.addWidget(self.watchButton)
+        buttons.addWidget(self.pauseButton)
+        buttons.addWidget(self.cancelButton)
+        self.vbox.addLayout(buttons)
+
+        self.status = Text("", size=10, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.status.setStyleSheet("color: grey;")
+        self.vbox.addWidget(self.status, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        # Overall progress, encode fps, realtime multiple and ETA
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 1000)
+        self.progress.hide()
+        self.vbox.addWidget(self.progress)
+        self.metrics = Text("", size=10, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.metrics.setStyleSheet("color: grey;")
+        self.metrics.hide()
+        self.vbox.addWidget(self.metrics, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        # Queue of conversion jobs
+        self.queue = Queue()
+        self.queue.hide()
+        self.queue.onChanged.connect(self.__onQueueChanged)
+        self.queue.onProgress.connect(self.__onQueueProgress)
+        self.vbox.addWidget(self.queue)
+
+        # Jobs an earlier run left unfinished, e.g. when the app or machine died
+        self.interrupted: List[Job] = []
+        self.interruptedStatus = Text("", size=10, alignment=Qt.AlignmentFlag.AlignLeft)
+        self.resumeButton = QPushButton("Resume")
+        self.resumeButton.clicked.connect(self.resumeInterrupted)
+        self.discardButton = QPushButton("Discard")
+        self.discardButton.clicked.connect(self.discardInterrupted)
+        interruptedRow = QHBoxLayout()
+        interruptedRow.addWidget(self.interruptedStatus)
+        interruptedRow.addWidget(self.resumeButton, alignment=Qt.AlignmentFlag.AlignRight)
+        interruptedRow.addWidget(self.discardButton)
+        self.vbox.addLayout(interruptedRow)
+        self.__updateInterrupted()
+
+        # Output cache usage, identical conversions are reused from it
+        self.cacheStatus = Text("", size=10, alignment=Qt.AlignmentFlag.AlignLeft)
+        self.cacheStatus.setStyleSheet("color: grey;")
+        self.clearCacheButton = QPushButton("Clear Cache")
+        self.clearCacheButton.clicked.connect(self.clearCache)
+        self.cacheTask: Task | None = None
+        self.cacheStatusTask: Task | None = None
+        cacheRow = QHBoxLayout()
+        cacheRow.addWidget(self.cacheStatus)
+        cacheRow.addWidget(self.clearCacheButton, alignment=Qt.AlignmentFlag.AlignRight)
+        self.vbox.addLayout(cacheRow)
+        self.__updateCacheStatus()
 
         self.setLayout(self.vbox)
 
+    def __onSelected(self, selected: Select.Selected):
+        if self.spec is None:
+            self.spec = ConversionSpec(target=selected.target)
+        else:
+            self.spec = self.spec.replace(target=selected.target)
+        self.calibrateButton.setVisible(isinstance(selected.target, Video))
+        self.__showForm()
+
     def __showForm(self):
-        for form in self.forms[type(self.select.target)]:
-            if isinstance(form.element, type(VideoForm)):
-                self.__addToGrid(form.element(self), full=form.full)
-            elif isinstance(form.element, Text):
-                self.__addToGrid(form.element, full=form.full, alignment=Qt.AlignmentFlag.AlignLeft)
+        target = self.select.target
+        group = target if target in self.forms else type(target)
+        for other, widgets in self.formWidgets.items():
+            for widget in widgets:
+                widget.setVisible(other == group)
+
+        if group not in self.formWidgets:
+            widgets = self.formWidgets[group] = []
+            for form in self.forms.get(group, []):
+                if isinstance(form.element, type(VideoForm)):
+                    element = form.element(self)
+                    element.setSource(self.sourceInfo)
+                    element.onChange.connect(lambda element=element: self.__onFormChange(element))
+                    self.__addToGrid(element, full=form.full)
+                    widgets.append(element)
+                else:
+                    heading = Text(form.element, size=16, alignment=Qt.AlignmentFlag.AlignLeft)
+                    self.__addToGrid(heading, full=form.full, alignment=Qt.AlignmentFlag.AlignLeft)
+                    widgets.append(heading)
+
+        # Forms of another group may have changed the shared spec fields meanwhile
+        if self.spec is not None:
+            for widget in self.formWidgets[group]:
+                if isinstance(widget, VideoForm):
+                    widget.bind(self.spec)
         self.button.show()
+        self.watchButton.show()
+
+    def __onFormChange(self, form: VideoForm):
+        if self.spec is not None:
+            self.spec = form.apply(self.spec)
 
     def __addToGrid(self, widget: QWidget, **kwargs):
         """Adds component to grid layout"""
@@ -106,10 +273,147 @@ class Converter(QWidget):
     def setInput(self, input_file: str):
         self.input = input_file
 
+    def setSourceInfo(self, info: MediaInfo | None):
+        self.sourceInfo = info
+        for form in self.findChildren(VideoForm):
+            form.setSource(info)
+
+    def setInputs(self, input_files: List[str]):
+        self.inputs = input_files
+        if input_files:
+            self.input = input_files[0]
+
     def convert(self):
-        # TODO: Complete
-        forms = self.findChildren(VideoForm)
-        for form in forms:
-            pass
-        if self.input == "":
+        if self.spec is None or self.select.target is None:
+            return
+
+        # Every selected file that can be converted to the target becomes a job with the same settings
+        jobs = create_jobs(self.inputs or [self.input], self.spec, reserved=set(self.queue.outputs))
+        if not jobs:
+            return
+
+        self.output = jobs[-1].output
+        self.queue.enqueue(jobs)
+        self.queue.show()
+
+    def calibrate(self):
+        if self.spec is None or not self.input:
+            return
+        from .Calibration import CalibrationDialog
+        dialog = CalibrationDialog(self.input, self)
+        if not dialog.exec() or dialog.selected is None:
             return
+        self.spec = self.spec.replace(preset=dialog.selected.preset, crf=dialog.selected.crf)
+        for form in self.findChildren(VideoForm):
+            form.bind(self.spec)
+
+    def toggleWatch(self):
+        if self.watch is not None:
+            self.watch.stop()
+            self.watch.deleteLater()
+            self.watch = None
+            self.watchButton.setText("Watch Folder")
+            self.watchButton.setToolTip("Convert every file copied into a folder with these settings")
+            return
+        if self.spec is None:
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Watch Folder", get_home_directory())
+        if not folder:
+            return
+        from .FolderWatch import FolderWatch
+        self.watch = FolderWatch(folder, self.spec, parent=self)
+        self.watch.onSettled.connect(self.__onWatchSettled)
+        self.watchButton.setText("Stop Watching")
+        self.watchButton.setToolTip(f"Watching {folder}")
+
+    def __onWatchSettled(self, paths: List[str]):
+        if self.watch is None:
+            return
+        jobs = create_jobs(paths, self.watch.spec, reserved=set(self.queue.outputs))
+        if jobs:
+            self.output = jobs[-1].output
+            self.queue.enqueue(jobs)
+            self.queue.show()
+        # Recorded once enqueued, the journal resumes them when the app quits or dies before they finish
+        self.watch.handled(paths, [job.input for job in jobs])
+
+    def togglePause(self):
+        if self.queue.count(JobState.PAUSED):
+            self.queue.resumeAll()
+            self.pauseButton.setText("Pause")
+        else:
+            self.queue.pauseAll()
+            self.pauseButton.setText("Resume")
+
+    def cancel(self):
+        self.queue.cancelAll()
+
+    def setInterrupted(self, jobs: List[Job]):
+        self.interrupted = jobs
+        self.interruptedStatus.setText(f"{len(jobs)} interrupted conversion(s)")
+        self.__updateInterrupted()
+
+    def resumeInterrupted(self):
+        jobs, self.interrupted = self.interrupted, []
+        if jobs:
+            self.queue.enqueue(jobs)
+            self.queue.show()
+        self.__updateInterrupted()
+
+    def discardInterrupted(self):
+        if self.queue.journal is not None:
+            self.queue.journal.discard(self.interrupted)
+        self.interrupted = []
+        self.__updateInterrupted()
+
+    def __updateInterrupted(self):
+        for widget in (self.interruptedStatus, self.resumeButton, self.discardButton):
+            widget.setVisible(bool(self.interrupted))
+
+    def clearCache(self):
+        cache = get_output_cache()
+        if cache is None or self.cacheTask is not None:
+            return
+        self.clearCacheButton.setEnabled(False)
+        self.cacheTask = run_in_background(cache.purge, onDone=self.__onCacheCleared, onFailed=self.__onCacheCleared)
+
+    def __onCacheCleared(self, _):
+        self.cacheTask = None
+        self.clearCacheButton.setEnabled(True)
+        self.__updateCacheStatus()
+
+    def __updateCacheStatus(self):
+        """Opening the cache touches the disk, read it off the GUI thread"""
+        self.cacheStatusTask = run_in_background(_cache_usage, onDone=self.__showCacheStatus)
+
+    def __showCacheStatus(self, usage: Tuple[int, int] | None):
+        self.cacheStatusTask = None
+        if usage is None:
+            self.cacheStatus.setText("Output cache disabled")
+            self.clearCacheButton.hide()
+            return
+        count, size = usage
+        self.cacheStatus.setText(f"Output cache: {count} file(s), {size / (1024 * 1024):.1f} MB")
+
+    def __onQueueProgress(self):
+        progress = self.queue.progress()
+        self.progress.setValue(int((progress.percent or 0) * 10))
+        summary = progress.summary()
+        if speed := self.queue.speed():
+            summary += f" · {speed:.2f}x realtime"
+        self.metrics.setText(summary)
+
+    def __onQueueChanged(self):
+        running = self.queue.pending() > 0
+        self.pauseButton.setVisible(running)
+        self.cancelButton.setVisible(running)
+        self.progress.setVisible(running)
+        self.metrics.setVisible(running)
+        if not running:
+            self.pauseButton.setText("Pause")
+            self.__updateCacheStatus()
+
+        self.status.setText(", ".join(
+            f"{count} {state.value}" for state in JobState
+            if (count := self.queue.count(state))
+        ))
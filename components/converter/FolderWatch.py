@@ -0,0 +1,95 @@
+from typing import List, Set
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+
+from engine.Spec import ConversionSpec
+from engine.Watch import Watcher
+from util.ui import Task, run_in_background
+
+
+class FolderWatch(QObject):
+    """
+    Watches a folder for new files through QFileSystemWatcher and reports them once they stopped growing.
+
+    Change notifications only mark their directory for a scan, scans and the size checks
+    of settling files run off the GUI thread through `engine.Watch.Watcher`. The whole tree
+    is scanned again every RESCAN_INTERVAL in case notifications are missed, e.g. on
+    network shares. Files already handled in an earlier session are not reported again.
+    """
+
+    POLL_INTERVAL = 1000  # Milliseconds between checks of changed directories and settling files
+    RESCAN_INTERVAL = 60  # Polls between scans of the whole tree
+
+    # Signals
+    onSettled = Signal(list)  # Paths of files done being written, pass them back to `handled`
+
+    def __init__(self, folder: str, spec: ConversionSpec, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.folder = folder
+        self.watcher = Watcher([folder], spec)
+        self.changed: Set[str] = set()  # Directories notified since the last scan
+        self.task: Task | None = None
+        self.polls = 0
+
+        self.notifier = QFileSystemWatcher(self)
+        self.notifier.directoryChanged.connect(self.__onDirectoryChanged)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_INTERVAL)
+        self.timer.timeout.connect(self.__poll)
+        self.timer.start()
+        self.__poll(full=True)
+
+    @property
+    def spec(self) -> ConversionSpec:
+        return self.watcher.spec
+
+    def handled(self, paths: List[str], queued: List[str]) -> None:
+        self.watcher.handled(paths, set(queued))
+
+    def stop(self) -> None:
+        self.timer.stop()
+        self.notifier.directoryChanged.disconnect()
+        if self.task is None:
+            self.watcher.close()
+
+    def __onDirectoryChanged(self, directory: str) -> None:
+        self.changed.add(directory)
+
+    def __poll(self, full: bool = False) -> None:
+        if self.task is not None:
+            return
+        self.polls += 1
+        full = full or self.polls % self.RESCAN_INTERVAL == 0
+        if not full and not self.changed and not self.watcher.pending:
+            return
+        directories = None if full else list(self.changed)
+        self.changed = set()
+        self.task = run_in_background(self.__check, directories, onDone=self.__onChecked, onFailed=self.__onFailed)
+
+    def __check(self, directories: List[str] | None) -> List[str]:
+        if directories is None or directories:
+            self.watcher.scan(directories)
+        return self.watcher.settled()
+
+    def __onChecked(self, settled: List[str]) -> None:
+        self.task = None
+        if not self.timer.isActive():
+            # Stopped meanwhile
+            self.watcher.close()
+            return
+        # Subscribe to new subdirectories, notifications only cover direct entries
+        directories = set(self.watcher.directories)
+        watched = set(self.notifier.directories())
+        if added := directories - watched:
+            self.notifier.addPaths(sorted(added))
+        if removed := watched - directories:
+            self.notifier.removePaths(sorted(removed))
+        if settled:
+            self.onSettled.emit(settled)
+
+    def __onFailed(self, _: Exception) -> None:
+        self.task = None
+        if not self.timer.isActive():
+            self.watcher.close()
@@ -33,17 +33,29 @@
 # | `-t 00:00:10`  | Duration (cut to first 10 seconds)           |
 # | `-ss 00:00:05` | Start time (skip first 5 seconds)            |
 
-from typing import cast, List
+from typing import cast, Dict, List
 from dataclasses import dataclass
 
-from PySide6.QtCore import Qt, QSize, QRegularExpression
+from PySide6.QtCore import Qt, QSize, QRegularExpression, Signal
 from PySide6.QtGui import QRegularExpressionValidator
-from PySide6.QtWidgets import QWidget, QGridLayout, QComboBox, QLineEdit
+from PySide6.QtWidgets import QWidget, QGridLayout, QComboBox, QLineEdit, QHBoxLayout, QListWidget, QListWidgetItem
 
 from components.ui import Text
+from constant import Option
+from constant.Option import ResolutionItem
+from engine.Probe import MediaInfo
+from engine.Progress import format_seconds, parse_seconds
+from engine.Spec import ConversionSpec, Rendition
 
 
 class VideoForm(QWidget):
+    """
+    One conversion option, bound to a field of ConversionSpec.
+    `bind` shows the spec's value, `apply` writes the shown value back into a spec.
+    """
+
+    # Signal, emitted when the user changes the value
+    onChange = Signal(name="on_video_form_changed")
 
     def __init__(self, name: str, description: str, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -57,8 +69,7 @@ class VideoForm(QWidget):
         self.label.setFixedWidth(100)
         self.label.setWordWrap(True)
 
-        self.input: QWidget = QComboBox()
-        self.input.setFixedWidth(200)
+        self.input: QWidget = self._createInput()
         self._initInput()
 
         self.helper = Text(description, size=10, alignment=Qt.AlignmentFlag.AlignLeft)
@@ -72,9 +83,37 @@ class VideoForm(QWidget):
 
         self.setLayout(self.grid)
 
+        if isinstance(self.input, QComboBox):
+            self.input.currentIndexChanged.connect(lambda _: self.onChange.emit())
+
+    def _createInput(self) -> QWidget:
+        """Creates the input widget, a combobox unless overridden"""
+        combo = QComboBox()
+        combo.setFixedWidth(200)
+        return combo
+
     def _initInput(self) -> None:
         """Initialize input (whether it be combobox, select, or others)"""
 
+    def bind(self, spec: ConversionSpec) -> None:
+        """Shows the value of `spec` without emitting onChange"""
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        """Returns `spec` with the shown value"""
+        return spec
+
+    def _select(self, value) -> None:
+        """Selects the item holding `value`, quietly"""
+        combo = cast(QComboBox, self.input)
+        index = combo.findData(value)
+        if index >= 0:
+            combo.blockSignals(True)
+            combo.setCurrentIndex(index)
+            combo.blockSignals(False)
+
+    def setSource(self, info: MediaInfo | None) -> None:
+        """Shows the probed source values next to the options, e.g. what "no change" means"""
+
 
 class CRF(VideoForm):
     input: QComboBox  # type: ignore
@@ -87,131 +126,25 @@ class CRF(VideoForm):
         )
 
     def _initInput(self) -> None:
-        for i in range(0, 52):
-            if i == 0:
-                self.input.addItem(f"{i} (lossless compression)")
-            elif i == 18:
-                self.input.addItem(f"{i} (high quality)")
-            elif i == 23:
-                self.input.addItem(f"{i} (normal quality)")
-                # Sets as default value
-                self.input.setCurrentIndex(i)
-            elif i == 28:
-                self.input.addItem(f"{i} (low quality)")
-            elif i == 51:
-                self.input.addItem(f"{i} (worst quality)")
+        for i in range(Option.CRF_MIN, Option.CRF_MAX + 1):
+            if i in Option.CRF_LABELS:
+                self.input.addItem(f"{i} ({Option.CRF_LABELS[i]})", userData=i)
             else:
-                self.input.addItem(f"{i}")
+                self.input.addItem(f"{i}", userData=i)
+            if i == Option.DEFAULT_CRF:
+                # Sets as default value
+                self.input.setCurrentIndex(self.input.count() - 1)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.crf)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(crf=self.input.currentData())
 
 
 class Resolution(VideoForm):
-    @dataclass
-    class Item:
-        name: str
-        width: int
-        height: int
-        aspectRatio: float
-
-    ITEMS: List[Item] = [
-        Item(
-            name="no change",
-            width=0,
-            height=0,
-            aspectRatio=0,
-        ),
-        Item(
-            name="640x480 (4:3)",
-            width=640,
-            height=480,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="640x640 (1:1)",
-            width=640,
-            height=640,
-            aspectRatio=1,
-        ),
-        Item(
-            name="800x600 (4:3)",
-            width=800,
-            height=600,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="960x720 (4:3)",
-            width=960,
-            height=720,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="1024x768 (4:3)",
-            width=1024,
-            height=768,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="1024x1024 (1:1)",
-            width=1024,
-            height=1024,
-            aspectRatio=1,
-        ),
-        Item(
-            name="1280x720 (16:9)",
-            width=1280,
-            height=720,
-            aspectRatio=16 / 9,
-        ),
-        Item(
-            name="1280x960 (4:3)",
-            width=1280,
-            height=960,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="1280x1280 (1:1)",
-            width=1280,
-            height=1280,
-            aspectRatio=1,
-        ),
-        Item(
-            name="1440x1080 (4:3)",
-            width=1440,
-            height=1080,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="1600x1200 (4:3)",
-            width=1600,
-            height=1200,
-            aspectRatio=4 / 3,
-        ),
-        Item(
-            name="1600x1600 (1:1)",
-            width=1600,
-            height=1600,
-            aspectRatio=1,
-        ),
-        Item(
-            name="1920x1080 (16:9)",
-            width=1920,
-            height=1080,
-            aspectRatio=16 / 9,
-        ),
-        Item(
-            name="1920x1440 (4:3)",
-            width=1920,
-            height=1440,
-            aspectRatio=4 / 3,
-        ),
-        # TODO: Implement these later ⬇️
-        # "1920x1920 (1:1)",
-        # "2560x1440 (16:9)",
-        # "2560x1920 (4:3)",
-        # "2560x2560 (1:1)",
-        # "3840x2160 (16:9)",
-        # "3840x2880 (4:3)",
-        # "3840x3840 (1:1)"
-    ]
+    Item = ResolutionItem
+    ITEMS: List[ResolutionItem] = Option.RESOLUTIONS
 
     input: QComboBox  # type: ignore
 
@@ -223,19 +156,76 @@ class Resolution(VideoForm):
             self.input.addItem(item.name, userData=item)
         self.input.setCurrentIndex(0)
 
+    def setSource(self, info: MediaInfo | None) -> None:
+        name = self.ITEMS[0].name
+        if info is not None and info.video is not None:
+            width, height = info.video.display_size
+            name += f" ({width}x{height})"
+        self.input.setItemText(0, name)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        for i, item in enumerate(self.ITEMS):
+            if (item.width, item.height) == (spec.width, spec.height):
+                self.input.blockSignals(True)
+                self.input.setCurrentIndex(i)
+                self.input.blockSignals(False)
+                return
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        item: ResolutionItem = self.input.currentData()
+        return spec.replace(width=item.width, height=item.height)
+
+
+class Fit(VideoForm):
+    ITEMS: Dict[str, str] = Option.FITS
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Aspect Ratio",
+            "How sources of another shape are brought to the resolution. Sources are never upscaled, except when stretching.",
+            *args, **kwargs
+        )
+
+    def _initInput(self):
+        for item, description in self.ITEMS.items():
+            self.input.addItem(f"{item} ({description})", userData=item)
+            if item == Option.DEFAULT_FIT:
+                # Sets as default value
+                self.input.setCurrentIndex(self.input.count() - 1)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.fit)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(fit=self.input.currentData())
+
+
+class Scaler(VideoForm):
+    ITEMS: Dict[str, str] = Option.SCALERS
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("Scaling", "Trades speed for sharpness when resizing.", *args, **kwargs)
+
+    def _initInput(self):
+        for item, description in self.ITEMS.items():
+            self.input.addItem(f"{item} ({description})", userData=item)
+            if item == Option.DEFAULT_SCALER:
+                # Sets as default value
+                self.input.setCurrentIndex(self.input.count() - 1)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.scaler)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(scaler=self.input.currentData())
+
 
 class Preset(VideoForm):
-    ITEMS: List[str] = [
-        "ultrafast",
-        "superfast",
-        "veryfast",
-        "faster",
-        "fast",
-        "medium",
-        "slow",
-        "slower",
-        "veryslow",
-    ]
+    ITEMS: List[str] = Option.PRESETS
 
     input: QComboBox  # type: ignore
 
@@ -244,25 +234,20 @@ class Preset(VideoForm):
 
     def _initInput(self):
         for item in self.ITEMS:
-            self.input.addItem(item)
-            if item == "medium":
+            self.input.addItem(item, userData=item)
+            if item == Option.DEFAULT_PRESET:
                 # Sets as default value
                 self.input.setCurrentIndex(self.input.count() - 1)
 
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.preset)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(preset=self.input.currentData())
+
 
 class FrameRate(VideoForm):
-    ITEMS: List[int | str] = [
-        "auto",
-        60,
-        30,
-        24,
-        15,
-        12,
-        10,
-        8,
-        6,
-        5,
-    ]
+    ITEMS: List[int | str] = Option.FRAME_RATES
 
     input: QComboBox  # type: ignore
 
@@ -276,63 +261,338 @@ class FrameRate(VideoForm):
                 # Sets as default value
                 self.input.setCurrentIndex(self.input.count() - 1)
 
-#
-# class Trim(VideoForm):
-#     input: None  # type: ignore
-#
-#     def __init__(self, parent=None):
-#         super().__init__(parent, "Trim", autoLayout=False)
-#
-#         # Clear the inherited input
-#         self.input = None  # type: ignore
-#
-#         self.trimStart = QLineEdit()
-#         self.trimStart.setPlaceholderText("HH:MM:SS")
-#         self.trimStart.setFixedSize(QSize(INPUT_FIXED_WIDTH, INPUT_FIXED_HEIGHT))
-#         self.trimEnd = QLineEdit()
-#         self.trimEnd.setPlaceholderText("HH:MM:SS")
-#         self.trimEnd.setFixedSize(QSize(INPUT_FIXED_WIDTH, INPUT_FIXED_HEIGHT))
-#
-#         validator = QRegularExpressionValidator(QRegularExpression(r"^\d{2}:\d{2}:\d{2}$"))
-#         self.trimStart.setValidator(validator)
-#         self.trimEnd.setValidator(validator)
-#
-#         # Directly append to the parent's layout
-#         parent = cast(QWidget, self.parent())
-#         parentLayout = parent.layout()
-#         if not isinstance(parentLayout, QGridLayout):
-#             raise ValueError(f"Parent's layout must be a {QGridLayout.__name__} instance")
-#
-#         parent.currRow += 1
-#         parent.currColumn = 0
-#         parentLayout.addWidget(Text("Trim Start"), parent.currRow, 0)
-#         parentLayout.addWidget(self.trimStart, parent.currRow, 1)
-#         parentLayout.addWidget(Text("Trim End"), parent.currRow, 2)
-#         parentLayout.addWidget(self.trimEnd, parent.currRow, 3)
-#         parent.currRow += 1
-#
-#     def _initInput(self) -> None:
-#         pass
-#
-#     def toCmdLineStr(self) -> str:
-#         start = self.trimStart.text()
-#         end = self.trimEnd.text()
-#
-#         if not start and not end:
-#             return ""
-#
-#         result = []
-#         if start:
-#             result.append(f"-ss {start}")
-#         if end:
-#             if start:
-#                 # Calculate duration when both start and end are provided
-#                 from datetime import datetime
-#                 time_format = "%H:%M:%S"
-#                 duration = datetime.strptime(end, time_format) - datetime.strptime(start, time_format)
-#                 result.append(f"-t {duration}")
-#             else:
-#                 # Use end time directly if only the end is provided
-#                 result.append(f"-t {end}")
-#
-#         return " ".join(result)
+    def setSource(self, info: MediaInfo | None) -> None:
+        name = str(self.ITEMS[0])
+        if info is not None and info.video is not None and info.video.frame_rate:
+            name += f" ({info.video.frame_rate:.3g})"
+        self.input.setItemText(0, name)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.frame_rate)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(frame_rate=self.input.currentData())
+
+
+class Chunks(VideoForm):
+    ITEMS: List[int | str] = Option.CHUNKS
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Parallel Chunks",
+            "Splits long videos at keyframes and encodes the pieces side by side. Faster on many cores, same quality.",
+            *args, **kwargs
+        )
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(str(item), userData=item)
+        self.input.setCurrentIndex(0)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.chunks)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(chunks=self.input.currentData())
+
+
+class TargetSize(VideoForm):
+    ITEMS: List[int | str] = Option.TARGET_SIZES
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Target Size",
+            "Fits the output under this size. Videos are encoded in two passes, GIFs are scaled down.",
+            *args, **kwargs
+        )
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(f"{item} MB" if isinstance(item, int) else item, userData=item)
+        self.input.setCurrentIndex(0)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(int(spec.target_size) if spec.target_size else "off")
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        size = self.input.currentData()
+        return spec.replace(target_size=float(size) if isinstance(size, int) else 0.0)
+
+
+class Colors(VideoForm):
+    ITEMS: List[int] = Option.GIF_COLORS
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("Colors", "Fewer colors make a smaller GIF.", *args, **kwargs)
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(str(item), userData=item)
+        self.input.setCurrentIndex(0)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.colors)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(colors=self.input.currentData())
+
+
+class Dither(VideoForm):
+    ITEMS: List[str] = Option.DITHERS
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Dithering",
+            "Hides banding from the limited colors. Changing only this reuses the palette of the last export.",
+            *args, **kwargs
+        )
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(item, userData=item)
+            if item == Option.DEFAULT_DITHER:
+                # Sets as default value
+                self.input.setCurrentIndex(self.input.count() - 1)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.dither)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(dither=self.input.currentData())
+
+
+class Metadata(VideoForm):
+    ITEMS: List[str] = ["keep", "strip"]
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("Metadata", "EXIF data such as camera, date and location.", *args, **kwargs)
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(item, userData=item == "keep")
+        self.input.setCurrentIndex(0)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.exif)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(exif=self.input.currentData())
+
+
+class Trim(VideoForm):
+    input: QWidget  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Trim",
+            "Start and end as HH:MM:SS. Copied videos are cut without re-encoding all but the edges.",
+            *args, **kwargs
+        )
+
+    def _createInput(self) -> QWidget:
+        validator = QRegularExpressionValidator(QRegularExpression(r"^(\d+:)?(\d{1,2}:)?\d{1,2}(\.\d{1,3})?$"))
+        self.trimStart = QLineEdit()
+        self.trimStart.setPlaceholderText("00:00:00")
+        self.trimEnd = QLineEdit()
+        self.trimEnd.setPlaceholderText("End")
+        for edit in (self.trimStart, self.trimEnd):
+            edit.setValidator(validator)
+            edit.editingFinished.connect(self.onChange.emit)
+
+        container = QWidget()
+        container.setFixedWidth(200)
+        layout = QHBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.trimStart)
+        layout.addWidget(self.trimEnd)
+        return container
+
+    def setSource(self, info: MediaInfo | None) -> None:
+        self.trimEnd.setPlaceholderText(format_seconds(info.duration) if info is not None and info.duration else "End")
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self.trimStart.setText(self.__format(spec.start))
+        self.trimEnd.setText(self.__format(spec.end))
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        start = self.__parse(self.trimStart.text())
+        end = self.__parse(self.trimEnd.text())
+        # An end before the start keeps the rest of the video
+        return spec.replace(start=start, end=end if end > start else 0.0)
+
+    @staticmethod
+    def __parse(text: str) -> float:
+        try:
+            return parse_seconds(text) if text else 0.0
+        except ValueError:
+            return 0.0
+
+    @staticmethod
+    def __format(seconds: float) -> str:
+        if not seconds:
+            return ""
+        text = format_seconds(seconds)
+        fraction = round(seconds % 1, 3)
+        return f"{text}{f'{fraction:.3f}'[1:]}" if fraction else text
+
+
+class Renditions(VideoForm):
+    ITEMS: List[ResolutionItem] = [item for item in Option.RESOLUTIONS if item.width]
+
+    input: QListWidget  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Renditions",
+            "Also writes the video at these sizes, decoding the source once for all of them.",
+            *args, **kwargs
+        )
+
+    def _createInput(self) -> QWidget:
+        renditions = QListWidget()
+        renditions.setFixedSize(200, 100)
+        return renditions
+
+    def _initInput(self) -> None:
+        for item in self.ITEMS:
+            row = QListWidgetItem(item.name)
+            row.setData(Qt.ItemDataRole.UserRole, item)
+            row.setFlags(row.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            row.setCheckState(Qt.CheckState.Unchecked)
+            self.input.addItem(row)
+        self.input.itemChanged.connect(lambda _: self.onChange.emit())
+
+    def bind(self, spec: ConversionSpec) -> None:
+        sizes = {(rendition.width, rendition.height) for rendition in spec.renditions}
+        self.input.blockSignals(True)
+        for i, item in enumerate(self.ITEMS):
+            checked = (item.width, item.height) in sizes
+            self.input.item(i).setCheckState(Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked)
+        self.input.blockSignals(False)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        renditions = tuple(
+            Rendition(width=item.width, height=item.height) for i, item in enumerate(self.ITEMS)
+            if self.input.item(i).checkState() == Qt.CheckState.Checked
+        )
+        return spec.replace(renditions=renditions)
+
+
+class AudioMode(VideoForm):
+    ITEMS: Dict[str, str] = Option.AUDIO_MODES
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(
+            "Audio",
+            "Dropping or copying the audio leaves the video untouched.",
+            *args, **kwargs
+        )
+
+    def _initInput(self):
+        for item, description in self.ITEMS.items():
+            self.input.addItem(f"{item} ({description})", userData=item)
+            if item == Option.DEFAULT_AUDIO:
+                # Sets as default value
+                self.input.setCurrentIndex(self.input.count() - 1)
+
+    def setSource(self, info: MediaInfo | None) -> None:
+        name = f"auto ({self.ITEMS['auto']})"
+        if info is not None and info.audio is not None:
+            name += f" ({info.audio.codec})"
+        self.input.setItemText(0, name)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.audio)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(audio=self.input.currentData())
+
+
+class AudioBitrate(VideoForm):
+    ITEMS: List[int | str] = Option.AUDIO_BITRATES
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("Audio Bitrate", "Sources already below the bitrate are kept as they are.", *args, **kwargs)
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(f"{item} kbit/s" if isinstance(item, int) else item, userData=item)
+        self.input.setCurrentIndex(0)
+
+    def setSource(self, info: MediaInfo | None) -> None:
+        name = str(self.ITEMS[0])
+        if info is not None and info.audio is not None and info.audio.bit_rate:
+            name += f" ({info.audio.bit_rate // 1000} kbit/s)"
+        self.input.setItemText(0, name)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.audio_bitrate)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(audio_bitrate=self.input.currentData())
+
+
+class SampleRate(VideoForm):
+    ITEMS: List[int | str] = Option.SAMPLE_RATES
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("Sample Rate", "", *args, **kwargs)
+
+    def _initInput(self):
+        for item in self.ITEMS:
+            self.input.addItem(f"{item} Hz" if isinstance(item, int) else item, userData=item)
+        self.input.setCurrentIndex(0)
+
+    def setSource(self, info: MediaInfo | None) -> None:
+        name = str(self.ITEMS[0])
+        if info is not None and info.audio is not None and info.audio.sample_rate:
+            name += f" ({info.audio.sample_rate} Hz)"
+        self.input.setItemText(0, name)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.sample_rate)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(sample_rate=self.input.currentData())
+
+
+class Channels(VideoForm):
+    ITEMS: Dict[int | str, str] = Option.CHANNELS
+
+    input: QComboBox  # type: ignore
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("Channels", "Downmixed while encoding, e.g. stereo to mono for speech.", *args, **kwargs)
+
+    def _initInput(self):
+        for item, name in self.ITEMS.items():
+            self.input.addItem(name if item == "auto" else f"{item} ({name})", userData=item)
+        self.input.setCurrentIndex(0)
+
+    def setSource(self, info: MediaInfo | None) -> None:
+        name = self.ITEMS["auto"]
+        if info is not None and info.audio is not None and info.audio.channels:
+            name += f" ({info.audio.channels})"
+        self.input.setItemText(0, name)
+
+    def bind(self, spec: ConversionSpec) -> None:
+        self._select(spec.channels)
+
+    def apply(self, spec: ConversionSpec) -> ConversionSpec:
+        return spec.replace(channels=self.input.currentData())
@@ -0,0 +1,185 @@
+import os
+import time
+from typing import Dict, List
+
+from PySide6.QtCore import QThreadPool, Signal
+from PySide6.QtWidgets import QListWidget, QListWidgetItem, QVBoxLayout, QWidget
+
+from engine import Scheduler
+from engine.Job import Job, JobState
+from engine.Journal import Journal, get_journal
+from engine.Progress import JsonLinesSink, Metrics, format_seconds
+from util.system import get_metrics_log_path
+
+from .Worker import Worker
+
+
+class Queue(QWidget):
+    """
+    Persistent list of conversion jobs.
+
+    Jobs stay listed after they finish and new ones can be appended while
+    others run. Concurrency is re-planned by `engine.Scheduler` on every
+    enqueue, the thread pool then never runs more ffmpeg processes than that.
+    Each running job is pinned to cores of its own, at a lower priority than the interface.
+    """
+
+    MIN_HEIGHT = 120
+
+    # Signals
+    onChanged = Signal()
+    onProgress = Signal()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.pool = QThreadPool(self)
+        self.jobs: List[Job] = []
+        self.workers: Dict[int, Worker] = {}
+        self.items: Dict[int, QListWidgetItem] = {}
+
+        # Jobs enqueued since the queue was last idle, the overall progress covers these
+        self.batch: List[Job] = []
+        self.batchStart: float = 0.0
+
+        path = get_metrics_log_path()
+        self.sink: JsonLinesSink | None = JsonLinesSink(path) if path else None
+        self.journal: Journal | None = get_journal()
+        self.cores = Scheduler.CorePool()
+
+        self.list = QListWidget()
+        self.list.setMinimumHeight(self.MIN_HEIGHT)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.list)
+        self.setLayout(layout)
+
+    @property
+    def outputs(self) -> List[str]:
+        """Output paths of unfinished jobs, so new jobs do not pick the same ones"""
+        return [job.output for job in self.jobs if not job.state.finished]
+
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs if not job.state.finished)
+
+    def count(self, state: JobState) -> int:
+        return sum(1 for job in self.jobs if job.state == state)
+
+    def enqueue(self, jobs: List[Job]) -> None:
+        if not self.pending():
+            self.batch = []
+            self.batchStart = time.monotonic()
+        self.batch += jobs
+
+        pending = [job for job in self.jobs if not job.state.finished] + jobs
+        if all(job.in_process for job in pending):
+            schedule = Scheduler.plan_in_process(len(pending))
+        else:
+            schedule = Scheduler.plan(len(pending))
+        self.pool.setMaxThreadCount(schedule.concurrency)
+
+        if self.journal is not None:
+            # Recorded up front, so jobs still waiting for a thread are resumed after a crash too
+            self.journal.record(jobs)
+
+        for job in jobs:
+            if not job.threads:
+                job.threads = schedule.threads
+            job.limits = Scheduler.Limits(nice=Scheduler.BACKGROUND_NICE)
+            worker = Worker(job, self.sink, self.journal, self.cores)
+            worker.signals.started.connect(self.__onStarted)
+            worker.signals.progress.connect(self.__onProgress)
+            worker.signals.finished.connect(self.__onFinished)
+
+            item = QListWidgetItem()
+            self.list.addItem(item)
+            self.jobs.append(job)
+            self.workers[job.id] = worker
+            self.items[job.id] = item
+            self.__update(job)
+            self.pool.start(worker)
+        self.onChanged.emit()
+
+    def progress(self) -> Metrics:
+        """
+        Overall progress of the current batch. Running jobs add up their fps,
+        the ETA extrapolates the batch's elapsed time.
+        """
+        running = [job.metrics for job in self.batch if job.state == JobState.RUNNING and job.metrics]
+        finished = sum(1 for job in self.batch if job.state.finished)
+        fraction = finished + sum((metrics.percent or 0) / 100 for metrics in running)
+        total = max(1, len(self.batch))
+        elapsed = time.monotonic() - self.batchStart
+
+        # Expressed as a Metrics over a "duration" of one unit per job
+        return Metrics(
+            fps=sum(metrics.fps for metrics in running),
+            out_time=fraction,
+            duration=total,
+            elapsed=elapsed,
+            finished=finished == total,
+        )
+
+    def speed(self) -> float:
+        """Realtime multiple of all running jobs together"""
+        return sum(job.metrics.speed for job in self.batch if job.state == JobState.RUNNING and job.metrics)
+
+    def pauseAll(self) -> None:
+        for worker in self.workers.values():
+            worker.pause()
+            self.__update(worker.job)
+
+    def resumeAll(self) -> None:
+        for worker in self.workers.values():
+            worker.resume()
+            self.__update(worker.job)
+
+    def cancelAll(self) -> None:
+        workers = list(self.workers.values())
+        for worker in workers:
+            # Drop jobs the pool has not started yet, the rest are terminated off the GUI thread
+            if self.pool.tryTake(worker):
+                worker.job.state = JobState.CANCELLED
+                if self.journal is not None:
+                    # Otherwise left pending in the journal and offered for resume on the next start
+                    self.journal.record([worker.job])
+                self.__onFinished(worker.job)
+            else:
+                QThreadPool.globalInstance().start(worker.cancel)
+
+    def __onStarted(self, job: Job) -> None:
+        self.__update(job)
+        self.onChanged.emit()
+
+    def __onProgress(self, job: Job, metrics: Metrics) -> None:
+        detail = metrics.summary()
+        for rendition in job.renditions:
+            if rendition.metrics is not None:
+                # The renditions advance together, they differ in size
+                name = rendition.spec.resolution.name if rendition.spec.resolution else rendition.output
+                detail += f" | {name} {rendition.metrics.total_size / (1024 * 1024):.1f} MB"
+        self.__update(job, detail)
+        self.onProgress.emit()
+
+    def __onFinished(self, job: Job) -> None:
+        self.workers.pop(job.id, None)
+        detail = job.error.splitlines()[-1] if job.error else ""
+        if job.state == JobState.DONE and job.metrics is not None:
+            detail = f"in {format_seconds(job.metrics.elapsed)}"
+        self.__update(job, detail)
+        self.onChanged.emit()
+        self.onProgress.emit()
+
+    def __update(self, job: Job, detail: str = "") -> None:
+        item = self.items.get(job.id)
+        if item is None:
+            return
+        text = f"[{job.state.value}] {os.path.basename(job.input)} → {os.path.basename(job.output)}"
+        if job.cached:
+            text += " (cached)"
+        elif job.plan is not None:
+            text += f" ({job.plan.name})"
+        if detail:
+            text += f"  {detail}"
+        item.setText(text)
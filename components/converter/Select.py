@@ -5,7 +5,7 @@ from PySide6.QtWidgets import QComboBox, QHBoxLayout, QWidget
 from PySide6.QtCore import Signal
 
 from components.ui import Text
-from constant.File import File, Image, Video
+from constant.File import Audio, File, Image, Video, TARGETS
 
 
 class Select(QWidget):
@@ -22,34 +22,11 @@ class Select(QWidget):
     ITEMS: List[Item] = [
         Item(key="Image", children=[image.value for image in Image]),
         Item(key="Video", children=[video.value for video in Video]),
+        Item(key="Audio", children=[audio.value for audio in Audio]),
     ]
 
-    PAIRS: Dict[File, List[Item]] = {
-        # Images
-        Image.JPEG: [
-            Item(key="Image", children=[Image.PNG.value]),
-        ],
-        Image.JPG: [
-            Item(key="Image", children=[Image.JPEG.value, Image.PNG.value]),
-        ],
-
-        # Videos
-        Video.AVI: [
-            Item(key="Video", children=[Video.MOV.value, Video.MP4.value, Video.MPEG.value]),
-        ],
-        Video.MOV: [
-            Item(key="Image", children=[Image.GIF.value]),
-            Item(key="Video", children=[Video.MP4.value, Video.MPEG.value])
-        ],
-        Video.MP4: [
-            Item(key="Image", children=[Image.GIF.value]),
-            Item(key="Video", children=[Video.MOV.value, Video.MPEG.value])
-        ],
-        Video.MPEG: [
-            Item(key="Image", children=[Image.GIF.value]),
-            Item(key="Video", children=[Video.MOV.value, Video.MP4.value])
-        ],
-    }
+    # Targets of each source type, grouped like ITEMS. Built from constant.File.TARGETS below the class
+    PAIRS: Dict[File, List[Item]] = {}
 
     # Signal
     onSelected = Signal(Selected, name="on_converter_selected_item")
@@ -140,3 +117,13 @@ class Select(QWidget):
             target=self.target,
         ))
         self.targetComboBox.clearFocus()
+
+
+Select.PAIRS = {
+    source: [
+        Select.Item(key=group.__name__, children=[target.value for target in targets if isinstance(target, group)])
+        for group in (Image, Video, Audio)
+        if any(isinstance(target, group) for target in targets)
+    ]
+    for source, targets in TARGETS.items()
+}
@@ -0,0 +1,38 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from engine.Job import Job
+from engine.Journal import Journal
+from engine.Progress import JsonLinesSink
+from engine.Runner import Runner
+from engine.Scheduler import CorePool
+
+
+class WorkerSignals(QObject):
+    started = Signal(object)  # Job
+    progress = Signal(object, object)  # Job, Metrics
+    finished = Signal(object)  # Job, check `job.state` for the outcome
+
+
+class Worker(QRunnable):
+    """Runs a single ffmpeg conversion on a QThreadPool thread, off the GUI thread"""
+
+    def __init__(self, job: Job, sink: JsonLinesSink | None = None, journal: Journal | None = None,
+                 cores: CorePool | None = None):
+        super().__init__()
+
+        self.job = job
+        self.runner = Runner(job, sink, journal, cores)
+        self.signals = WorkerSignals()
+
+    def run(self) -> None:
+        self.runner.run(self.signals.started.emit, self.signals.progress.emit)
+        self.signals.finished.emit(self.job)
+
+    def cancel(self) -> None:
+        self.runner.cancel()
+
+    def pause(self) -> None:
+        self.runner.pause()
+
+    def resume(self) -> None:
+        self.runner.resume()
@@ -1,27 +1,34 @@
 import os
 from enum import Enum
-from typing import Union
+from typing import Dict, FrozenSet, List, Union
+
+from util.sniff import sniff_file
 
 
 class File(Enum):
 
     @staticmethod
-    def from_str(value: str) -> Union["Image", "Video", None]:
-        if value.upper() in [image.value for image in Image]:
-            return Image(value)
-        elif value.upper() in [video.value for video in Video]:
-            return Video(value)
-        return None
+    def from_str(value: str) -> Union["Image", "Video", "Audio", None]:
+        return _BY_VALUE.get(value.upper().strip("."))
 
     @staticmethod
-    def from_path(file_path: str) -> Union["Image", "Video", None]:
+    def from_path(file_path: str, sniff: bool = False) -> Union["Image", "Video", "Audio", None]:
+        """
+        Classifies by extension, or by content when `sniff` is set.
+        Sniffing falls back to the extension only when the content is not recognised.
+        """
         _, ext = os.path.splitext(file_path)
-        ext = ext.upper().strip(".")
-        if ext in [image.value for image in Image]:
-            return Image(ext)
-        elif ext in [video.value for video in Video]:
-            return Video(ext)
-        return None
+        by_extension = _BY_VALUE.get(ext.upper().strip("."))
+        if not sniff:
+            return by_extension
+
+        name = sniff_file(file_path)
+        if name is None:
+            return by_extension
+        # JPG and JPEG are the same format, keep whichever the extension says
+        if by_extension is not None and by_extension in _BY_FORMAT.get(name, frozenset()):
+            return by_extension
+        return _BY_SNIFFED.get(name)
 
 
 class Image(File):
@@ -36,3 +43,65 @@ class Video(File):
     MOV = "MOV"
     MP4 = "MP4"
     MPEG = "MPEG"
+
+
+class Audio(File):
+    M4A = "M4A"
+    MP3 = "MP3"
+
+
+# Conversions offered for each source type
+TARGETS: Dict[File, List[File]] = {
+    # Images
+    Image.JPEG: [Image.PNG],
+    Image.JPG: [Image.JPEG, Image.PNG],
+
+    # Videos
+    Video.AVI: [Video.MOV, Video.MP4, Video.MPEG, Audio.M4A, Audio.MP3],
+    Video.MOV: [Image.GIF, Video.MP4, Video.MPEG, Audio.M4A, Audio.MP3],
+    Video.MP4: [Image.GIF, Video.MOV, Video.MPEG, Audio.M4A, Audio.MP3],
+    Video.MPEG: [Image.GIF, Video.MOV, Video.MP4, Audio.M4A, Audio.MP3],
+
+    # Audio
+    Audio.M4A: [Audio.MP3],
+    Audio.MP3: [Audio.M4A],
+}
+
+
+def supports(source: File, target: File) -> bool:
+    """Whether the source file type can be converted into the target file type"""
+    return target in TARGETS.get(source, [])
+
+
+# Lookup indices, built once instead of on every call
+_BY_VALUE: Dict[str, Union[Image, Video, Audio]] = {
+    **{image.value: image for image in Image},
+    **{video.value: video for video in Video},
+    **{audio.value: audio for audio in Audio},
+}
+
+# Sniffed format name to the file types sharing that format
+_BY_FORMAT: Dict[str, FrozenSet[File]] = {
+    "GIF": frozenset({Image.GIF}),
+    "JPEG": frozenset({Image.JPEG, Image.JPG}),
+    "PNG": frozenset({Image.PNG}),
+    "AVI": frozenset({Video.AVI}),
+    "MOV": frozenset({Video.MOV}),
+    "MP4": frozenset({Video.MP4}),
+    "MPEG": frozenset({Video.MPEG}),
+    "M4A": frozenset({Audio.M4A}),
+    "MP3": frozenset({Audio.MP3}),
+}
+
+# Sniffed format name to the canonical file type, formats missing here (MKV, TS, ...) are unsupported
+_BY_SNIFFED: Dict[str, Union[Image, Video, Audio]] = {
+    "GIF": Image.GIF,
+    "JPEG": Image.JPEG,
+    "PNG": Image.PNG,
+    "AVI": Video.AVI,
+    "MOV": Video.MOV,
+    "MP4": Video.MP4,
+    "MPEG": Video.MPEG,
+    "M4A": Audio.M4A,
+    "MP3": Audio.MP3,
+}
@@ -0,0 +1,255 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Values offered by the conversion options, shared by the GUI forms and the CLI
+
+CRF_MIN: int = 0
+CRF_MAX: int = 51
+DEFAULT_CRF: int = 23
+CRF_LABELS: Dict[int, str] = {
+    0: "lossless compression",
+    18: "high quality",
+    23: "normal quality",
+    28: "low quality",
+    51: "worst quality",
+}
+
+
+@dataclass(frozen=True)
+class ResolutionItem:
+    name: str
+    width: int
+    height: int
+    aspectRatio: float
+
+
+RESOLUTIONS: List[ResolutionItem] = [
+    ResolutionItem(
+        name="no change",
+        width=0,
+        height=0,
+        aspectRatio=0,
+    ),
+    ResolutionItem(
+        name="640x480 (4:3)",
+        width=640,
+        height=480,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="640x640 (1:1)",
+        width=640,
+        height=640,
+        aspectRatio=1,
+    ),
+    ResolutionItem(
+        name="800x600 (4:3)",
+        width=800,
+        height=600,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="960x720 (4:3)",
+        width=960,
+        height=720,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="1024x768 (4:3)",
+        width=1024,
+        height=768,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="1024x1024 (1:1)",
+        width=1024,
+        height=1024,
+        aspectRatio=1,
+    ),
+    ResolutionItem(
+        name="1280x720 (16:9)",
+        width=1280,
+        height=720,
+        aspectRatio=16 / 9,
+    ),
+    ResolutionItem(
+        name="1280x960 (4:3)",
+        width=1280,
+        height=960,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="1280x1280 (1:1)",
+        width=1280,
+        height=1280,
+        aspectRatio=1,
+    ),
+    ResolutionItem(
+        name="1440x1080 (4:3)",
+        width=1440,
+        height=1080,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="1600x1200 (4:3)",
+        width=1600,
+        height=1200,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="1600x1600 (1:1)",
+        width=1600,
+        height=1600,
+        aspectRatio=1,
+    ),
+    ResolutionItem(
+        name="1920x1080 (16:9)",
+        width=1920,
+        height=1080,
+        aspectRatio=16 / 9,
+    ),
+    ResolutionItem(
+        name="1920x1440 (4:3)",
+        width=1920,
+        height=1440,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="1920x1920 (1:1)",
+        width=1920,
+        height=1920,
+        aspectRatio=1,
+    ),
+    ResolutionItem(
+        name="2560x1440 (16:9)",
+        width=2560,
+        height=1440,
+        aspectRatio=16 / 9,
+    ),
+    ResolutionItem(
+        name="2560x1920 (4:3)",
+        width=2560,
+        height=1920,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="2560x2560 (1:1)",
+        width=2560,
+        height=2560,
+        aspectRatio=1,
+    ),
+    ResolutionItem(
+        name="3840x2160 (16:9)",
+        width=3840,
+        height=2160,
+        aspectRatio=16 / 9,
+    ),
+    ResolutionItem(
+        name="3840x2880 (4:3)",
+        width=3840,
+        height=2880,
+        aspectRatio=4 / 3,
+    ),
+    ResolutionItem(
+        name="3840x3840 (1:1)",
+        width=3840,
+        height=3840,
+        aspectRatio=1,
+    ),
+]
+
+# How a source of another aspect ratio is brought to a resolution
+FITS: Dict[str, str] = {
+    "fit": "keep the aspect ratio within the size",
+    "fill": "keep the aspect ratio, crop to the size",
+    "pad": "keep the aspect ratio, letterbox to the size",
+    "stretch": "exactly the size, distorting other aspect ratios",
+}
+DEFAULT_FIT: str = "fit"
+
+# ffmpeg's scaling algorithms, fastest first
+SCALERS: Dict[str, str] = {
+    "fast_bilinear": "fastest, softer",
+    "bilinear": "fast",
+    "bicubic": "balanced",
+    "lanczos": "sharpest, slowest",
+}
+DEFAULT_SCALER: str = "bicubic"
+
+PRESETS: List[str] = [
+    "ultrafast",
+    "superfast",
+    "veryfast",
+    "faster",
+    "fast",
+    "medium",
+    "slow",
+    "slower",
+    "veryslow",
+]
+DEFAULT_PRESET: str = "medium"
+
+FRAME_RATES: List[int | str] = [
+    "auto",
+    60,
+    30,
+    24,
+    15,
+    12,
+    10,
+    8,
+    6,
+    5,
+]
+
+CHUNKS: List[int | str] = [
+    "off",
+    "auto",
+    2,
+    4,
+    8,
+    16,
+    32,
+]
+
+# GIF
+GIF_FRAME_RATE: int = 15  # Used for "auto", a source's 30 or 60 fps mostly makes a GIF larger, not smoother
+GIF_COLORS: List[int] = [256, 128, 64, 32, 16]
+DITHERS: List[str] = ["sierra2_4a", "floyd_steinberg", "bayer", "none"]
+DEFAULT_DITHER: str = "sierra2_4a"
+
+# Audio
+AUDIO_MODES: Dict[str, str] = {
+    "auto": "copy when the container accepts it",
+    "encode": "always re-encode",
+    "none": "drop the audio",
+}
+DEFAULT_AUDIO: str = "auto"
+AUDIO_BITRATES: List[int | str] = ["auto", 64, 96, 128, 160, 192, 256, 320]  # kbit/s
+SAMPLE_RATES: List[int | str] = ["auto", 22050, 32000, 44100, 48000]  # Hz
+CHANNELS: Dict[int | str, str] = {
+    "auto": "no change",
+    1: "mono",
+    2: "stereo",
+    6: "5.1",
+}
+
+# Output size limits in megabytes, e.g. upload limits, encoded in two passes
+TARGET_SIZES: List[int | str] = [
+    "off",
+    8,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+]
+
+
+def find_resolution(value: str) -> ResolutionItem | None:
+    """Finds a resolution by name or by `WIDTHxHEIGHT`"""
+    for item in RESOLUTIONS:
+        if value == item.name or value == f"{item.width}x{item.height}":
+            return item
+    return None
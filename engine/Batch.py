@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List
+
+from . import Scheduler
+from .Job import Job
+from .Journal import Journal
+from .Progress import JsonLinesSink
+from .Runner import JobCallback, MetricsCallback, Runner
+
+
+class Batch:
+    """
+    Runs jobs side by side without Qt, with the same concurrency plan as the GUI queue.
+    Each job blocks one pool thread while its ffmpeg child process does the work,
+    still images are decoded and encoded on the pool thread itself.
+    More jobs can be submitted while others run, e.g. files found by a folder watch.
+
+    With `pin`, the cores are split between the running jobs and each job's processes
+    are pinned to its share, instead of every ffmpeg spreading over all cores.
+    `nice` and `idle_io` lower the priority of the processes.
+    """
+
+    def __init__(self, jobs: List[Job], concurrency: int | None = None, threads: int | None = None,
+                 sink: JsonLinesSink | None = None, journal: Journal | None = None,
+                 pin: bool = False, nice: int = 0, idle_io: bool = False):
+        if jobs and all(job.in_process for job in jobs):
+            schedule = Scheduler.plan_in_process(len(jobs))
+        else:
+            schedule = Scheduler.plan(len(jobs), threads=threads)
+        self.jobs = jobs
+        self.concurrency = concurrency or schedule.concurrency
+        self.threads = threads or schedule.threads
+        self.sink = sink
+        self.journal = journal
+        self.cores = Scheduler.CorePool() if pin else None
+        self.limits = Scheduler.Limits(nice=nice, idle_io=idle_io)
+
+        self._runners: List[Runner] = []
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._interrupted = False
+        self._pool: ThreadPoolExecutor | None = None
+
+    def run(self, on_started: JobCallback | None = None, on_progress: MetricsCallback | None = None,
+            on_finished: Callable[[Job], None] | None = None) -> List[Job]:
+        futures = self.submit(self.jobs, on_started, on_progress, on_finished)
+        try:
+            return [future.result() for future in futures]
+        finally:
+            self.shutdown()
+
+    def submit(self, jobs: List[Job], on_started: JobCallback | None = None,
+               on_progress: MetricsCallback | None = None,
+               on_finished: Callable[[Job], None] | None = None) -> List["Future[Job]"]:
+        """Queues `jobs` behind those already submitted"""
+        def work(job: Job) -> Job:
+            runner = Runner(job, self.sink, self.journal, self.cores)
+            with self._lock:
+                if self._interrupted:
+                    runner.interrupt()
+                elif self._cancelled:
+                    runner.cancel()
+                self._runners.append(runner)
+            runner.run(on_started, on_progress)
+            with self._lock:
+                self._runners.remove(runner)
+            if on_finished is not None:
+                on_finished(job)
+            return job
+
+        for job in jobs:
+            if not job.threads:
+                job.threads = self.threads
+            job.limits = self.limits
+        if self.journal is not None:
+            # Recorded up front, so jobs that never got to start are resumed too
+            self.journal.record(jobs)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency)
+            return [self._pool.submit(work, job) for job in jobs]
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            runners = list(self._runners)
+        for runner in runners:
+            runner.cancel()
+
+    def interrupt(self) -> None:
+        """Stops like `cancel`, but the jobs stay pending in the journal and the next run resumes them"""
+        with self._lock:
+            self._cancelled = self._interrupted = True
+            runners = list(self._runners)
+        for runner in runners:
+            runner.interrupt()
+
+    def shutdown(self) -> None:
+        """Waits for the submitted jobs to finish"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
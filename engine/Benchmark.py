@@ -0,0 +1,295 @@
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+from constant import Option
+from constant.File import TARGETS, Audio, File, Image, Video
+from util.system import get_cache_directory, get_ffmpeg_path, walk_files
+
+from . import Probe, Scheduler
+from .Job import JobState, make_job
+from .Process import FFmpegError, FFmpegProcess
+from .Runner import Runner
+from .Spec import ConversionSpec
+
+# Defaults of a run, small enough for a laptop and large enough to show the cost of each path
+SIZES: List[str] = ["640x480", "1280x720", "1920x1080"]
+DURATION: float = 5.0  # Seconds of each synthetic video
+REPEATS: int = 3  # Runs per case, the median is kept
+TREE_FILES: int = 10_000  # Files classified by the classification case
+THRESHOLD: float = 0.15  # Slowdown over the baseline reported as a regression
+MIN_DELTA: float = 0.05  # Seconds, smaller differences are noise whatever the ratio
+
+KINDS: List[str] = ["remux", "transcode", "gif", "image", "audio", "classify"]
+
+# Encoders of the synthetic sources, all built into a stock ffmpeg except libx264 which conversions need anyway
+_FIXTURE_CODECS: Dict[File, List[str]] = {
+    Video.MP4: ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac"],
+    Video.MOV: ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac"],
+    Video.AVI: ["-c:v", "mpeg4", "-q:v", "4", "-c:a", "pcm_s16le"],
+    Video.MPEG: ["-c:v", "mpeg2video", "-q:v", "4", "-c:a", "mp2"],
+    Image.GIF: ["-vf", "fps=10", "-t", "2"],
+    Image.JPEG: ["-frames:v", "1", "-q:v", "3"],
+    Image.JPG: ["-frames:v", "1", "-q:v", "3"],
+    Image.PNG: ["-frames:v", "1"],
+}
+
+
+class BenchmarkError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str  # Stable across runs, results are compared by it
+    kind: str
+    source: str
+    spec: ConversionSpec | None = None  # None for the classification case
+
+
+@dataclass
+class Result:
+    name: str
+    kind: str
+    seconds: float  # Median of the runs
+    runs: List[float] = field(default_factory=list)
+    size: int = 0  # Output bytes
+    path: str = ""  # What did the work, e.g. the plan or the in-process encoder
+    rate: float = 0.0  # Seconds of video per second, or files per second when classifying
+
+
+def _size(name: str) -> Option.ResolutionItem:
+    item = Option.find_resolution(name)
+    if item is None or not item.width:
+        raise BenchmarkError(f"Unknown size {name!r}")
+    return item
+
+
+def fixture(member: File, size: str, duration: float = DURATION, directory: str | None = None) -> str:
+    """
+    A deterministic synthetic source of `member`'s format, generated once from the
+    testsrc2 and sine lavfi sources and kept in the cache directory.
+    """
+    directory = directory or os.path.join(get_cache_directory(), "benchmark")
+    os.makedirs(directory, exist_ok=True)
+    item = _size(size)
+    extension = member.value.lower()
+    path = os.path.join(directory, f"{extension}-{item.width}x{item.height}-{duration:g}s.{extension}")
+    if os.path.exists(path):
+        return path
+
+    source = ["-f", "lavfi", "-i", f"testsrc2=size={item.width}x{item.height}:rate=30:duration={duration:g}"]
+    if isinstance(member, Video):
+        source += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration:g}"]
+    partial = os.path.join(directory, f".{os.path.basename(path)}")
+    bitexact = ["-fflags", "+bitexact", "-flags", "+bitexact", "-map_metadata", "-1"]
+    try:
+        FFmpegProcess([*source, *_FIXTURE_CODECS[member], *bitexact, "-f", _muxer(member), partial]).run()
+    except FFmpegError as e:
+        raise BenchmarkError(f"Cannot generate the {member.value} fixture: {e}") from e
+    os.replace(partial, path)
+    return path
+
+
+def _muxer(member: File) -> str:
+    # The partial's extension is hidden behind the dot prefix, name the muxer instead
+    return {
+        Video.MP4: "mp4", Video.MOV: "mov", Video.AVI: "avi", Video.MPEG: "mpeg",
+        Image.GIF: "gif", Image.JPEG: "image2", Image.JPG: "image2", Image.PNG: "image2",
+    }[member]
+
+
+def tree(files: int, sources: Sequence[str], directory: str | None = None) -> str:
+    """
+    A directory tree of `files` hardlinks (copies across devices) to the `sources`,
+    100 per directory, some renamed to the wrong extension so sniffing has work to do.
+    """
+    directory = directory or os.path.join(get_cache_directory(), "benchmark", f"tree-{files}")
+    marker = os.path.join(directory, ".complete")
+    if os.path.exists(marker):
+        return directory
+    shutil.rmtree(directory, ignore_errors=True)
+    for index in range(files):
+        source = sources[index % len(sources)]
+        extension = os.path.splitext(source)[1] if index % 10 else ".mp4"
+        folder = os.path.join(directory, f"{index // 10_000:02d}", f"{index // 100 % 100:02d}")
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, f"file-{index}{extension}")
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+    open(marker, "w").close()
+    return directory
+
+
+def cases(sizes: Sequence[str] = SIZES, duration: float = DURATION, kinds: Sequence[str] = KINDS,
+          tree_files: int = TREE_FILES) -> List[Case]:
+    """Every convert path for the sources of every format and size, generating missing fixtures"""
+    found: List[Case] = []
+    for size in sizes:
+        for member in [*Video, *Image]:
+            source = fixture(member, size, duration)
+            label = f"{member.value} {size}"
+            for target in TARGETS.get(member, []):
+                spec = ConversionSpec(target=target)
+                if target == Image.GIF:
+                    kind = "gif"
+                elif isinstance(target, Image):
+                    kind = "image"
+                elif isinstance(target, Audio):
+                    kind = "audio"  # Extracted without decoding the video
+                else:
+                    kind = "remux"  # The planner copies what the container accepts, see Result.path
+                if kind in kinds:
+                    found.append(Case(f"{kind} {label} -> {target.value}", kind, source, spec))
+            if isinstance(member, Video) and "transcode" in kinds:
+                # Scaling to the source size forces an encode without changing the work per frame
+                item = _size(size)
+                target = next(target for target in TARGETS[member] if isinstance(target, Video))
+                spec = ConversionSpec(target=target, width=item.width, height=item.height)
+                found.append(Case(f"transcode {label} -> {target.value}", "transcode", source, spec))
+
+    if "classify" in kinds and tree_files > 0:
+        sources = [fixture(member, sizes[0], duration) for member in [*Video, *Image]]
+        found.append(Case(f"classify {tree_files} files", "classify", tree(tree_files, sources)))
+    return found
+
+
+@contextlib.contextmanager
+def _cold_caches(directory: str) -> Iterator[None]:
+    """
+    Empty probe and palette caches, so every run probes and analyses palettes like the
+    first export of a file does, instead of timing cache hits from the previous repeat
+    """
+    cache_directory = os.path.join(directory, "cache")
+    environment = os.environ.get("MEDIARAGE_CACHE_DIR")
+    os.environ["MEDIARAGE_CACHE_DIR"] = cache_directory
+    previous = Probe.use_cache(Probe.ProbeCache())
+    try:
+        yield
+    finally:
+        Probe.use_cache(previous)
+        if environment is None:
+            del os.environ["MEDIARAGE_CACHE_DIR"]
+        else:
+            os.environ["MEDIARAGE_CACHE_DIR"] = environment
+        shutil.rmtree(cache_directory, ignore_errors=True)
+
+
+def _convert(case: Case, directory: str) -> Result:
+    assert case.spec is not None
+    output = os.path.join(directory, f"output.{case.spec.target.value.lower()}")
+    with _cold_caches(directory):
+        job = make_job(case.source, output, case.spec, cache=False, threads=Scheduler.plan(1).threads)
+        runner = Runner(job)
+        started = time.perf_counter()
+        state = runner.run()
+        seconds = time.perf_counter() - started
+    if state != JobState.DONE:
+        raise BenchmarkError(f"{case.name} failed: {job.error}")
+    # The plan for plain ffmpeg runs, otherwise the encoder, e.g. GifEncode or ImageEncode
+    plain = isinstance(runner.process, FFmpegProcess) and job.plan is not None
+    path = job.plan.name if plain and job.plan is not None else type(runner.process).__name__
+    result = Result(case.name, case.kind, seconds, size=os.path.getsize(output), path=path)
+    os.remove(output)
+    if job.duration and seconds:
+        result.rate = job.duration / seconds
+    return result
+
+
+def _classify(case: Case) -> Result:
+    started = time.perf_counter()
+    files = 0
+    for path in walk_files([case.source]):
+        File.from_path(path, sniff=True)
+        files += 1
+    seconds = time.perf_counter() - started
+    return Result(case.name, case.kind, seconds, path="sniff", rate=files / seconds if seconds else 0.0)
+
+
+def run(found: Sequence[Case], repeats: int = REPEATS,
+        on_result: Callable[[Result], None] | None = None) -> List[Result]:
+    """Runs every case `repeats` times on the calling thread, one at a time"""
+    results: List[Result] = []
+    directory = tempfile.mkdtemp(prefix="mediarage-benchmark-")
+    try:
+        for case in found:
+            runs = [_classify(case) if case.kind == "classify" else _convert(case, directory)
+                    for _ in range(max(1, repeats))]
+            result = runs[0]
+            result.runs = [attempt.seconds for attempt in runs]
+            result.seconds = statistics.median(result.runs)
+            result.rate = statistics.median(attempt.rate for attempt in runs)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def machine() -> Dict[str, Any]:
+    """What the numbers depend on, results are only comparable between equal machines"""
+    try:
+        version = subprocess.run([get_ffmpeg_path(), "-version"], capture_output=True, text=True).stdout
+    except OSError:
+        version = ""
+    return {
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cores": Scheduler.get_cpu_count(),
+        "python": sys.version.split()[0],
+        "ffmpeg": version.splitlines()[0] if version else None,
+    }
+
+
+def report(results: Sequence[Result], settings: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "version": 1,
+        "time": time.time(),
+        "machine": machine(),
+        "settings": settings,
+        "thresholds": {"default": THRESHOLD},
+        "results": [asdict(result) for result in results],
+    }
+
+
+def regressions(results: Sequence[Result], baseline: Dict[str, Any], threshold: float | None = None) -> List[str]:
+    """
+    Cases slower than in `baseline` (an earlier report) by more than their threshold.
+    Thresholds come from `threshold`, else the baseline's per-kind or default thresholds.
+    """
+    thresholds = baseline.get("thresholds", {})
+    before = {result["name"]: result for result in baseline.get("results", [])}
+    found: List[str] = []
+    for result in results:
+        previous = before.get(result.name)
+        if previous is None:
+            continue
+        limit = threshold if threshold is not None else thresholds.get(result.kind, thresholds.get("default", THRESHOLD))
+        slower = result.seconds - previous["seconds"]
+        if slower > MIN_DELTA and result.seconds > previous["seconds"] * (1 + limit):
+            found.append(
+                f"{result.name}: {result.seconds:.3f}s, was {previous['seconds']:.3f}s "
+                f"(+{slower / previous['seconds']:.0%}, threshold {limit:.0%})"
+            )
+    return found
+
+
+def load(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        raise BenchmarkError(f"Cannot read the baseline {path}: {e}") from e
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from util.fingerprint import fingerprint
+from util.system import get_cache_directory, get_output_cache_limit
+
+from .Spec import ConversionSpec
+
+
+@dataclass(frozen=True)
+class Entry:
+    key: str
+    path: str  # The cached output, inside the cache directory
+    size: int
+    source: str  # Input it was converted from when stored, for display only
+    created: float
+    accessed: float
+    hits: int
+
+
+def _place(source: str, destination: str) -> None:
+    """Hardlinks `source` to `destination`, copying when linking is not possible (e.g. across devices)"""
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, temporary = tempfile.mkstemp(prefix=".mediarage-", dir=directory)
+    os.close(fd)
+    try:
+        shutil.copy2(source, temporary)  # Also copies the permissions, mkstemp creates private files
+        os.replace(temporary, destination)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class OutputCache:
+    """
+    Converted outputs, addressed by the input content and the conversion settings.
+
+    Converting the same content with the same ConversionSpec again, from any path,
+    hardlinks (or copies) the stored output instead of running ffmpeg. The least
+    recently used outputs are dropped once their total size passes `limit`.
+    Outputs are hardlinked into the cache too, so they take no extra space
+    unless the original is deleted.
+    """
+
+    def __init__(self, directory: str, limit: int, full_hash: bool = False):
+        self.directory = directory
+        self.limit = limit
+        self.full_hash = full_hash
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS outputs (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS outputs_accessed ON outputs (accessed);
+        """)
+
+    def key(self, input_path: str, spec: ConversionSpec) -> str:
+        """Raises OSError when the input cannot be read"""
+        content = fingerprint(input_path, full=self.full_hash)
+        return hashlib.blake2b(f"{content}\n{spec.output_key()}".encode(), digest_size=16).hexdigest()
+
+    def fetch(self, key: str, output: str) -> bool:
+        """Places the stored output for `key` at `output`, False when there is none"""
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT path, size FROM outputs WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                return False
+            if row is None:
+                return False
+            path, size = row
+            try:
+                intact = os.path.getsize(path) == size
+            except OSError:
+                intact = False
+            if not intact:
+                # Deleted or modified through a hardlinked output
+                self._forget(key, path)
+                return False
+
+            try:
+                _place(path, output)
+            except OSError:
+                return False
+            try:
+                with self._db:
+                    self._db.execute(
+                        "UPDATE outputs SET accessed = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+                    )
+            except sqlite3.Error:
+                pass
+            return True
+
+    def store(self, key: str, output: str, source: str) -> None:
+        """Keeps `output` for reuse, evicting older outputs to stay within the limit"""
+        try:
+            size = os.path.getsize(output)
+        except OSError:
+            return
+        if size > self.limit:
+            return
+
+        _, extension = os.path.splitext(output)
+        path = os.path.join(self.directory, f"{key}{extension.lower()}")
+        with self._lock:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                _place(output, path)
+                now = time.time()
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO outputs (key, path, size, source, created, accessed) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, path, size, os.path.abspath(source), now, now),
+                    )
+                self._evict()
+            except (OSError, sqlite3.Error):
+                # Only a cache, the conversion itself succeeded
+                pass
+
+    def entries(self) -> List[Entry]:
+        """Stored outputs, most recently used first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, path, size, source, created, accessed, hits FROM outputs ORDER BY accessed DESC"
+            ).fetchall()
+        return [Entry(*row) for row in rows]
+
+    def usage(self) -> Tuple[int, int]:
+        """Number of stored outputs and their total size in bytes"""
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outputs").fetchone()
+        return count, size
+
+    def purge(self, unused_for: float | None = None) -> int:
+        """Removes every output, or those not used for `unused_for` seconds, returns the bytes freed"""
+        cutoff = time.time() - unused_for if unused_for is not None else float("inf")
+        with self._lock:
+            rows = self._db.execute("SELECT key, path, size FROM outputs WHERE accessed < ?", (cutoff,)).fetchall()
+            for key, path, _ in rows:
+                self._forget(key, path)
+        return sum(size for _, _, size in rows)
+
+    def _evict(self) -> None:
+        total = 0
+        for key, path, size in self._db.execute("SELECT key, path, size FROM outputs ORDER BY accessed DESC").fetchall():
+            total += size
+            if total > self.limit:
+                self._forget(key, path)
+
+    def _forget(self, key: str, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        try:
+            with self._db:
+                self._db.execute("DELETE FROM outputs WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+
+_cache: OutputCache | None = None
+_cache_lock = threading.Lock()
+_cache_failed = False
+
+
+def get_output_cache() -> OutputCache | None:
+    """Shared cache in the user cache directory, None when disabled or not writable"""
+    global _cache, _cache_failed
+    with _cache_lock:
+        if _cache is None and not _cache_failed:
+            limit = get_output_cache_limit()
+            try:
+                if limit > 0:
+                    _cache = OutputCache(os.path.join(get_cache_directory(), "outputs"), limit)
+            except (OSError, sqlite3.Error):
+                pass
+            _cache_failed = _cache is None
+        return _cache
@@ -0,0 +1,318 @@
+import functools
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Sequence
+
+from constant.File import Video
+from util.system import get_cache_directory, get_ffmpeg_path
+
+from . import Scheduler
+from .Probe import MediaInfo, probe_cached
+from .Process import FFmpegProcess, ProgressCallback
+from .Progress import Metrics
+from .Spec import ConversionSpec
+
+# Grid tried by default, the extremes are rarely worth their speed or size
+PRESETS: List[str] = ["veryfast", "faster", "fast", "medium", "slow"]
+CRFS: List[int] = [18, 23, 28]
+
+SAMPLES: int = 3  # Excerpts taken from across the input
+SAMPLE_SECONDS: float = 4.0
+
+METRICS: List[str] = ["none", "ssim", "psnr", "vmaf"]  # vmaf needs ffmpeg built with libvmaf, see available_metrics
+
+
+class CalibrationError(RuntimeError):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def _has_filter(name: str) -> bool:
+    try:
+        output = subprocess.run(
+            [get_ffmpeg_path(), "-hide_banner", "-filters"], stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        ).stdout
+    except OSError:
+        return False
+    # Lines such as ` ... libvmaf           VV->V      Calculate the VMAF ...`, after the flags
+    return any(line.split()[1:2] == [name] for line in output.splitlines())
+
+
+def available_metrics() -> List[str]:
+    """METRICS the installed ffmpeg can measure, stock builds lack libvmaf"""
+    return [metric for metric in METRICS if metric != "vmaf" or _has_filter("libvmaf")]
+
+
+@dataclass(frozen=True)
+class Trial:
+    preset: str
+    crf: int
+    fps: float  # Encoding speed, comparable between the trials of one run
+    bitrate: float  # Output bitrate, kbit/s
+    quality: float | None = None  # Mean score of the measured metric, higher is better
+
+    def dominates(self, other: "Trial") -> bool:
+        """At least as fast, small and good as `other`, and better in one of them"""
+        quality, other_quality = self.quality or 0.0, other.quality or 0.0
+        return (
+            self.fps >= other.fps and self.bitrate <= other.bitrate and quality >= other_quality
+            and (self.fps > other.fps or self.bitrate < other.bitrate or quality > other_quality)
+        )
+
+
+def pareto(trials: Sequence[Trial]) -> List[Trial]:
+    """Trials no other trial beats on speed, size and quality at once, fastest first"""
+    front = [trial for trial in trials if not any(other.dominates(trial) for other in trials)]
+    return sorted(front, key=lambda trial: -trial.fps)
+
+
+def recommend(trials: Sequence[Trial], max_bitrate: float | None = None,
+              min_quality: float | None = None) -> Trial | None:
+    """The fastest trial within the bitrate and quality targets, None when no trial meets them"""
+    fitting = [
+        trial for trial in trials
+        if (max_bitrate is None or trial.bitrate <= max_bitrate)
+        and (min_quality is None or (trial.quality is not None and trial.quality >= min_quality))
+    ]
+    if not fitting:
+        return None
+    return max(fitting, key=lambda trial: (trial.fps, -trial.bitrate))
+
+
+def _filter_path(path: str) -> str:
+    """Escapes a path for use as a filter option value"""
+    return path.replace("\\", "/").replace(":", "\\\\:").replace("'", "\\\\'")
+
+
+def _read_score(metric: str, path: str) -> float | None:
+    """Mean score from the stats file written by the ssim, psnr or libvmaf filter"""
+    with open(path, encoding="utf-8") as file:
+        if metric == "vmaf":
+            return float(json.load(file)["pooled_metrics"]["vmaf"]["mean"])
+        field = "All:" if metric == "ssim" else "psnr_avg:"
+        scores = []
+        for line in file:
+            for part in line.split():
+                if part.startswith(field):
+                    value = part.removeprefix(field)
+                    # Identical frames have an infinite PSNR
+                    scores.append(100.0 if value == "inf" else float(value))
+    return sum(scores) / len(scores) if scores else None
+
+
+class Profile:
+    """Calibration results of this machine, so the same kind of source is only calibrated once"""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(get_cache_directory(), "calibration.json")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(info: MediaInfo, presets: Sequence[str], crfs: Sequence[int], metric: str) -> str:
+        video = info.video
+        data = {
+            "machine": [platform.node(), platform.machine(), Scheduler.get_cpu_count(), get_ffmpeg_path()],
+            "source": [video.codec, video.width, video.height, round(video.frame_rate)] if video else None,
+            "grid": [list(presets), list(crfs), metric, SAMPLES, SAMPLE_SECONDS],
+        }
+        return hashlib.blake2b(json.dumps(data).encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> List[Trial] | None:
+        trials = self._read().get(key)
+        return [Trial(**trial) for trial in trials] if trials is not None else None
+
+    def put(self, key: str, trials: Sequence[Trial]) -> None:
+        with self._lock:
+            data = self._read()
+            data[key] = [asdict(trial) for trial in trials]
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(temporary, self.path)
+
+    def _read(self) -> Dict[str, list]:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+
+class Calibration:
+    """
+    Encodes a few short excerpts of an input with every preset and CRF of a grid,
+    measuring speed, bitrate and optionally quality against the excerpts.
+
+    Trials run side by side like a batch, so their fps are comparable with each other
+    rather than with a lone conversion. Results are kept in the machine's Profile.
+    """
+
+    def __init__(self, input_file: str, presets: Sequence[str] = PRESETS, crfs: Sequence[int] = CRFS,
+                 metric: str = "ssim", profile: Profile | None = None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, use one of {', '.join(METRICS)}")
+        self.input = input_file
+        self.presets = list(presets)
+        self.crfs = list(crfs)
+        self.metric = metric
+        self.profile = profile if profile is not None else Profile()
+
+        self._lock = threading.Lock()
+        self._processes: List[FFmpegProcess] = []
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self, on_trial: Callable[[Trial], None] | None = None, refresh: bool = False) -> List[Trial]:
+        """Blocking, returns every trial, from the profile unless `refresh` is set"""
+        if self.metric not in available_metrics():
+            raise CalibrationError(
+                f"Measuring {self.metric} needs ffmpeg built with lib{self.metric}, use ssim or psnr instead"
+            )
+        info = probe_cached(self.input)
+        if info.video is None:
+            raise CalibrationError(f"{self.input} has no video to calibrate with")
+
+        key = Profile.key(info, self.presets, self.crfs, self.metric)
+        trials = None if refresh else self.profile.get(key)
+        if trials is not None:
+            for trial in trials:
+                if on_trial is not None:
+                    on_trial(trial)
+            return trials
+
+        grid = [(preset, crf) for preset in self.presets for crf in self.crfs]
+        schedule = Scheduler.plan(len(grid))
+        workdir = tempfile.mkdtemp(prefix="calibration-", dir=get_cache_directory())
+        try:
+            samples = self._extract(info, workdir)
+            if self._cancelled:
+                return []
+            with ThreadPoolExecutor(max_workers=schedule.concurrency) as pool:
+                futures = [
+                    pool.submit(self._trial, preset, crf, samples, workdir, schedule.threads)
+                    for preset, crf in grid
+                ]
+                trials = []
+                try:
+                    for future in futures:
+                        trial = future.result()
+                        if self._cancelled:
+                            return []
+                        trials.append(trial)
+                        if on_trial is not None:
+                            on_trial(trial)
+                except Exception:
+                    # A failed trial most likely fails them all, stop instead of waiting for each
+                    self.cancel()
+                    raise
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        try:
+            self.profile.put(key, trials)
+        except OSError:
+            # Unwritable cache directory, calibrating again next time
+            pass
+        return trials
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            process.cancel()
+
+    def _run(self, args: List[str], on_progress: ProgressCallback | None = None) -> None:
+        process = FFmpegProcess(args)
+        with self._lock:
+            if self._cancelled:
+                return
+            self._processes.append(process)
+        try:
+            process.run(on_progress)
+        finally:
+            with self._lock:
+                self._processes.remove(process)
+
+    def _extract(self, info: MediaInfo, workdir: str) -> List[str]:
+        """Copies excerpts spread over the input, without re-encoding"""
+        if info.duration <= SAMPLE_SECONDS * SAMPLES:
+            starts = [0.0]
+        else:
+            step = info.duration / (SAMPLES + 1)
+            starts = [step * (i + 1) - SAMPLE_SECONDS / 2 for i in range(SAMPLES)]
+
+        samples = []
+        for i, start in enumerate(starts):
+            path = os.path.join(workdir, f"sample-{i}.mkv")
+            self._run([
+                "-ss", f"{start:.3f}", "-i", self.input, "-t", f"{SAMPLE_SECONDS:.3f}",
+                "-map", "0:v:0", "-an", "-sn", "-dn", "-c", "copy", path,
+            ])
+            samples.append(path)
+        return samples
+
+    def _trial(self, preset: str, crf: int, samples: List[str], workdir: str, threads: int) -> Trial:
+        args = ConversionSpec(target=Video.MP4, crf=crf, preset=preset).compile()
+        frames, seconds, size, duration = 0, 0.0, 0, 0.0
+        scores = []
+        for i, sample in enumerate(samples):
+            if self._cancelled:
+                break
+            encoded = os.path.join(workdir, f"{preset}-{crf}-{i}.mkv")
+            latest: List[Metrics] = []
+            started = time.monotonic()
+            self._run(
+                ["-i", sample, "-map", "0:v:0", *args, "-threads", str(threads), encoded],
+                lambda block: latest.append(Metrics.from_block(block)),
+            )
+            seconds += time.monotonic() - started
+            if latest:
+                frames += max(metrics.frame for metrics in latest)
+                duration += max(metrics.out_time for metrics in latest)
+            if os.path.exists(encoded):
+                size += os.path.getsize(encoded)
+
+            if self.metric != "none" and not self._cancelled:
+                score = self._score(encoded, sample, os.path.join(workdir, f"{preset}-{crf}-{i}.log"))
+                if score is not None:
+                    scores.append(score)
+            if os.path.exists(encoded):
+                os.remove(encoded)
+
+        return Trial(
+            preset=preset,
+            crf=crf,
+            fps=frames / seconds if seconds > 0 else 0.0,
+            bitrate=size * 8 / duration / 1000 if duration > 0 else 0.0,
+            quality=sum(scores) / len(scores) if scores else None,
+        )
+
+    def _score(self, encoded: str, reference: str, stats: str) -> float | None:
+        path = _filter_path(stats)
+        measure = {
+            "ssim": f"ssim=stats_file={path}",
+            "psnr": f"psnr=stats_file={path}",
+            "vmaf": f"libvmaf=log_path={path}:log_fmt=json",
+        }[self.metric]
+        self._run([
+            "-i", encoded, "-i", reference,
+            "-lavfi", f"[0:v]setpts=PTS-STARTPTS[a];[1:v]setpts=PTS-STARTPTS[b];[a][b]{measure}",
+            "-f", "null", "-",
+        ])
+        try:
+            return _read_score(self.metric, stats)
+        except (OSError, ValueError, KeyError):
+            return None
@@ -0,0 +1,308 @@
+import bisect
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from . import Command, Scheduler
+from .Job import Job
+from .Journal import Journal
+from .Process import FFmpegProcess, ProgressCallback
+from .Progress import Metrics, format_seconds
+from .Probe import ProbeError, keyframes_cached, packet_times, probe_cached
+
+# Segments shorter than this cost more in process start-up and encoder warm-up than they win
+MIN_SEGMENT_SECONDS: float = 10.0
+
+# Allowed frame durations around a join, as a factor of the source's own durations there either way:
+# longer ones mean dropped frames, shorter ones repeated frames
+MAX_GAP_FRAMES: float = 1.5
+JOIN_WINDOW: float = 2.0  # Seconds of packets read around each join
+TIMESTAMP_SLACK: float = 0.001  # Rounding of the timestamps ffprobe prints
+
+
+class ChunkError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Segment:
+    index: int
+    start: float
+    end: float  # Exclusive, the next segment's first keyframe or the duration
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def split(keyframes: Tuple[float, ...], duration: float, count: int,
+          min_length: float = MIN_SEGMENT_SECONDS) -> List[Segment]:
+    """
+    Splits `duration` into about `count` even segments, each starting on a keyframe
+    so every segment decodes on its own without reference to the previous one.
+    """
+    if count < 2 or duration <= 0 or not keyframes:
+        return [Segment(0, 0.0, duration)]
+
+    starts = [0.0]
+    step = duration / count
+    candidates = iter(sorted(k for k in keyframes if k > 0))
+    keyframe = next(candidates, None)
+    for i in range(1, count):
+        target = step * i
+        while keyframe is not None and (keyframe < target or keyframe - starts[-1] < min_length):
+            keyframe = next(candidates, None)
+        if keyframe is None or duration - keyframe < min_length:
+            break
+        starts.append(keyframe)
+
+    ends = starts[1:] + [duration]
+    return [Segment(i, start, end) for i, (start, end) in enumerate(zip(starts, ends))]
+
+
+def _window(path: str, point: float) -> Tuple[float, ...]:
+    return packet_times(path, interval=f"{max(0.0, point - JOIN_WINDOW):.3f}%{point + JOIN_WINDOW:.3f}")
+
+
+def _steps(times: Tuple[float, ...], point: float, slack: float) -> Tuple[float | None, float | None]:
+    """Frame durations before and after the first frame at `point`, None at either end"""
+    index = bisect.bisect_left(times, point - slack)
+    before = times[index] - times[index - 1] if 0 < index < len(times) else None
+    after = times[index + 1] - times[index] if index + 1 < len(times) else None
+    return before, after
+
+
+def verify_continuity(path: str, source: str, joins: Sequence[float], start: float = 0.0) -> None:
+    """
+    Raises ChunkError when the video timestamps of `path`, joined from parts of `source`
+    at the source times `joins`, jump or repeat at a join. The frames around each join are
+    compared with the source's own frames there, so variable frame rates pass. `start` is
+    the source time the output begins at.
+    """
+    if not joins:
+        return
+    try:
+        output_first = min(_window(path, 0.0), default=0.0)
+        source_first = min((t for t in _window(source, start) if t >= start - TIMESTAMP_SLACK), default=start)
+        for join in joins:
+            expected = _steps(_window(source, join), join, TIMESTAMP_SLACK)
+            position = output_first + join - source_first
+            # The output may be shifted by up to half a frame against the source
+            slack = (expected[0] or expected[1] or 0.0) / 2 + TIMESTAMP_SLACK
+            actual = _steps(_window(path, position), position, slack)
+            for want, got in zip(expected, actual):
+                if want is None or got is None:
+                    continue
+                if got <= want / MAX_GAP_FRAMES - TIMESTAMP_SLACK or got > want * MAX_GAP_FRAMES + TIMESTAMP_SLACK:
+                    raise ChunkError(
+                        f"Timestamp discontinuity at {position:.3f}s "
+                        f"({got * 1000:.1f}ms gap, {want * 1000:.1f}ms in the source)"
+                    )
+    except ProbeError as e:
+        raise ChunkError(f"Cannot read the joined output: {e}") from e
+
+
+class ChunkedEncode:
+    """
+    Encodes the video of a job as keyframe-aligned segments in parallel, then joins
+    them losslessly with the concat demuxer.
+
+    Each segment is its own ffmpeg process, so the segments spread over all cores even
+    when a single encoder (e.g. x264 on veryslow) does not. Audio is encoded once,
+    alongside the segments, and muxed in while joining. With a journal, completed
+    segments are recorded and an interrupted encode picks up from them.
+    Quacks like FFmpegProcess, so workers can run either.
+    """
+
+    def __init__(self, job: Job, segments: int, journal: Journal | None = None):
+        self.job = job
+        self.segments = segments
+        self.journal = journal
+
+        self._processes: List[FFmpegProcess] = []
+        self._lock = threading.Lock()
+        self._done: Dict[int, Metrics] = {}  # Latest progress of each segment
+        self._cancelled = False
+        self._stopped = False  # Cancelled, or failed elsewhere
+        self._paused = False
+        self._resumed = threading.Event()  # Cleared while paused, segments wait on it before starting
+        self._resumed.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        try:
+            info = probe_cached(self.job.input)
+            keyframes = keyframes_cached(self.job.input)
+        except ProbeError as e:
+            raise ChunkError(f"Cannot split {self.job.input}: {e}") from e
+
+        segments = split(keyframes, info.duration, self.segments)
+        schedule = Scheduler.plan(len(segments), cores=self.job.threads or None)
+        frame_rate = info.video.frame_rate if info.video is not None else 0.0
+        started = time.monotonic()
+
+        def report(index: int, block: Dict[str, str]) -> None:
+            if on_progress is None:
+                return
+            with self._lock:
+                self._done[index] = Metrics.from_block(block)
+                done = list(self._done.values())
+            # Segments run side by side, so their counters and rates add up
+            out_time = sum(metrics.out_time for metrics in done)
+            elapsed = time.monotonic() - started
+            on_progress({
+                "frame": str(sum(metrics.frame for metrics in done)),
+                "fps": f"{sum(metrics.fps for metrics in done if not metrics.finished):.2f}",
+                "total_size": str(sum(metrics.total_size for metrics in done)),
+                "out_time_us": str(int(out_time * 1_000_000)),
+                "out_time": format_seconds(out_time),
+                "speed": f"{out_time / elapsed:.2f}x" if elapsed > 0 else "0x",
+                "progress": "continue",
+            })
+
+        workdir = self._workdir()
+        try:
+            # Segments completed by an interrupted run are kept, as long as the split is the same
+            completed = self.journal.segments(self.job) if self.journal is not None else {}
+            pending: List[Segment] = []
+            for segment in segments:
+                if (completed.get(segment.index) == (segment.start, segment.end)
+                        and os.path.exists(self._segment_path(workdir, segment))):
+                    report(segment.index, {"out_time_us": str(int(segment.duration * 1_000_000)), "progress": "end"})
+                else:
+                    pending.append(segment)
+
+            keeps_audio = info.audio is not None and (self.job.plan is None or self.job.plan.keeps_audio)
+            audio = os.path.join(workdir, "audio.mka") if keeps_audio else None
+            with ThreadPoolExecutor(max_workers=schedule.concurrency + (audio is not None)) as pool:
+                futures = [
+                    pool.submit(
+                        self._encode_segment, segment, workdir, schedule.threads, frame_rate,
+                        lambda block, index=segment.index: report(index, block),
+                    )
+                    for segment in pending
+                ]
+                if audio is not None:
+                    futures.append(pool.submit(self._encode_audio, audio))
+                try:
+                    for future in futures:
+                        future.result()
+                except Exception:
+                    # One failed segment fails the job, stop the others instead of finishing them
+                    self._stop()
+                    raise
+            if self._cancelled:
+                return -1
+
+            self._concat(workdir, segments, audio)
+            if not self._cancelled:
+                verify_continuity(self.job.partial, self.job.input, [segment.start for segment in segments[1:]])
+        finally:
+            if not self._cancelled or self.journal is None:
+                # A cancelled job's completed segments stay in its workdir, the runner decides whether it resumes
+                shutil.rmtree(workdir, ignore_errors=True)
+        return 0
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        self._stop()
+
+    def pause(self) -> None:
+        with self._lock:
+            self._paused = True
+            self._resumed.clear()
+            processes = list(self._processes)
+        for process in processes:
+            process.pause()
+
+    def resume(self) -> None:
+        with self._lock:
+            self._paused = False
+            self._resumed.set()
+            processes = list(self._processes)
+        for process in processes:
+            process.resume()
+
+    def _stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            self._resumed.set()
+            processes = list(self._processes)
+        for process in processes:
+            process.cancel()
+
+    def _run(self, args: List[str], on_progress: ProgressCallback | None = None) -> None:
+        self._resumed.wait()
+        process = FFmpegProcess(args, self.job.limits, self.job.usage)
+        with self._lock:
+            if self._stopped:
+                return
+            self._processes.append(process)
+        try:
+            process.run(on_progress)
+        finally:
+            with self._lock:
+                self._processes.remove(process)
+
+    def _encode_segment(self, segment: Segment, workdir: str, threads: int, frame_rate: float,
+                        on_progress: ProgressCallback) -> None:
+        # Stop half a frame early, so the keyframe starting the next segment is never encoded twice
+        duration = segment.duration - (0.5 / frame_rate if frame_rate else 0.0)
+        self._run([
+            "-ss", f"{segment.start:.6f}",
+            *Command.decoder_thread_args(threads),
+            "-i", self.job.input,
+            "-t", f"{duration:.6f}",
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            *self.job.args,
+            *Command.thread_args(threads, x264=True),
+            self._segment_path(workdir, segment),
+        ], on_progress)
+        if self.journal is not None and not self._stopped:
+            self.journal.add_segment(self.job, segment.index, segment.start, segment.end)
+
+    def _encode_audio(self, path: str) -> None:
+        codec = self.job.plan.audio_codec_args() if self.job.plan is not None else ["-c:a", "aac"]
+        self._run([
+            "-i", self.job.input,
+            "-map", "0:a:0", "-vn", "-sn", "-dn",
+            *codec,
+            path,
+        ])
+
+    def _concat(self, workdir: str, segments: List[Segment], audio: str | None) -> None:
+        playlist = os.path.join(workdir, "segments.txt")
+        with open(playlist, "w", encoding="utf-8") as file:
+            for segment in segments:
+                # The concat demuxer expects single quotes escaped as '\''
+                path = self._segment_path(workdir, segment).replace("'", "'\\''")
+                file.write(f"file '{path}'\n")
+
+        args = ["-f", "concat", "-safe", "0", "-i", playlist]
+        if audio is not None:
+            args += ["-i", audio, "-map", "0:v:0", "-map", "1:a:0"]
+        self._run([*args, "-c", "copy", self.job.partial])
+
+    def _workdir(self) -> str:
+        """Segments of journaled jobs go to the job's workdir, found again on resume"""
+        directory = os.path.dirname(os.path.abspath(self.job.partial))
+        if self.journal is None:
+            return tempfile.mkdtemp(prefix=".mediarage-", dir=directory)
+        os.makedirs(self.job.workdir, exist_ok=True)
+        return self.job.workdir
+
+    @staticmethod
+    def _segment_path(workdir: str, segment: Segment) -> str:
+        return os.path.join(workdir, f"segment-{segment.index:05d}.mkv")
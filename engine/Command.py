@@ -0,0 +1,178 @@
+from typing import Dict, List
+
+from constant import Option
+from constant.File import Audio, File, Video
+from constant.Option import ResolutionItem
+
+# Each option compiles to its own ffmpeg output arguments, ConversionSpec puts them together
+
+
+def codec_args(target: File) -> List[str]:
+    if isinstance(target, Video):
+        return ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+    return []
+
+
+# Audio encoders of each target, those ffmpeg picks for the container anyway, named so options apply to them
+AUDIO_ENCODERS: Dict[File, str] = {
+    Video.MP4: "aac",
+    Video.MOV: "aac",
+    Video.MPEG: "mp2",
+    Video.AVI: "libmp3lame",
+    Audio.M4A: "aac",
+    Audio.MP3: "libmp3lame",
+}
+
+
+def audio_args(target: File, bitrate: int | str = "auto", sample_rate: int | str = "auto",
+               channels: int | str = "auto") -> List[str]:
+    """Encoder, bitrate, resampling and downmixing of the audio, all done by the encoding process itself"""
+    if target not in AUDIO_ENCODERS:
+        return []
+    args = ["-c:a", AUDIO_ENCODERS[target]]
+    if bitrate != "auto":
+        args += ["-b:a", f"{bitrate}k"]
+    if sample_rate != "auto":
+        args += ["-ar", str(sample_rate)]
+    if channels != "auto":
+        args += ["-ac", str(channels)]
+    return args
+
+
+def crf_args(crf: int) -> List[str]:
+    return ["-crf", str(crf)]
+
+
+def scale_filter(width: int, height: int = 0, fit: str = Option.DEFAULT_FIT,
+                 scaler: str = Option.DEFAULT_SCALER) -> str:
+    """
+    Scales into a `width` x `height` box. `fit` keeps the aspect ratio inside the box,
+    `fill` covers the box and crops the overflow, `pad` fits and letterboxes to the exact
+    size, `stretch` ignores the aspect ratio. Except when stretching, sources are never
+    upscaled and -2 derives the other side, rounded to even as the encoders need.
+    Without a height only the width is bounded.
+    """
+    flags = f"flags={scaler}"
+    w = f"trunc(min({width},iw)/2)*2"
+    h = f"trunc(min({height},ih)/2)*2"
+    if not height:
+        return f"scale=w='{w}':h=-2:{flags}"
+    if fit == "stretch":
+        return f"scale={width}:{height}:{flags}"
+
+    wider = f"gt(a,{width}/{height})"
+    if fit == "fill":
+        # Bound the shorter side, the crop then takes the middle of the longer one
+        return (
+            f"scale=w='if({wider},-2,{w})':h='if({wider},{h},-2)':{flags},"
+            f"crop=w='{w}':h='{h}'"
+        )
+    chain = f"scale=w='if({wider},{w},-2)':h='if({wider},-2,{h})':{flags}"
+    if fit == "pad":
+        chain += f",pad={width}:{height}:-1:-1"
+    return chain
+
+
+def resolution_filter(item: ResolutionItem | None, fit: str = Option.DEFAULT_FIT,
+                      scaler: str = Option.DEFAULT_SCALER) -> str | None:
+    if item is None or not item.width or not item.height:
+        return None
+    return scale_filter(item.width, item.height, fit, scaler)
+
+
+def resolution_args(item: ResolutionItem | None, fit: str = Option.DEFAULT_FIT,
+                    scaler: str = Option.DEFAULT_SCALER) -> List[str]:
+    scale = resolution_filter(item, fit, scaler)
+    return ["-vf", scale] if scale else []
+
+
+def preset_args(preset: str) -> List[str]:
+    return ["-preset", preset]
+
+
+def frame_rate_args(frame_rate: int | str) -> List[str]:
+    if frame_rate == "auto":
+        return []
+    return ["-r", str(frame_rate)]
+
+
+def frame_rate_filter(frame_rate: int | str) -> str | None:
+    """The frame rate inside a filter graph, where `-r` cannot be used"""
+    if frame_rate == "auto":
+        return None
+    return f"fps={frame_rate}"
+
+
+def split_args(branches: List[str]) -> List[str]:
+    """
+    A graph decoding the source once for several outputs: the frames are split and
+    each branch gets its own filter chain (empty for none). Output i maps `[v{i}]`.
+    """
+    labels = "".join(f"[s{i}]" for i in range(len(branches)))
+    graph = [f"[0:v]split={len(branches)}{labels}"]
+    graph += [f"[s{i}]{chain or 'null'}[v{i}]" for i, chain in enumerate(branches)]
+    return ["-filter_complex", ";".join(graph)]
+
+
+def decoder_thread_args(threads: int) -> List[str]:
+    """Input option, decoders otherwise start a thread per core whatever the encoder's budget"""
+    return ["-threads", str(threads)] if threads else []
+
+
+def thread_args(threads: int, x264: bool = False) -> List[str]:
+    """
+    Output option capping the encoder at `threads`. libx264 is also told through its own
+    parameters, its lookahead otherwise sizes itself by the core count.
+    """
+    if not threads:
+        return []
+    args = ["-threads", str(threads)]
+    if x264:
+        args += ["-x264-params", f"threads={threads}"]
+    return args
+
+
+def trim_args(start: float, end: float) -> List[str]:
+    """
+    Input options, placed before `-i`. Seeking on the input jumps to the nearest keyframe
+    without decoding what comes before, encoders then drop the frames up to `start` exactly.
+    """
+    args: List[str] = []
+    if start > 0:
+        args += ["-ss", f"{start:.3f}"]
+    if end > 0:
+        args += ["-t", f"{end - start:.3f}"]
+    return args
+
+
+def gif_filters(frame_rate: int | str, width: int = 0, height: int = 0, fit: str = Option.DEFAULT_FIT,
+                scaler: str = Option.DEFAULT_SCALER) -> str:
+    """Frame rate and size of a GIF, applied before the palette is computed"""
+    filters = [f"fps={Option.GIF_FRAME_RATE if frame_rate == 'auto' else frame_rate}"]
+    if width:
+        filters.append(scale_filter(width, height, fit, scaler))
+    return ",".join(filters)
+
+
+def palettegen_filter(colors: int) -> str:
+    # Only count the changing pixels, the static background would otherwise take most of the palette
+    return f"palettegen=max_colors={colors}:stats_mode=diff"
+
+
+def paletteuse_filter(dither: str) -> str:
+    # Only redraw the changed rectangle of each frame, which GIF stores much smaller
+    return f"paletteuse=dither={dither}:diff_mode=rectangle"
+
+
+def gif_args(frame_rate: int | str, width: int, height: int, colors: int, dither: str,
+             fit: str = Option.DEFAULT_FIT, scaler: str = Option.DEFAULT_SCALER) -> List[str]:
+    """
+    A single graph decoding the source once: the frames are split, one branch builds
+    the palette and the other is mapped onto it once the palette is complete.
+    """
+    graph = (
+        f"[0:v]{gif_filters(frame_rate, width, height, fit, scaler)},split[frames][analysis];"
+        f"[analysis]{palettegen_filter(colors)}[palette];"
+        f"[frames][palette]{paletteuse_filter(dither)}"
+    )
+    return ["-filter_complex", graph]
@@ -0,0 +1,191 @@
+import hashlib
+import math
+import os
+import tempfile
+import threading
+from typing import List
+
+from constant.File import Image
+from util.fingerprint import fingerprint
+from util.system import get_cache_directory
+
+from . import Command
+from .Job import Job
+from .Process import FFmpegProcess, ProgressCallback
+from .Probe import ProbeError, probe_cached
+from .Spec import ConversionSpec
+
+MAX_PALETTES: int = 500  # Palettes kept on disk, the least recently used go first
+MAX_ATTEMPTS: int = 4  # Encodes tried before giving up on an oversized GIF
+RETRY_MARGIN: float = 0.95  # Aim this much below the size budget again after an overshoot
+MIN_WIDTH: int = 64
+
+
+class GifError(RuntimeError):
+    pass
+
+
+def get_palette_directory() -> str:
+    directory = os.path.join(get_cache_directory(), "palettes")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def palette_path(input_path: str, spec: ConversionSpec, width: int, height: int) -> str:
+    """
+    Where the palette of `input_path` is kept. Dithering is applied after the palette,
+    so exports differing only in dithering share it.
+    """
+    key = "|".join(map(str, [
+        fingerprint(input_path), Command.gif_filters(spec.frame_rate, width, height, spec.fit, spec.scaler), spec.colors,
+        spec.start, spec.end,
+    ]))
+    name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return os.path.join(get_palette_directory(), f"{name}.png")
+
+
+class GifEncode:
+    """
+    Exports a job as a GIF.
+
+    The first export decodes the source once through a split/palettegen/paletteuse graph
+    and writes the palette as a second output. Later exports of the same frames, e.g. with
+    another dithering, map them onto the kept palette and skip the analysis. A GIF over the
+    spec's target size is scaled down and mapped again, as often as `MAX_ATTEMPTS` allows.
+    Quacks like FFmpegProcess, so workers can run either.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.spec = job.spec if job.spec is not None else ConversionSpec(target=Image.GIF)
+        self._process: FFmpegProcess | None = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._paused = False
+        self._resumed = threading.Event()  # Cleared while paused, the next encode waits on it before starting
+        self._resumed.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        width, height = self.spec.width, self.spec.height
+        target = int(self.spec.target_size * 1_000_000)
+        palette: str | None = None
+        for _ in range(MAX_ATTEMPTS):
+            # Scaled down frames keep the colors of the first attempt, its palette serves the retries
+            palette = self._encode(width, height, on_progress, palette)
+            if self._cancelled:
+                return -1
+            size = os.path.getsize(self.job.partial)
+            if not target or size <= target:
+                return 0
+
+            # The size follows the pixel count, scale both sides by the root of the overshoot
+            source = width or self._source_width()
+            width = int(source * math.sqrt(target / size) * RETRY_MARGIN)
+            height = 0
+            if width < MIN_WIDTH:
+                break
+        raise GifError(f"Could not fit {self.job.input} into {self.spec.target_size:g} MB")
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            self._resumed.set()
+            process = self._process
+        if process is not None:
+            process.cancel()
+
+    def pause(self) -> None:
+        with self._lock:
+            self._paused = True
+            self._resumed.clear()
+            process = self._process
+        if process is not None:
+            process.pause()
+
+    def resume(self) -> None:
+        with self._lock:
+            self._paused = False
+            self._resumed.set()
+            process = self._process
+        if process is not None:
+            process.resume()
+
+    def _source_width(self) -> int:
+        try:
+            info = probe_cached(self.job.input)
+        except ProbeError as e:
+            raise GifError(f"Cannot size {self.job.input}: {e}") from e
+        if info.video is None or not info.video.width:
+            raise GifError(f"Cannot size {self.job.input}, its width is unknown")
+        # Scaled after ffmpeg autorotates, a portrait clip is as wide as it is coded high
+        return info.video.display_size[0]
+
+    def _encode(self, width: int, height: int, on_progress: ProgressCallback | None,
+                palette: str | None = None) -> str:
+        """Encodes at the given size, returns the palette used"""
+        filters = Command.gif_filters(self.spec.frame_rate, width, height, self.spec.fit, self.spec.scaler)
+        if palette is None or not os.path.exists(palette):
+            palette = palette_path(self.job.input, self.spec, width, height)
+        threads = Command.thread_args(self.job.threads)
+
+        if os.path.exists(palette):
+            os.utime(palette)
+            self._run([
+                *self.job.input_args, "-i", palette,
+                "-filter_complex", f"[0:v]{filters}[frames];[frames][1:v]{Command.paletteuse_filter(self.spec.dither)}",
+                *threads, self.job.partial,
+            ], on_progress)
+            return palette
+
+        fd, temporary = tempfile.mkstemp(prefix=".palette-", suffix=".png", dir=os.path.dirname(palette))
+        os.close(fd)
+        try:
+            self._run([
+                *self.job.input_args,
+                "-filter_complex", (
+                    f"[0:v]{filters},split[frames][analysis];"
+                    f"[analysis]{Command.palettegen_filter(self.spec.colors)},split[palette][kept];"
+                    f"[frames][palette]{Command.paletteuse_filter(self.spec.dither)}[gif]"
+                ),
+                "-map", "[gif]", *threads, self.job.partial,
+                "-map", "[kept]", "-frames:v", "1", "-update", "1", temporary,
+            ], on_progress)
+            if not self._cancelled:
+                os.replace(temporary, palette)
+                _prune(os.path.dirname(palette))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return palette
+
+    def _run(self, args: List[str], on_progress: ProgressCallback | None) -> None:
+        self._resumed.wait()
+        process = FFmpegProcess(args, self.job.limits, self.job.usage)
+        with self._lock:
+            if self._cancelled:
+                return
+            self._process = process
+        try:
+            process.run(on_progress)
+        finally:
+            with self._lock:
+                self._process = None
+
+
+def _prune(directory: str) -> None:
+    try:
+        # Dot files are palettes still being written
+        palettes = [entry for entry in os.scandir(directory) if entry.name.endswith(".png") and entry.name[0] != "."]
+        palettes.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in palettes[MAX_PALETTES:]:
+            os.remove(entry.path)
+    except OSError:
+        pass
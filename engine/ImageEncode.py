@@ -0,0 +1,123 @@
+from typing import Dict
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QPoint, QRect, QSize, Qt
+from PySide6.QtGui import QImage, QImageReader, QImageWriter, QPainter
+
+from constant.File import Image
+from util.exif import insert_exif, read_exif, reset_orientation
+
+from .Job import Job
+from .Process import ProgressCallback
+
+JPEG_QUALITY: int = 90
+FAST_QUALITY: int = 25  # Reader quality of the fast_bilinear scaler, smooth scaling is skipped below 50
+
+# Qt's writer names of the image targets, GIF goes through ffmpeg for its palette
+FORMATS: Dict[Image, bytes] = {
+    Image.JPEG: b"jpeg",
+    Image.JPG: b"jpeg",
+    Image.PNG: b"png",
+}
+
+
+def _pad(image: QImage, size: QSize) -> QImage:
+    """Centres `image` on a black canvas of `size`, like ffmpeg's pad filter"""
+    canvas = QImage(size, QImage.Format.Format_RGB32)
+    canvas.fill(Qt.GlobalColor.black)
+    painter = QPainter(canvas)
+    painter.drawImage(QPoint((size.width() - image.width()) // 2, (size.height() - image.height()) // 2), image)
+    painter.end()
+    return canvas
+
+
+class ImageEncode:
+    """
+    Converts a still image in-process with Qt, no ffmpeg process per file.
+
+    Decodes straight at the output size where the format allows (JPEG), so memory
+    stays bounded by the output rather than the source resolution. Runs on the
+    calling thread, side by side with other images on the worker pool.
+    Quacks like FFmpegProcess, so workers can run either.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def paused(self) -> bool:
+        return False
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        if self._cancelled:
+            return -1
+        spec = self.job.spec
+        target = self.job.target
+        if not isinstance(target, Image) or target not in FORMATS:
+            raise ValueError(f"{target} is not an in-process image format")
+
+        reader = QImageReader(self.job.input)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        bounds = QSize(spec.width, spec.height) if spec is not None and spec.width and spec.height else None
+        if spec is not None and bounds is not None and size.isValid():
+            if spec.scaler == "fast_bilinear":
+                reader.setQuality(FAST_QUALITY)
+            if spec.fit == "stretch":
+                reader.setScaledSize(bounds)
+            elif spec.fit == "fill":
+                # Cover the chosen size without upscaling, and keep the middle
+                box = bounds.boundedTo(size)
+                scaled = size.scaled(box, Qt.AspectRatioMode.KeepAspectRatioByExpanding)
+                reader.setScaledSize(scaled)
+                reader.setScaledClipRect(QRect(
+                    QPoint((scaled.width() - box.width()) // 2, (scaled.height() - box.height()) // 2), box,
+                ))
+            elif size.width() > bounds.width() or size.height() > bounds.height():
+                # Fit inside the chosen size, never upscale
+                reader.setScaledSize(size.scaled(bounds, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            raise OSError(f"Cannot read {self.job.input}: {reader.errorString()}")
+        if spec is not None and bounds is not None and spec.fit == "pad" and image.size() != bounds:
+            image = _pad(image, bounds)
+
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        writer = QImageWriter(buffer, FORMATS[target])
+        if FORMATS[target] == b"jpeg":
+            writer.setQuality(JPEG_QUALITY)
+            writer.setOptimizedWrite(True)
+        if not writer.write(image):
+            raise OSError(f"Cannot encode {self.job.output}: {writer.errorString()}")
+        buffer.close()
+
+        encoded = bytes(data.data())
+        if spec is None or spec.exif:
+            exif = read_exif(self.job.input)
+            if exif is not None:
+                # The pixels were rotated upright while decoding
+                encoded = insert_exif(encoded, reset_orientation(exif))
+
+        if self._cancelled:
+            return -1
+        with open(self.job.partial, "wb") as file:
+            file.write(encoded)
+
+        if on_progress is not None:
+            on_progress({"frame": "1", "total_size": str(len(encoded)), "progress": "end"})
+        return 0
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def pause(self) -> None:
+        """Single images finish too quickly to pause"""
+
+    def resume(self) -> None:
+        """Single images finish too quickly to pause"""
@@ -0,0 +1,275 @@
+import dataclasses
+import itertools
+import os
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Set
+
+from constant.File import File, Image, Video, supports
+from util.system import get_output_path
+
+from . import Command, Planner
+from .Planner import Plan
+from .Probe import ProbeError, probe_cached
+from .Progress import Metrics, Usage
+from .Scheduler import Limits
+from .Spec import ConversionSpec, Rendition
+
+_ids = itertools.count(1)
+
+
+def _partial_path(output: str) -> str:
+    directory, name = os.path.split(output)
+    stem, extension = os.path.splitext(name)
+    # Keeps the extension, ffmpeg picks the container by it
+    return os.path.join(directory, f".{stem}.partial{extension}")
+
+
+def rendition_path(output: str, rendition: Rendition) -> str:
+    """Where a further output goes, named after the main one, e.g. `clip-1280x720.mp4`"""
+    stem, extension = os.path.splitext(output)
+    return f"{stem}-{rendition.name}{extension}"
+
+
+class JobState(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobState.DONE, JobState.FAILED, JobState.CANCELLED)
+
+
+@dataclass
+class RenditionOutput:
+    """A further output of a job, written by the same ffmpeg invocation"""
+
+    output: str
+    spec: ConversionSpec
+    metrics: Metrics | None = None  # Latest progress
+
+    @property
+    def partial(self) -> str:
+        return _partial_path(self.output)
+
+    def measure(self, metrics: Metrics) -> Metrics:
+        """This output's share of the job's progress, the branches advance in lockstep but differ in size"""
+        try:
+            size = os.path.getsize(self.partial)
+        except OSError:
+            size = 0
+        frame = metrics.frame
+        if isinstance(self.spec.frame_rate, int):
+            frame = int(metrics.out_time * self.spec.frame_rate)
+        bitrate = size * 8 / metrics.out_time / 1000 if metrics.out_time > 0 else 0.0
+        return dataclasses.replace(metrics, frame=frame, total_size=size, bitrate=bitrate)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "output": self.output,
+            "spec": self.spec.to_dict(),
+            "metrics": self.metrics.to_dict() if self.metrics else None,
+        }
+
+
+@dataclass
+class Job:
+    input: str
+    output: str
+    args: List[str] = field(default_factory=list)  # Output options, placed between input and output
+    spec: ConversionSpec | None = None  # Settings the args were compiled from
+    threads: int = 0  # ffmpeg -threads, 0 lets the encoder decide
+    target: File | None = None  # Set to let the planner stream copy where possible
+    requires_encode: bool = True  # Whether the options change the picture and rule out copying video
+    plan: Plan | None = None
+    duration: float = 0.0  # Source duration in seconds, 0 when unknown
+    segments: int = 0  # Encode as this many keyframe-aligned chunks in parallel, 0 or 1 disables it
+    cache: bool = True  # Reuse an identical earlier conversion through the output cache, and keep this one
+    cached: bool = False  # Whether the output came from the output cache
+    metrics: Metrics | None = None  # Latest progress
+    state: JobState = JobState.PENDING
+    error: str = ""
+    renditions: List[RenditionOutput] = field(default_factory=list)  # Further outputs, from a single decode
+    limits: Limits = Limits()  # Cores and priority of the ffmpeg processes
+    usage: Usage = field(default_factory=Usage)  # CPU time and contention of the ffmpeg processes
+    id: int = field(default_factory=lambda: next(_ids))
+
+    @property
+    def partial(self) -> str:
+        """Where the output is written, renamed to `output` once complete so it is never left half-written"""
+        return _partial_path(self.output)
+
+    @property
+    def workdir(self) -> str:
+        """Intermediate files that outlive a crash, e.g. completed chunks, found again on resume"""
+        directory, name = os.path.split(self.output)
+        return os.path.join(directory, f".{name}.work")
+
+    @property
+    def input_args(self) -> List[str]:
+        """`-i` and the input options in front of it, e.g. seeking to the trim start"""
+        trim = Command.trim_args(self.spec.start, self.spec.end) if self.spec is not None else []
+        return [*trim, *Command.decoder_thread_args(self.threads), "-i", self.input]
+
+    @property
+    def command(self) -> List[str]:
+        """ffmpeg arguments for this job, without the binary and global flags"""
+        if self.renditions and self.spec is not None:
+            return self.__split_command(self.spec)
+        args = self.plan.args(self.args) if self.plan else [*self.args, *self.__audio_args]
+        threads = Command.thread_args(self.threads, self.encodes_x264)
+        return [*self.input_args, *args, *threads, self.partial]
+
+    def __split_command(self, spec: ConversionSpec) -> List[str]:
+        """Decodes once and splits the frames between the main output and the renditions"""
+        outputs = [(spec, self.partial), *((rendition.spec, rendition.partial) for rendition in self.renditions)]
+        # The encoders share the process's thread budget
+        threads = Command.thread_args(max(1, self.threads // len(outputs)) if self.threads else 0, self.encodes_x264)
+        args = [*self.input_args, *Command.split_args([output_spec.filters() for output_spec, _ in outputs])]
+        for index, (output_spec, path) in enumerate(outputs):
+            encode = list(output_spec.encoder_args())
+            args += [
+                "-map", f"[v{index}]", "-map", "0:a:0?",
+                *(self.plan.args(encode) if self.plan else [*encode, *self.__audio_args]), *threads, path,
+            ]
+        return args
+
+    @property
+    def encodes_x264(self) -> bool:
+        """Whether libx264 encodes the video, known once prepared"""
+        return isinstance(self.target, Video) and (self.plan is None or self.plan.video == Planner.Action.ENCODE)
+
+    @property
+    def __audio_args(self) -> List[str]:
+        """Audio options when the source could not be planned, the plan carries them otherwise"""
+        return list(self.spec.audio_args()) if self.spec is not None else []
+
+    def describe(self) -> Dict[str, Any]:
+        """Identifying fields for logs"""
+        fields = {
+            "job": self.id,
+            "input": self.input,
+            "output": self.output,
+            "args": self.args,
+            "spec": self.spec.to_dict() if self.spec else None,
+            "threads": self.threads,
+            "plan": self.plan.name if self.plan else None,
+            "segments": self.segments if self.chunked else 0,
+            "cached": self.cached,
+            "state": self.state.value,
+        }
+        if self.renditions:
+            fields["renditions"] = [rendition.describe() for rendition in self.renditions]
+        if self.limits.cores:
+            fields["cores"] = sorted(self.limits.cores)
+        if self.usage.processes:
+            fields["usage"] = self.usage.to_dict()
+        return fields
+
+    @property
+    def sized(self) -> bool:
+        """Whether the job encodes to a target size in two passes"""
+        return (
+            self.spec is not None and self.spec.target_size > 0 and isinstance(self.target, Video)
+            and not self.renditions
+        )
+
+    @property
+    def in_process(self) -> bool:
+        """Whether the job is a still image converted without ffmpeg, GIFs still need its palette filters"""
+        return isinstance(self.target, Image) and self.target != Image.GIF
+
+    @property
+    def smart_cut(self) -> bool:
+        """Whether the job trims a stream copied video, known once prepared"""
+        return (
+            self.spec is not None
+            and self.spec.trimmed
+            and isinstance(self.target, Video)
+            and self.plan is not None
+            and self.plan.video == Planner.Action.COPY
+        )
+
+    @property
+    def chunked(self) -> bool:
+        """Whether the job runs as a chunked encode, known once prepared"""
+        return (
+            self.segments > 1
+            and isinstance(self.target, Video)
+            and self.plan is not None
+            and self.plan.video == Planner.Action.ENCODE
+        )
+
+    def prepare(self) -> None:
+        """
+        Reads the source metadata through the probe cache and plans copy-or-encode.
+        Blocking, call it from the thread that runs the job.
+        """
+        try:
+            info = probe_cached(self.input)
+        except ProbeError:
+            # Unreadable metadata, transcode blindly and let ffmpeg report real errors
+            return
+
+        self.duration = self.spec.duration(info.duration) if self.spec is not None else info.duration
+        video = info.video
+        if self.spec is not None and video is not None and self.spec.resolution is not None \
+                and not self.spec.scales(*video.display_size) and not self.renditions:
+            # Already within the chosen size, which is never upscaled, copying may be possible after all
+            unscaled = self.spec.replace(width=0, height=0)
+            self.args = list(unscaled.compile())
+            self.requires_encode = unscaled.requires_encode
+        if self.target is not None and self.plan is None:
+            spec = self.spec
+            self.plan = Planner.plan(
+                info, self.target, self.requires_encode,
+                requires_audio_encode=spec is not None and spec.changes_audio(info.audio),
+                drop_audio=spec is not None and spec.audio == "none",
+                audio_args=spec.audio_args() if spec is not None else (),
+            )
+
+
+def make_job(input_file: str, output: str, spec: ConversionSpec, **fields: Any) -> Job:
+    """A job converting `input_file` to `output` with the settings of `spec`"""
+    return Job(
+        input=input_file, output=output, args=list(spec.compile()), spec=spec, target=spec.target,
+        requires_encode=spec.requires_encode, segments=spec.segments, renditions=_renditions(output, spec), **fields,
+    )
+
+
+def _renditions(output: str, spec: ConversionSpec) -> List[RenditionOutput]:
+    if not isinstance(spec.target, Video):
+        return []
+    return [RenditionOutput(rendition_path(output, rendition), spec.rendition(rendition)) for rendition in spec.renditions]
+
+
+def _rendition_paths(output: str, spec: ConversionSpec) -> List[str]:
+    return [rendition.output for rendition in _renditions(output, spec)]
+
+
+def create_jobs(inputs: Iterable[str], spec: ConversionSpec, reserved: Set[str] | None = None,
+                output_dir: str | None = None, **fields: Any) -> List[Job]:
+    """
+    Expands every input that converts to the spec's target into a job with the same settings.
+    Outputs never collide with each other nor with the `reserved` paths, which are updated.
+    """
+    reserved = reserved if reserved is not None else set()
+    target = spec.target
+    jobs: List[Job] = []
+    for input_file in inputs:
+        source = File.from_path(input_file, sniff=True)
+        if source is None or not supports(source, target):
+            continue
+        output = get_output_path(input_file, target.value, reserved, output_dir)
+        taken = set(reserved)
+        while any(path in taken or os.path.exists(path) for path in _rendition_paths(output, spec)):
+            # A rendition would overwrite another file, number the main output instead
+            taken.add(output)
+            output = get_output_path(input_file, target.value, taken, output_dir)
+        reserved.update([output, *_rendition_paths(output, spec)])
+        jobs.append(make_job(input_file, output, spec, **fields))
+    return jobs
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from util.system import get_cache_directory
+
+from .Job import Job, JobState, make_job
+from .Spec import ConversionSpec
+
+MAX_AGE_DAYS: float = 30  # Finished jobs are forgotten after this long
+
+# States a job may be left in when the process dies, such jobs are resumed
+_UNFINISHED = (JobState.PENDING.value, JobState.RUNNING.value, JobState.PAUSED.value)
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        # Signal 0 terminates on Windows, assume the earlier run is gone
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists, owned by someone else
+    return True
+
+
+def _identity(path: str) -> str:
+    """Size, modification time and inode of `path`, which change when the file is replaced or rewritten"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    return f"{stat.st_size}|{stat.st_mtime_ns}|{stat.st_ino}"
+
+
+def job_key(job: Job) -> str | None:
+    """Identifies a job across runs by its input, output and settings, None without a spec"""
+    if job.spec is None:
+        return None
+    identity = f"{os.path.abspath(job.input)}\n{os.path.abspath(job.output)}\n{job.spec.key()}"
+    return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+
+class Journal:
+    """
+    Write-ahead record of every job, so a batch survives the app or machine dying.
+
+    Jobs are recorded with their spec when enqueued and on every state change. On restart
+    `unfinished` gives back the jobs that were pending or running, chunked encodes skip
+    the segments recorded as complete, and `completed` tells which conversions need not
+    run again, as long as their input was not changed since. SQLite in WAL mode, each
+    change is committed before the work it describes.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                input TEXT NOT NULL,
+                output TEXT NOT NULL,
+                spec TEXT NOT NULL,
+                source TEXT NOT NULL DEFAULT '',  -- Identity of the input when recorded, see _identity
+                state TEXT NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                pid INTEGER NOT NULL,  -- Process running the job, its jobs are not interrupted while it lives
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                start REAL NOT NULL,
+                end REAL NOT NULL,
+                PRIMARY KEY (key, idx)
+            );
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        with self._lock, self._db:
+            if "source" not in columns:
+                # Journals of earlier versions, their finished jobs never match an input again
+                self._db.execute("ALTER TABLE jobs ADD COLUMN source TEXT NOT NULL DEFAULT ''")
+            cutoff = time.time() - MAX_AGE_DAYS * 86400
+            self._db.execute(
+                "DELETE FROM jobs WHERE updated < ? AND state NOT IN (?, ?, ?)", (cutoff, *_UNFINISHED)
+            )
+            self._db.execute("DELETE FROM segments WHERE key NOT IN (SELECT key FROM jobs)")
+
+    def record(self, jobs: Iterable[Job]) -> None:
+        """Writes the current state of `jobs`"""
+        now = time.time()
+        rows = [
+            (key, os.path.abspath(job.input), os.path.abspath(job.output), job.spec.key(), _identity(job.input),
+             job.state.value, job.error, os.getpid(), now)
+            for job in jobs
+            if (key := job_key(job)) is not None and job.spec is not None
+        ]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO jobs (key, input, output, spec, source, state, error, pid, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    # Finished jobs have nothing left to resume
+                    self._db.executemany(
+                        "DELETE FROM segments WHERE key = ?", [(row[0],) for row in rows if row[5] not in _UNFINISHED]
+                    )
+            except sqlite3.Error:
+                # Only a safety net, the conversion itself goes on
+                pass
+
+    def unfinished(self) -> List[Job]:
+        """Jobs left pending, running or paused by a run that died, whose input still exists"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT input, output, spec, pid FROM jobs WHERE state IN (?, ?, ?) ORDER BY updated",
+                _UNFINISHED,
+            ).fetchall()
+        jobs: List[Job] = []
+        for input_path, output, data, pid in rows:
+            if _alive(pid):
+                continue
+            try:
+                spec = ConversionSpec.from_dict(json.loads(data))
+            except (ValueError, KeyError, TypeError):
+                continue
+            if os.path.exists(input_path):
+                jobs.append(make_job(input_path, output, spec))
+        return jobs
+
+    def completed(self, input_path: str, spec: ConversionSpec, output_dir: str | None = None) -> str | None:
+        """
+        Output of an earlier successful conversion of `input_path` with `spec`, when it still
+        exists and the input is the same file, unchanged since
+        """
+        source = _identity(input_path)
+        if not source:
+            return None
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT output FROM jobs WHERE input = ? AND spec = ? AND source = ? AND state = ? "
+                "ORDER BY updated DESC",
+                (os.path.abspath(input_path), spec.key(), source, JobState.DONE.value),
+            ).fetchall()
+        for (output,) in rows:
+            if output_dir is not None and os.path.dirname(output) != os.path.abspath(output_dir):
+                continue
+            if os.path.exists(output):
+                return output
+        return None
+
+    def segments(self, job: Job) -> Dict[int, Tuple[float, float]]:
+        """Chunks of `job` completed before, by index, with their start and end"""
+        key = job_key(job)
+        if key is None:
+            return {}
+        with self._lock:
+            rows = self._db.execute("SELECT idx, start, end FROM segments WHERE key = ?", (key,)).fetchall()
+        return {index: (start, end) for index, start, end in rows}
+
+    def add_segment(self, job: Job, index: int, start: float, end: float) -> None:
+        key = job_key(job)
+        if key is None:
+            return
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO segments (key, idx, start, end) VALUES (?, ?, ?, ?)",
+                        (key, index, start, end),
+                    )
+            except sqlite3.Error:
+                pass
+
+    def discard(self, jobs: Iterable[Job]) -> None:
+        """Forgets unfinished `jobs` instead of resuming them, deleting what they left behind"""
+        jobs = list(jobs)
+        for job in jobs:
+            shutil.rmtree(job.workdir, ignore_errors=True)
+            for partial in [job.partial, *(rendition.partial for rendition in job.renditions)]:
+                try:
+                    os.remove(partial)
+                except OSError:
+                    pass
+        keys = [(key,) for job in jobs if (key := job_key(job)) is not None]
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM segments WHERE key = ?", keys)
+            self._db.executemany("DELETE FROM jobs WHERE key = ?", keys)
+
+
+_journal: Journal | None = None
+_journal_lock = threading.Lock()
+_journal_failed = False
+
+
+def get_journal() -> Journal | None:
+    """Shared journal in the user cache directory, None when it cannot be opened"""
+    global _journal, _journal_failed
+    with _journal_lock:
+        if _journal is None and not _journal_failed:
+            try:
+                _journal = Journal(os.path.join(get_cache_directory(), "journal.sqlite3"))
+            except (OSError, sqlite3.Error):
+                _journal_failed = True
+        return _journal
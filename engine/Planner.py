@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from constant.File import Audio, File, Video
+
+from .Probe import MediaInfo
+
+
+class Action(Enum):
+    COPY = "copy"
+    ENCODE = "encode"
+    NONE = "none"  # Source has no such stream
+    DROP = "drop"  # Left out of the output, e.g. the video of audio-only targets
+
+
+# Codecs each target container can carry without re-encoding, by ffprobe codec_name
+CONTAINER_CODECS: Dict[File, Dict[str, FrozenSet[str]]] = {
+    Video.MP4: {
+        "video": frozenset({"h264", "hevc", "av1", "vp9", "mpeg4", "mpeg2video", "mpeg1video"}),
+        "audio": frozenset({"aac", "mp3", "ac3", "eac3", "opus", "flac", "alac"}),
+    },
+    Video.MOV: {
+        "video": frozenset({"h264", "hevc", "prores", "mpeg4", "mjpeg", "mpeg2video", "mpeg1video", "dnxhd"}),
+        "audio": frozenset({"aac", "mp3", "ac3", "eac3", "alac", "pcm_s16le", "pcm_s24le", "pcm_s16be", "pcm_s24be"}),
+    },
+    Video.MPEG: {
+        "video": frozenset({"mpeg1video", "mpeg2video", "h264"}),
+        "audio": frozenset({"mp2", "mp3", "ac3", "pcm_dvd"}),
+    },
+    Video.AVI: {
+        "video": frozenset({"h264", "mpeg4", "mjpeg", "mpeg2video", "mpeg1video"}),
+        "audio": frozenset({"mp3", "mp2", "ac3", "pcm_s16le"}),
+    },
+    Audio.M4A: {
+        "video": frozenset(),
+        "audio": frozenset({"aac", "alac"}),
+    },
+    Audio.MP3: {
+        "video": frozenset(),
+        "audio": frozenset({"mp3"}),
+    },
+}
+
+# Apple players only accept HEVC in MP4/MOV when tagged as hvc1
+_HVC1_CONTAINERS = frozenset({Video.MP4, Video.MOV})
+
+
+@dataclass(frozen=True)
+class Plan:
+    video: Action
+    audio: Action
+    hvc1: bool = False
+    audio_args: Tuple[str, ...] = ()  # Encoder options of the audio, used when it is re-encoded
+
+    @property
+    def name(self) -> str:
+        """Human readable path, shown next to the job"""
+        if self.video in (Action.DROP, Action.NONE):
+            return "extract audio" if self.audio == Action.COPY else "encode audio"
+        if self.video == Action.COPY and self.audio != Action.ENCODE:
+            return "remux"
+        if self.video == Action.COPY:
+            return "copy video, encode audio"
+        if self.audio == Action.COPY:
+            return "encode video, copy audio"
+        return "transcode"
+
+    def args(self, encode_args: List[str]) -> List[str]:
+        """ffmpeg output arguments, `encode_args` are only used when the video is re-encoded"""
+        args: List[str] = []
+        if self.video == Action.COPY:
+            args += ["-c:v", "copy"]
+            if self.hvc1:
+                args += ["-tag:v", "hvc1"]
+        elif self.video == Action.ENCODE:
+            args += encode_args
+        elif self.video == Action.DROP:
+            args += ["-vn"]
+
+        if self.audio == Action.COPY:
+            args += ["-c:a", "copy"]
+        elif self.audio == Action.ENCODE:
+            args += self.audio_args
+        elif self.audio == Action.DROP:
+            args += ["-an"]
+        return args
+
+    @property
+    def keeps_audio(self) -> bool:
+        return self.audio in (Action.COPY, Action.ENCODE)
+
+    def audio_codec_args(self) -> List[str]:
+        """Codec options of the audio when it is written on its own, e.g. next to chunked video"""
+        if self.audio == Action.COPY:
+            return ["-c:a", "copy"]
+        return list(self.audio_args) or ["-c:a", "aac"]
+
+
+def plan(info: MediaInfo, target: File, requires_encode: bool, requires_audio_encode: bool = False,
+         drop_audio: bool = False, audio_args: Sequence[str] = ()) -> Plan:
+    """
+    Picks stream copy over re-encoding wherever the target container accepts the source streams.
+    `requires_encode` is set when the options change the picture (resolution, frame rate),
+    `requires_audio_encode` when they change the sound (bitrate, sample rate, channels).
+    Audio targets drop the video, so extracting a soundtrack never decodes a frame.
+    """
+    codecs = CONTAINER_CODECS.get(target)
+    video, audio = info.video, info.audio
+
+    video_action = Action.NONE if video is None else Action.ENCODE
+    if video is not None and isinstance(target, Audio):
+        video_action = Action.DROP
+    elif video is not None and codecs and not requires_encode and video.codec in codecs["video"]:
+        video_action = Action.COPY
+
+    audio_action = Action.NONE if audio is None else Action.ENCODE
+    if audio is not None and drop_audio:
+        audio_action = Action.DROP
+    elif audio is not None and codecs and not requires_audio_encode and audio.codec in codecs["audio"]:
+        audio_action = Action.COPY
+
+    return Plan(
+        video=video_action,
+        audio=audio_action,
+        hvc1=video_action == Action.COPY and video is not None and video.codec == "hevc" and target in _HVC1_CONTAINERS,
+        audio_args=tuple(audio_args),
+    )
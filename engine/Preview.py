@@ -0,0 +1,78 @@
+import hashlib
+import os
+import tempfile
+from typing import List
+
+from util.system import get_cache_directory
+
+from .Probe import probe_cached
+from .Process import FFmpegProcess
+
+STRIP_FRAMES: int = 6
+STRIP_HEIGHT: int = 180
+MAX_PREVIEWS: int = 500  # Strips kept on disk, the least recently viewed go first
+
+
+def get_preview_directory() -> str:
+    directory = os.path.join(get_cache_directory(), "previews")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def thumbnail_strip(path: str, frames: int = STRIP_FRAMES, height: int = STRIP_HEIGHT) -> str:
+    """
+    Returns a JPEG of `frames` evenly spaced frames of the video side by side.
+
+    Every frame is read with input seeking, so only the packets around it are
+    decoded however long or heavy the source is. The strip is kept on disk per
+    file identity, viewing the same file again reads it back instead.
+    Blocking, raises ProbeError or FFmpegError.
+    """
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{stat.st_ino}|{frames}|{height}"
+    directory = get_preview_directory()
+    output = os.path.join(directory, hashlib.blake2b(identity.encode(), digest_size=16).hexdigest() + ".jpg")
+    if os.path.exists(output):
+        os.utime(output)
+        return output
+
+    duration = probe_cached(path).duration
+    positions = [duration * (i + 0.5) / frames for i in range(frames)] if duration > 0 else [0.0]
+
+    args: List[str] = []
+    filters: List[str] = []
+    for i, position in enumerate(positions):
+        args += ["-ss", f"{position:.3f}", "-i", path]
+        filters.append(f"[{i}:v:0]scale=-2:{height},setsar=1[f{i}]")
+    if len(positions) > 1:
+        filters.append("".join(f"[f{i}]" for i in range(len(positions))) + f"hstack=inputs={len(positions)}[strip]")
+    else:
+        filters.append("[f0]null[strip]")
+
+    fd, temporary = tempfile.mkstemp(prefix=".strip-", suffix=".jpg", dir=directory)
+    os.close(fd)
+    try:
+        FFmpegProcess([
+            *args,
+            "-filter_complex", ";".join(filters),
+            "-map", "[strip]", "-frames:v", "1", "-q:v", "4",
+            temporary,
+        ]).run()
+        os.replace(temporary, output)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    _prune(directory)
+    return output
+
+
+def _prune(directory: str) -> None:
+    try:
+        # Dot files are strips still being written
+        strips = [entry for entry in os.scandir(directory) if entry.name.endswith(".jpg") and entry.name[0] != "."]
+        strips.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in strips[MAX_PREVIEWS:]:
+            os.remove(entry.path)
+    except OSError:
+        pass
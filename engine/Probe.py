@@ -0,0 +1,362 @@
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from util.system import get_cache_directory, get_ffprobe_path
+
+
+class ProbeError(RuntimeError):
+    pass
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _rotation(data: Dict[str, Any]) -> int:
+    """Degrees the picture is rotated for display, from the display matrix or the older `rotate` tag"""
+    for side_data in data.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(_float(side_data["rotation"])) % 360
+    return int(_float(data.get("tags", {}).get("rotate"))) % 360
+
+
+def _rate(value: Any) -> float:
+    """Parses ffprobe's fractional rates, e.g. `30000/1001`"""
+    numerator, _, denominator = str(value or "").partition("/")
+    if not denominator:
+        return _float(numerator)
+    if _float(denominator) == 0:
+        return 0.0
+    return _float(numerator) / _float(denominator)
+
+
+@dataclass(frozen=True)
+class Stream:
+    index: int
+    type: str  # video, audio, subtitle, data, ...
+    codec: str
+    width: int = 0
+    height: int = 0
+    frame_rate: float = 0.0
+    pixel_format: str = ""
+    sample_rate: int = 0
+    channels: int = 0
+    bit_rate: int = 0
+    attached_pic: bool = False  # Cover art, stored as a single-frame video stream
+    profile: str = ""  # Codec profile, e.g. `High`
+    level: int = 0  # Codec level, e.g. 40 for H.264 level 4.0
+    refs: int = 0  # Reference frames
+    reorder: int = 0  # Frames decoded ahead of display for B-frames, ffprobe's has_b_frames
+    rotation: int = 0  # Degrees the picture is rotated for display, ffmpeg autorotates when decoding
+
+    @property
+    def display_size(self) -> Tuple[int, int]:
+        """Width and height as shown, swapped by a quarter rotation, e.g. of portrait phone clips"""
+        if self.rotation % 180 == 90:
+            return self.height, self.width
+        return self.width, self.height
+
+    @staticmethod
+    def from_json(data: Dict[str, Any]) -> "Stream":
+        return Stream(
+            index=int(data.get("index", 0)),
+            type=data.get("codec_type", ""),
+            codec=data.get("codec_name", ""),
+            width=int(data.get("width", 0)),
+            height=int(data.get("height", 0)),
+            frame_rate=_rate(data.get("avg_frame_rate")) or _rate(data.get("r_frame_rate")),
+            pixel_format=data.get("pix_fmt", ""),
+            sample_rate=int(_float(data.get("sample_rate"))),
+            channels=int(data.get("channels", 0)),
+            bit_rate=int(_float(data.get("bit_rate"))),
+            attached_pic=bool(data.get("disposition", {}).get("attached_pic", 0)),
+            profile=data.get("profile", ""),
+            level=int(_float(data.get("level"))),
+            refs=int(_float(data.get("refs"))),
+            reorder=int(_float(data.get("has_b_frames"))),
+            rotation=_rotation(data),
+        )
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    format: str  # ffprobe format_name, e.g. `mov,mp4,m4a,3gp,3g2,mj2`
+    duration: float  # Seconds
+    size: int  # Bytes
+    bit_rate: int
+    streams: Tuple[Stream, ...]
+
+    @property
+    def video(self) -> Stream | None:
+        """First real video stream, cover art is skipped"""
+        return next((s for s in self.streams if s.type == "video" and not s.attached_pic), None)
+
+    @property
+    def audio(self) -> Stream | None:
+        return next((s for s in self.streams if s.type == "audio"), None)
+
+    def to_cache(self) -> str:
+        return json.dumps(asdict(self))
+
+    @staticmethod
+    def from_cache(path: str, data: str) -> "MediaInfo":
+        values = json.loads(data)
+        values["path"] = path
+        values["streams"] = tuple(Stream(**stream) for stream in values["streams"])
+        return MediaInfo(**values)
+
+    @staticmethod
+    def from_json(path: str, data: Dict[str, Any]) -> "MediaInfo":
+        fmt = data.get("format", {})
+        return MediaInfo(
+            path=path,
+            format=fmt.get("format_name", ""),
+            duration=_float(fmt.get("duration")),
+            size=int(_float(fmt.get("size"))),
+            bit_rate=int(_float(fmt.get("bit_rate"))),
+            streams=tuple(Stream.from_json(stream) for stream in data.get("streams", [])),
+        )
+
+
+def _ffprobe(args: List[str], data: bytes | None = None) -> str:
+    """Runs ffprobe, feeding `data` to its standard input when given"""
+    stdin: Dict[str, Any] = {"stdin": subprocess.DEVNULL} if data is None else {"input": data}
+    try:
+        result = subprocess.run([get_ffprobe_path(), "-v", "error", *args], capture_output=True, **stdin)
+    except OSError as e:
+        raise ProbeError(str(e)) from e
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors="replace").strip()
+        raise ProbeError(stderr or f"ffprobe exited with code {result.returncode}")
+    return result.stdout.decode(errors="replace")
+
+
+def probe(path: str) -> MediaInfo:
+    """Runs ffprobe on the file, raises ProbeError when it cannot be read"""
+    output = _ffprobe(["-print_format", "json", "-show_format", "-show_streams", path])
+    try:
+        return MediaInfo.from_json(path, json.loads(output))
+    except (ValueError, TypeError) as e:
+        raise ProbeError(f"Invalid ffprobe output: {e}") from e
+
+
+def probe_head(data: bytes) -> MediaInfo:
+    """
+    Probes the first bytes of a stream, e.g. standard input, which cannot be rewound for ffprobe.
+    The duration and size are mostly unknown from the head alone.
+    """
+    output = _ffprobe(["-print_format", "json", "-show_format", "-show_streams", "-i", "pipe:0"], data)
+    try:
+        return MediaInfo.from_json("pipe:0", json.loads(output))
+    except (ValueError, TypeError) as e:
+        raise ProbeError(f"Invalid ffprobe output: {e}") from e
+
+
+def packet_times(path: str, keyframes_only: bool = False, interval: str | None = None) -> Tuple[float, ...]:
+    """
+    Sorted presentation timestamps of the first video stream's packets.
+    Only demuxes, nothing is decoded, so it is cheap even for long files.
+    `interval` limits the read to a range in ffprobe's `-read_intervals` syntax, e.g. `60%+10`.
+    """
+    output = _ffprobe([
+        "-select_streams", "v:0",
+        *(["-read_intervals", interval] if interval else []),
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        path,
+    ])
+    times: List[float] = []
+    for line in output.splitlines():
+        pts, _, flags = line.partition(",")
+        if not pts or pts == "N/A" or (keyframes_only and "K" not in flags):
+            continue
+        times.append(float(pts))
+    return tuple(sorted(times))
+
+
+# (absolute path, size, mtime in ns, inode), any change to the file invalidates the entry
+FileKey = Tuple[str, int, int, int]
+
+
+class ProbeCache:
+    """
+    Probes each file once.
+
+    Results are kept in an in-memory LRU in front of an SQLite store, both keyed by
+    the file identity so edited or replaced files are probed again. The store
+    drops the least recently used rows once it grows past `DISK_SIZE`.
+    Stream metadata and keyframe timestamps live in separate tables.
+    """
+
+    MEMORY_SIZE: int = 2048
+    DISK_SIZE: int = 200_000
+    EVICT_EVERY: int = 512  # Inserts between eviction passes
+    PROBES: str = "probes_3"  # Versioned, rows cached before Stream gained fields are probed again
+    TABLES: Tuple[str, ...] = (PROBES, "keyframes")
+
+    def __init__(self, path: str | None = None):
+        self._memory: OrderedDict[Tuple[str, FileKey], Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript("""
+                PRAGMA journal_mode = WAL;
+                PRAGMA synchronous = NORMAL;
+            """)
+            for table in self.TABLES:
+                self._db.executescript(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        path TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        mtime INTEGER NOT NULL,
+                        inode INTEGER NOT NULL,
+                        info TEXT NOT NULL,
+                        accessed REAL NOT NULL,
+                        PRIMARY KEY (path, size, mtime, inode)
+                    );
+                    CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed);
+                """)
+
+    @staticmethod
+    def key(path: str) -> FileKey:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def get(self, path: str) -> MediaInfo:
+        return self._get(
+            self.PROBES, path, probe,
+            encode=MediaInfo.to_cache,
+            decode=lambda key, data: MediaInfo.from_cache(key[0], data),
+        )
+
+    def keyframes(self, path: str) -> Tuple[float, ...]:
+        """Keyframe timestamps of the first video stream"""
+        return self._get(
+            "keyframes", path, lambda p: packet_times(p, keyframes_only=True),
+            encode=lambda times: json.dumps(times),
+            decode=lambda _, data: tuple(json.loads(data)),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                with self._db:
+                    for table in self.TABLES:
+                        self._db.execute(f"DELETE FROM {table}")
+
+    def _get(self, table: str, path: str, load: Callable[[str], Any],
+             encode: Callable[[Any], str], decode: Callable[[FileKey, str], Any]) -> Any:
+        try:
+            key = self.key(path)
+        except OSError as e:
+            raise ProbeError(str(e)) from e
+
+        value = self._lookup(table, key, decode)
+        if value is None:
+            # Probing runs unlocked so several workers can probe different files at once
+            value = load(path)
+            self._store(table, key, value, encode(value))
+        return value
+
+    def _lookup(self, table: str, key: FileKey, decode: Callable[[FileKey, str], Any]) -> Any:
+        with self._lock:
+            value = self._memory.get((table, key))
+            if value is not None:
+                self._memory.move_to_end((table, key))
+                return value
+            if self._db is None:
+                return None
+
+            try:
+                row = self._db.execute(
+                    f"SELECT info FROM {table} WHERE path = ? AND size = ? AND mtime = ? AND inode = ?", key
+                ).fetchone()
+                if row is None:
+                    return None
+                with self._db:
+                    self._db.execute(
+                        f"UPDATE {table} SET accessed = ? WHERE path = ? AND size = ? AND mtime = ? AND inode = ?",
+                        (time.time(), *key),
+                    )
+            except sqlite3.Error:
+                # The store is only a cache, e.g. another instance holding the lock means probing again
+                return None
+            value = decode(key, row[0])
+            self._remember(table, key, value)
+            return value
+
+    def _store(self, table: str, key: FileKey, value: Any, data: str) -> None:
+        with self._lock:
+            self._remember(table, key, value)
+            if self._db is None:
+                return
+            try:
+                with self._db:
+                    # Only the latest identity of a path is worth keeping
+                    self._db.execute(f"DELETE FROM {table} WHERE path = ?", (key[0],))
+                    self._db.execute(
+                        f"INSERT INTO {table} (path, size, mtime, inode, info, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                        (*key, data, time.time()),
+                    )
+                    self._inserts += 1
+                    if self._inserts % self.EVICT_EVERY == 0:
+                        self._db.execute(f"""
+                            DELETE FROM {table} WHERE rowid IN (
+                                SELECT rowid FROM {table} ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                            )
+                        """, (self.DISK_SIZE,))
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, table: str, key: FileKey, value: Any) -> None:
+        self._memory[(table, key)] = value
+        self._memory.move_to_end((table, key))
+        while len(self._memory) > self.MEMORY_SIZE:
+            self._memory.popitem(last=False)
+
+
+_cache: ProbeCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ProbeCache:
+    """Shared cache, stored in the user cache directory"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ProbeCache(os.path.join(get_cache_directory(), "probe.sqlite3"))
+            except (OSError, sqlite3.Error):
+                # Unwritable cache directory, still avoid probing twice in this session
+                _cache = ProbeCache()
+        return _cache
+
+
+def use_cache(cache: ProbeCache | None) -> ProbeCache | None:
+    """Replaces the shared cache, e.g. with an empty one, returns the previous. None reopens the stored one"""
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+        return previous
+
+
+def probe_cached(path: str) -> MediaInfo:
+    return get_cache().get(path)
+
+
+def keyframes_cached(path: str) -> Tuple[float, ...]:
+    return get_cache().keyframes(path)
@@ -0,0 +1,165 @@
+import os
+import signal
+import subprocess
+import threading
+from collections import deque
+from typing import Callable, Dict, List
+
+from util.system import get_ffmpeg_path
+
+from .Progress import ProgressParser, Usage
+from .Scheduler import Limits
+
+ProgressCallback = Callable[[Dict[str, str]], None]
+
+
+class FFmpegError(RuntimeError):
+    def __init__(self, returncode: int, stderr: str):
+        super().__init__(f"ffmpeg exited with code {returncode}: {stderr}")
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegProcess:
+    """
+    Runs ffmpeg as a child process and streams its `-progress pipe:1` output.
+
+    The process never touches Qt, callers decide on which thread `run` blocks.
+    `cancel`, `pause` and `resume` are safe to call from any other thread.
+    Started under the priority and pinned to the cores of `limits`, its resource
+    usage is added to `usage` once it exits.
+    """
+
+    STDERR_TAIL: int = 20
+    TERMINATE_TIMEOUT: float = 5
+
+    def __init__(self, args: List[str], limits: Limits | None = None, usage: Usage | None = None):
+        self.args = args
+        self.limits = limits or Limits()
+        self.usage = usage
+        self.progress = "pipe:1"  # Where ffmpeg writes its progress
+        self.returncode: int | None = None
+
+        self._process: subprocess.Popen | None = None
+        self._stderr: deque[str] = deque(maxlen=self.STDERR_TAIL)
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._paused = False
+
+    @property
+    def command(self) -> List[str]:
+        return [
+            *self.limits.prefix(),
+            get_ffmpeg_path(),
+            "-hide_banner", "-nostdin", "-y",
+            "-loglevel", "error",
+            "-progress", self.progress, "-nostats",
+            *self.args,
+        ]
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def stderr(self) -> str:
+        return "\n".join(self._stderr)
+
+    @staticmethod
+    def supports_pause() -> bool:
+        return hasattr(signal, "SIGSTOP") and hasattr(signal, "SIGCONT")
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        """Runs ffmpeg to completion, raises FFmpegError on failure"""
+        with self._lock:
+            if self._cancelled:
+                return -1
+            self._process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+            self.limits.confine(self._process.pid)
+
+        # stderr must be drained concurrently, otherwise a chatty ffmpeg blocks on a full pipe
+        drain = threading.Thread(target=self._drain_stderr, daemon=True)
+        drain.start()
+
+        parser = ProgressParser()
+        assert self._process.stdout is not None
+        for line in self._process.stdout:
+            block = parser.feed(line)
+            if block is not None and on_progress is not None:
+                on_progress(block)
+
+        self.returncode = self._wait()
+        drain.join()
+
+        if self._cancelled:
+            return self.returncode
+        if self.returncode != 0:
+            raise FFmpegError(self.returncode, self.stderr)
+        return self.returncode
+
+    def _wait(self) -> int:
+        """Waits for the exit, reading the resource usage where the platform reports it"""
+        assert self._process is not None
+        if self.usage is None or not hasattr(os, "wait4"):
+            return self._process.wait()
+        try:
+            _, status, rusage = os.wait4(self._process.pid, 0)
+        except ChildProcessError:
+            # Reaped meanwhile by `cancel`
+            return self._process.wait()
+        self._process.returncode = os.waitstatus_to_exitcode(status)
+        self.usage.add(rusage)
+        return self._process.returncode
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            process = self._process
+        if process is None or process.poll() is not None:
+            return
+
+        process.terminate()
+        # A stopped process only handles SIGTERM once it is continued
+        self.resume()
+        try:
+            process.wait(self.TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def pause(self) -> None:
+        if self._signal("SIGSTOP"):
+            self._paused = True
+
+    def resume(self) -> None:
+        if not self._paused:
+            return
+        self._signal("SIGCONT")
+        self._paused = False
+
+    def _signal(self, name: str) -> bool:
+        """Signals the running process, False when there is none"""
+        if not self.supports_pause():
+            raise NotImplementedError("Pausing is not supported on this platform")
+        process = self._process
+        if process is None or process.poll() is not None:
+            return False
+        os.kill(process.pid, getattr(signal, name))
+        return True
+
+    def _drain_stderr(self) -> None:
+        assert self._process is not None and self._process.stderr is not None
+        for line in self._process.stderr:
+            line = line.rstrip()
+            if line:
+                self._stderr.append(line)
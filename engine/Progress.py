@@ -0,0 +1,205 @@
+import json
+import math
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, TextIO
+
+
+class ProgressParser:
+    """
+    Accumulates ffmpeg's `-progress` key=value lines into blocks.
+
+    ffmpeg writes one block per update, each terminated by a
+    `progress=continue` or `progress=end` line.
+    """
+
+    def __init__(self):
+        self._block: Dict[str, str] = {}
+
+    def feed(self, line: str) -> Dict[str, str] | None:
+        """Feeds a single line, returns the block once it is complete"""
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+
+        self._block[key] = value
+        if key != "progress":
+            return None
+
+        block, self._block = self._block, {}
+        return block
+
+
+def _number(value: str | None, suffix: str = "") -> float:
+    """Parses ffmpeg's progress values, which are `N/A` until known and may carry a unit"""
+    if not value:
+        return 0.0
+    value = value.strip().removesuffix(suffix)
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:{seconds:02d}"
+
+
+def parse_seconds(text: str) -> float:
+    """Parses `[[HH:]MM:]SS[.mmm]` into seconds, raises ValueError for anything else"""
+    parts = text.strip().split(":")
+    if not 1 <= len(parts) <= 3 or not all(parts):
+        raise ValueError(f"Invalid time: {text!r}")
+    *whole, seconds = parts
+    total = 0
+    for part in whole:
+        if not part.isdigit():
+            raise ValueError(f"Invalid time: {text!r}")
+        total = total * 60 + int(part)
+    value = total * 60 + float(seconds)
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(f"Invalid time: {text!r}")
+    return value
+
+
+@dataclass(frozen=True)
+class Metrics:
+    frame: int = 0  # Frames encoded
+    fps: float = 0.0  # Encoding speed in frames per second
+    out_time: float = 0.0  # Seconds of output written
+    speed: float = 0.0  # Realtime multiple, 2.0 means a minute of video takes 30 seconds
+    total_size: int = 0  # Bytes written
+    bitrate: float = 0.0  # Output bitrate so far, kbit/s
+    finished: bool = False
+    duration: float = 0.0  # Source duration in seconds, 0 when unknown
+    elapsed: float = 0.0  # Wall-clock seconds since the conversion started
+
+    @staticmethod
+    def from_block(block: Dict[str, str], duration: float = 0.0, elapsed: float = 0.0) -> "Metrics":
+        out_time = _number(block.get("out_time_us")) / 1_000_000
+        return Metrics(
+            frame=int(_number(block.get("frame"))),
+            fps=_number(block.get("fps")),
+            out_time=max(0.0, out_time),
+            speed=_number(block.get("speed"), "x"),
+            total_size=int(_number(block.get("total_size"))),
+            bitrate=_number(block.get("bitrate"), "kbits/s"),
+            finished=block.get("progress") == "end",
+            duration=duration,
+            elapsed=elapsed,
+        )
+
+    @property
+    def percent(self) -> float | None:
+        if self.finished:
+            return 100.0
+        if self.duration <= 0:
+            return None
+        return min(100.0, self.out_time / self.duration * 100)
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds left, None when the duration or speed is not known yet"""
+        if self.finished:
+            return 0.0
+        if self.duration <= 0 or self.out_time <= 0:
+            return None
+        remaining = max(0.0, self.duration - self.out_time)
+        if self.speed > 0:
+            return remaining / self.speed
+        if self.elapsed > 0:
+            return remaining * self.elapsed / self.out_time
+        return None
+
+    def summary(self) -> str:
+        """Short human readable line, e.g. `42% · 120 fps · 2.1x · 00:01:05 left`"""
+        parts = []
+        if self.percent is not None:
+            parts.append(f"{self.percent:.0f}%")
+        if self.fps:
+            parts.append(f"{self.fps:.0f} fps")
+        if self.speed:
+            parts.append(f"{self.speed:.2f}x")
+        if self.eta is not None:
+            parts.append(f"{format_seconds(self.eta)} left")
+        return " · ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "percent": self.percent, "eta": self.eta}
+
+
+class Usage:
+    """
+    CPU time and contention of the ffmpeg processes of a job, summed over all of them,
+    e.g. every chunk. Read from each process's rusage once it exits, where wait4 is available.
+    Involuntary context switches count how often the job was preempted to run something
+    else, a high rate per CPU second means its threads fought over the cores. Thread-safe.
+    """
+
+    def __init__(self):
+        self.processes = 0
+        self.user = 0.0  # CPU seconds in ffmpeg itself
+        self.system = 0.0  # CPU seconds in the kernel on its behalf
+        self.max_rss = 0  # Peak resident memory of the largest process, kilobytes on Linux
+        self.involuntary = 0  # Preemptions
+        self._lock = threading.Lock()
+
+    @property
+    def cpu(self) -> float:
+        return self.user + self.system
+
+    def add(self, rusage: Any) -> None:
+        """Adds the `resource.struct_rusage` of an exited process"""
+        with self._lock:
+            self.processes += 1
+            self.user += rusage.ru_utime
+            self.system += rusage.ru_stime
+            self.max_rss = max(self.max_rss, rusage.ru_maxrss)
+            self.involuntary += rusage.ru_nivcsw
+
+    def summary(self, elapsed: float) -> str:
+        """Short human readable line, e.g. `cpu 72.4s · 3.6 cores busy · 41 preemptions/s`"""
+        if not self.processes:
+            return ""
+        parts = [f"cpu {self.cpu:.1f}s"]
+        if elapsed > 0:
+            parts.append(f"{self.cpu / elapsed:.1f} cores busy")
+        if self.cpu > 0:
+            parts.append(f"{self.involuntary / self.cpu:.0f} preemptions/s")
+        return " · ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "user": round(self.user, 3),
+                "system": round(self.system, 3),
+                "max_rss": self.max_rss,
+                "involuntary_switches": self.involuntary,
+            }
+
+
+class JsonLinesSink:
+    """
+    Appends one JSON object per progress update, so runs with different
+    presets and CRFs can be compared afterwards by measured throughput.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: TextIO = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, event: str, fields: Dict[str, Any], metrics: Metrics | None = None) -> None:
+        record = {"time": time.time(), "event": event, **fields}
+        if metrics is not None:
+            record["metrics"] = metrics.to_dict()
+        line = json.dumps(record)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,196 @@
+import dataclasses
+import os
+import shutil
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Tuple
+
+from constant.File import Image
+
+from .Cache import OutputCache, get_output_cache
+from .Chunked import ChunkError, ChunkedEncode
+from .Gif import GifEncode, GifError
+from .Job import Job, JobState
+from .Journal import Journal
+from .Process import FFmpegError, FFmpegProcess
+from .Progress import JsonLinesSink, Metrics
+from .Scheduler import CorePool
+from .Trim import SmartCut, TrimError
+from .TwoPass import TwoPassEncode, TwoPassError
+
+if TYPE_CHECKING:
+    from .ImageEncode import ImageEncode
+
+JobCallback = Callable[[Job], None]
+MetricsCallback = Callable[[Job, Metrics], None]
+
+
+def _load_image_encode() -> "type[ImageEncode] | None":
+    """
+    ImageEncode imports Qt, so it is only loaded for still images. Without PySide6,
+    e.g. a headless install, images go through ffmpeg like everything else.
+    """
+    try:
+        from .ImageEncode import ImageEncode
+    except ImportError:
+        return None
+    return ImageEncode
+
+
+class Runner:
+    """
+    Runs a single job to completion on the calling thread.
+
+    Reuses an identical earlier conversion from the output cache when there is one.
+    Otherwise prepares the job (probe and plan), picks a plain, chunked, two-pass, GIF,
+    smart cut or in-process image encode, turns the progress into Metrics and leaves the outcome
+    in `job.state`. An interrupted job is left pending instead of cancelled, so the journal resumes it.
+    Writes to `job.partial` and renames it to the output once complete, recording
+    each state change in the `journal` when given. With a `cores` pool, the ffmpeg
+    processes are pinned to `job.threads` cores of their own while the job runs.
+    Shared by the GUI workers and the headless CLI.
+    """
+
+    def __init__(self, job: Job, sink: JsonLinesSink | None = None, journal: Journal | None = None,
+                 cores: CorePool | None = None):
+        self.job = job
+        self.sink = sink
+        self.journal = journal
+        self.cores = cores
+        self.interrupted = False
+        self.process: FFmpegProcess | ChunkedEncode | TwoPassEncode | GifEncode | SmartCut | "ImageEncode" = (
+            FFmpegProcess(job.command)
+        )
+
+    def run(self, on_started: JobCallback | None = None, on_progress: MetricsCallback | None = None) -> JobState:
+        if self.process.cancelled:
+            return self.__finish(self.__stopped())
+
+        cache, key = self.__cacheKey()
+        if cache is not None and key is not None and cache.fetch(key, self.job.output):
+            self.job.cached = True
+            self.job.state = JobState.RUNNING
+            self.job.metrics = Metrics(finished=True)
+            if on_started is not None:
+                on_started(self.job)
+            return self.__finish(JobState.DONE)
+
+        image_encode = _load_image_encode() if self.job.in_process else None
+        if image_encode is None:
+            # Still images converted in-process need no probe
+            self.job.prepare()
+        if (image_encode is not None or self.job.target == Image.GIF or self.job.sized
+                or self.job.smart_cut or self.job.chunked):
+            previous = self.process
+            if image_encode is not None:
+                self.process = image_encode(self.job)
+            elif self.job.target == Image.GIF:
+                self.process = GifEncode(self.job)
+            elif self.job.sized:
+                self.process = TwoPassEncode(self.job)
+            elif self.job.smart_cut:
+                self.process = SmartCut(self.job)
+            else:
+                self.process = ChunkedEncode(self.job, self.job.segments, self.journal)
+            # `cancel` calls up to the swap went to the plain process, calls after it reach the new one
+            if previous.cancelled:
+                self.process.cancel()
+        if self.cores is not None and image_encode is None and self.job.threads:
+            self.job.limits = dataclasses.replace(self.job.limits, cores=self.cores.acquire(self.job.threads))
+        if isinstance(self.process, FFmpegProcess):
+            self.process.args = self.job.command
+            self.process.limits = self.job.limits
+            self.process.usage = self.job.usage
+
+        self.job.state = JobState.RUNNING
+        if self.journal is not None:
+            self.journal.record([self.job])
+        self.__log("started")
+        if on_started is not None:
+            on_started(self.job)
+
+        started = time.monotonic()
+
+        def progress(block: Dict[str, str]) -> None:
+            self.job.metrics = Metrics.from_block(block, self.job.duration, time.monotonic() - started)
+            for rendition in self.job.renditions:
+                rendition.metrics = rendition.measure(self.job.metrics)
+            self.__log("progress")
+            if on_progress is not None:
+                on_progress(self.job, self.job.metrics)
+
+        try:
+            self.process.run(progress)
+            if not self.process.cancelled:
+                for rendition in self.job.renditions:
+                    os.replace(rendition.partial, rendition.output)
+                os.replace(self.job.partial, self.job.output)
+        except (FFmpegError, ChunkError, TwoPassError, GifError, TrimError, OSError) as e:
+            self.job.error = str(e)
+            return self.__finish(JobState.FAILED)
+        if self.process.cancelled:
+            return self.__finish(self.__stopped())
+
+        if cache is not None and key is not None:
+            cache.store(key, self.job.output, self.job.input)
+        return self.__finish(JobState.DONE)
+
+    def cancel(self) -> None:
+        self.process.cancel()
+
+    def interrupt(self) -> None:
+        """Stops the job like `cancel`, but leaves it pending for the next run to resume"""
+        self.interrupted = True
+        self.process.cancel()
+
+    def pause(self) -> None:
+        if self.job.state != JobState.RUNNING:
+            return
+        self.process.pause()
+        self.job.state = JobState.PAUSED
+
+    def resume(self) -> None:
+        if self.job.state != JobState.PAUSED:
+            return
+        self.process.resume()
+        self.job.state = JobState.RUNNING
+
+    def __cacheKey(self) -> Tuple[OutputCache | None, str | None]:
+        if not self.job.cache or self.job.spec is None or self.job.renditions:
+            # The cache keeps a single output per conversion
+            return None, None
+        cache = get_output_cache()
+        if cache is None:
+            return None, None
+        try:
+            return cache, cache.key(self.job.input, self.job.spec)
+        except OSError:
+            return cache, None
+
+    def __stopped(self) -> JobState:
+        return JobState.PENDING if self.interrupted else JobState.CANCELLED
+
+    def __finish(self, state: JobState) -> JobState:
+        if self.cores is not None and self.job.limits.cores:
+            # The job keeps them listed, e.g. for the finished log line
+            self.cores.release(self.job.limits.cores)
+        if state != JobState.DONE:
+            for partial in [self.job.partial, *(rendition.partial for rendition in self.job.renditions)]:
+                if os.path.exists(partial):
+                    # Half-written output
+                    os.remove(partial)
+            if state.finished:
+                # Completed chunks are only kept for a job left pending, to be resumed
+                shutil.rmtree(self.job.workdir, ignore_errors=True)
+        self.job.state = state
+        if self.journal is not None:
+            self.journal.record([self.job])
+        self.__log("finished")
+        return state
+
+    def __log(self, event: str) -> None:
+        if self.sink is None:
+            return
+        fields = self.job.describe()
+        if self.job.error:
+            fields["error"] = self.job.error
+        self.sink.write(event, fields, self.job.metrics)
@@ -0,0 +1,137 @@
+import functools
+import math
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List
+
+# Minimum threads per ffmpeg process when the user did not ask for a specific count.
+MIN_THREADS_PER_JOB = 2
+
+
+@dataclass(frozen=True)
+class Schedule:
+    concurrency: int  # ffmpeg processes to run at once
+    threads: int  # -threads for each of them
+
+
+# Niceness of conversions started from the GUI, so the interface keeps its share of the cores
+BACKGROUND_NICE = 10
+
+
+def get_cpus() -> List[int]:
+    """Cores this process may run on, honouring affinity masks and cgroup pinning"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_cpu_count() -> int:
+    return max(1, len(get_cpus()))
+
+
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> str | None:
+    return shutil.which(name)
+
+
+@dataclass(frozen=True)
+class Limits:
+    """What the ffmpeg processes of a job may use"""
+
+    cores: FrozenSet[int] = frozenset()  # Pinned to these cores, empty runs anywhere
+    nice: int = 0  # Added niceness, lower priority leaves the cores to interactive programs first
+    idle_io: bool = False  # Idle I/O scheduling class (Linux), the disk is only used when nobody else needs it
+
+    def prefix(self) -> List[str]:
+        """
+        Launchers the process is started through, they set the priority and affinity
+        before ffmpeg starts any thread
+        """
+        prefix: List[str] = []
+        if self.cores and _which("taskset"):
+            prefix += ["taskset", "-c", ",".join(str(core) for core in sorted(self.cores))]
+        if self.nice and _which("nice"):
+            prefix += ["nice", "-n", str(self.nice)]
+        if self.idle_io and _which("ionice"):
+            prefix += ["ionice", "-c", "3"]
+        return prefix
+
+    def confine(self, pid: int) -> None:
+        """Pins a started process to `cores` when taskset is missing, where the platform supports affinity"""
+        if not self.cores or _which("taskset") or not hasattr(os, "sched_setaffinity"):
+            return
+        # New threads inherit the mask of their creator, threads started before this call are pinned one by one
+        try:
+            tasks = [int(task) for task in os.listdir(f"/proc/{pid}/task")]
+        except OSError:
+            tasks = [pid]
+        for task in tasks:
+            try:
+                os.sched_setaffinity(task, self.cores)
+            except OSError:
+                # Exited meanwhile
+                continue
+
+
+class CorePool:
+    """
+    Hands out disjoint sets of cores to the jobs running at once, so their threads neither
+    compete for a core nor evict each other's caches. Neighbouring cores are handed out
+    together, they usually share a cache. Thread-safe.
+    """
+
+    def __init__(self, cores: Iterable[int] | None = None):
+        self._free = sorted(cores if cores is not None else get_cpus())
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int) -> FrozenSet[int]:
+        """
+        `count` free cores, or none when fewer are free and the job runs unpinned.
+        Fewer cores than the job has threads would pile its threads onto them
+        """
+        with self._lock:
+            if count <= 0 or count > len(self._free):
+                return frozenset()
+            taken, self._free = self._free[:count], self._free[count:]
+        return frozenset(taken)
+
+    def release(self, cores: Iterable[int]) -> None:
+        with self._lock:
+            self._free = sorted({*self._free, *cores})
+
+
+def plan(jobs: int, cores: int | None = None, threads: int | None = None) -> Schedule:
+    """
+    Splits the cores between `jobs` conversions.
+
+    With few jobs each one gets a bigger share of the cores, with many jobs
+    the cores are filled with `cores // threads` concurrent processes. x264
+    stops scaling linearly after a handful of threads per stream, so by default
+    a job gets about sqrt(cores) threads and the rest goes to running files side by side.
+    """
+    cores = cores or get_cpu_count()
+    jobs = max(1, jobs)
+
+    if threads is None:
+        threads = max(MIN_THREADS_PER_JOB, math.isqrt(cores), cores // jobs)
+    threads = max(1, min(threads, cores))
+
+    concurrency = max(1, min(jobs, cores // threads))
+    return Schedule(concurrency=concurrency, threads=threads)
+
+
+def plan_in_process(jobs: int, cores: int | None = None) -> Schedule:
+    """In-process conversions (still images) each decode on a single pool thread, one per core"""
+    cores = cores or get_cpu_count()
+    return Schedule(concurrency=max(1, min(jobs, cores)), threads=1)
+
+
+def chunk_count(value: int | str) -> int:
+    """Resolves the Parallel Chunks option, `auto` gives every chunk the minimum thread budget"""
+    if value == "off":
+        return 0
+    if value == "auto":
+        return get_cpu_count() // MIN_THREADS_PER_JOB
+    return int(value)
@@ -0,0 +1,233 @@
+import dataclasses
+import functools
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from constant import Option
+from constant.File import Audio, File, Image, Video
+
+from . import Command, Scheduler
+from .Probe import Stream
+
+
+@dataclass(frozen=True, slots=True)
+class Rendition:
+    """A further output at another size, encoded from the same decode. Unset fields follow the main output"""
+
+    width: int
+    height: int
+    frame_rate: int | str | None = None
+    crf: int | None = None
+    preset: str | None = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.width}x{self.height}"
+
+
+@dataclass(frozen=True, slots=True)
+class ConversionSpec:
+    """
+    Conversion settings as plain data.
+
+    Immutable and hashable, so it can be compared, used as a cache key, serialized
+    and sent to worker processes. The GUI forms are bound to it instead of being
+    read back when converting.
+    """
+
+    target: File
+    crf: int = Option.DEFAULT_CRF
+    width: int = 0  # 0 keeps the source size
+    height: int = 0
+    fit: str = Option.DEFAULT_FIT  # How other aspect ratios are brought to the resolution, see Option.FITS
+    scaler: str = Option.DEFAULT_SCALER  # ffmpeg's scaling algorithm, see Option.SCALERS
+    preset: str = Option.DEFAULT_PRESET
+    frame_rate: int | str = "auto"
+    chunks: int | str = "off"
+    target_size: float = 0.0  # Megabytes the output must fit in, 0 encodes at constant quality (crf) instead
+    colors: int = 256  # GIF palette size
+    dither: str = Option.DEFAULT_DITHER  # GIF dithering, see ffmpeg's paletteuse filter
+    exif: bool = True  # Keep the EXIF metadata of still images
+    start: float = 0.0  # Trim, seconds into the source to start at
+    end: float = 0.0  # Trim, seconds into the source to stop at, 0 keeps the rest
+    audio: str = Option.DEFAULT_AUDIO  # Copy, re-encode or drop the audio, see Option.AUDIO_MODES
+    audio_bitrate: int | str = "auto"  # kbit/s of re-encoded audio
+    sample_rate: int | str = "auto"  # Hz, resampled by the encoding process itself
+    channels: int | str = "auto"  # Downmixed by the encoding process itself, e.g. 1 for mono
+    renditions: Tuple[Rendition, ...] = ()  # Further outputs of videos, the source is decoded once for all
+
+    def replace(self, **changes: Any) -> "ConversionSpec":
+        return dataclasses.replace(self, **changes)
+
+    @property
+    def resolution(self) -> Option.ResolutionItem | None:
+        if not self.width or not self.height:
+            return None
+        return Option.find_resolution(f"{self.width}x{self.height}") or Option.ResolutionItem(
+            name=f"{self.width}x{self.height}", width=self.width, height=self.height,
+            aspectRatio=self.width / self.height,
+        )
+
+    @property
+    def requires_encode(self) -> bool:
+        """Whether the settings change the picture, which rules out stream copying"""
+        if isinstance(self.target, Audio):
+            return False
+        return bool(
+            Command.resolution_args(self.resolution, self.fit, self.scaler) or Command.frame_rate_args(self.frame_rate)
+            or self.target_size
+            or self.renditions  # Every output is fed by the split filter graph
+        )
+
+    @property
+    def trimmed(self) -> bool:
+        return self.start > 0 or self.end > 0
+
+    def scales(self, width: int, height: int) -> bool:
+        """Whether the resolution changes a `width` x `height` source, 0 when unknown"""
+        if self.resolution is None:
+            return False
+        if not width or not height:
+            return True
+        if self.fit in ("stretch", "pad"):
+            return (width, height) != (self.width, self.height)
+        # Fitting and filling never upscale, sources within the size only get their sides made even
+        return width > self.width or height > self.height or width % 2 == 1 or height % 2 == 1
+
+    def changes_audio(self, stream: Stream | None) -> bool:
+        """Whether the audio settings change the probed `stream`, which rules out copying it"""
+        if stream is None or self.audio == "none":
+            return False
+        if self.audio == "encode":
+            return True
+        if self.audio_bitrate != "auto" and not 0 < stream.bit_rate <= int(self.audio_bitrate) * 1000:
+            # Never raises the bitrate, a source already below it is kept
+            return True
+        return (
+            self.sample_rate != "auto" and self.sample_rate != stream.sample_rate
+            or self.channels != "auto" and self.channels != stream.channels
+        )
+
+    def audio_args(self) -> Tuple[str, ...]:
+        """ffmpeg output arguments of re-encoded audio"""
+        if self.audio == "none":
+            return ("-an",)
+        return tuple(Command.audio_args(self.target, self.audio_bitrate, self.sample_rate, self.channels))
+
+    def rendition(self, rendition: Rendition) -> "ConversionSpec":
+        """Settings of one of the further outputs"""
+        return self.replace(
+            width=rendition.width,
+            height=rendition.height,
+            frame_rate=self.frame_rate if rendition.frame_rate is None else rendition.frame_rate,
+            crf=self.crf if rendition.crf is None else rendition.crf,
+            preset=rendition.preset or self.preset,
+            target_size=0.0,
+            renditions=(),
+        )
+
+    def filters(self) -> str:
+        """Scale and frame rate as a filter chain, for an output fed by a filter graph"""
+        return ",".join(
+            chain for chain in (
+                Command.resolution_filter(self.resolution, self.fit, self.scaler),
+                Command.frame_rate_filter(self.frame_rate),
+            )
+            if chain
+        )
+
+    def encoder_args(self) -> Tuple[str, ...]:
+        """The output arguments besides the filters, for an output fed by a filter graph"""
+        return (*Command.codec_args(self.target), *Command.crf_args(self.crf), *Command.preset_args(self.preset))
+
+    def duration(self, source: float) -> float:
+        """Seconds of output from a `source` seconds long input"""
+        end = min(self.end, source) if self.end and source else self.end or source
+        return max(0.0, end - self.start)
+
+    @property
+    def segments(self) -> int:
+        # The bitrate of a sized encode is spread over the whole video, chunks cannot share it.
+        # Trims are short by nature and seek on their own
+        # Chunks would decode the source once per rendition again
+        if self.target_size or self.trimmed or self.renditions:
+            return 0
+        return Scheduler.chunk_count(self.chunks)
+
+    def compile(self) -> Tuple[str, ...]:
+        """ffmpeg output arguments, always the same for equal specs"""
+        return _compile(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "target": self.target.value,
+            "crf": self.crf,
+            "width": self.width,
+            "height": self.height,
+            "fit": self.fit,
+            "scaler": self.scaler,
+            "preset": self.preset,
+            "frame_rate": self.frame_rate,
+            "chunks": self.chunks,
+            "target_size": self.target_size,
+            "colors": self.colors,
+            "dither": self.dither,
+            "exif": self.exif,
+            "start": self.start,
+            "end": self.end,
+        }
+        audio = {
+            "audio": self.audio,
+            "audio_bitrate": self.audio_bitrate,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+        }
+        if audio != {"audio": Option.DEFAULT_AUDIO, "audio_bitrate": "auto", "sample_rate": "auto", "channels": "auto"}:
+            # Only when changed, so the keys of earlier specs stay the same
+            data.update(audio)
+        if self.renditions:
+            # Only when set, so the keys of single output specs stay the same
+            data["renditions"] = [dataclasses.asdict(rendition) for rendition in self.renditions]
+        return data
+
+    def key(self) -> str:
+        """Canonical string form, e.g. for journal keys"""
+        return json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+
+    def output_key(self) -> str:
+        """Like `key`, without the settings that only split the work, so equal outputs share it in the output cache"""
+        data = self.to_dict()
+        del data["chunks"]
+        return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ConversionSpec":
+        target = File.from_str(data["target"])
+        if target is None:
+            raise ValueError(f"Unsupported target: {data['target']}")
+        fields = {field.name for field in dataclasses.fields(ConversionSpec)}
+        renditions = tuple(Rendition(**rendition) for rendition in data.get("renditions", ()))
+        return ConversionSpec(**{
+            **{k: v for k, v in data.items() if k in fields}, "target": target, "renditions": renditions,
+        })
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(spec: ConversionSpec) -> Tuple[str, ...]:
+    if spec.target == Image.GIF:
+        return tuple(Command.gif_args(
+            spec.frame_rate, spec.width, spec.height, spec.colors, spec.dither, spec.fit, spec.scaler,
+        ))
+    if isinstance(spec.target, Audio):
+        # The picture settings do not apply, the audio options come with the plan
+        return ("-vn",)
+    args = [*Command.codec_args(spec.target)]
+    if isinstance(spec.target, Video) and not spec.target_size:
+        # Sized encodes get their bitrate once the duration is known
+        args += Command.crf_args(spec.crf)
+    args += Command.resolution_args(spec.resolution, spec.fit, spec.scaler)
+    if isinstance(spec.target, Video):
+        args += Command.preset_args(spec.preset)
+    args += Command.frame_rate_args(spec.frame_rate)
+    return tuple(args)
@@ -0,0 +1,276 @@
+import os
+import queue
+import subprocess
+import threading
+from itertools import chain
+from typing import BinaryIO, Dict, Iterator, List
+
+from constant.File import Audio, File, Video
+from util.sniff import moov_first, sniff
+
+from . import Command, Planner
+from .Planner import Plan
+from .Probe import MediaInfo, ProbeError, probe_head
+from .Process import FFmpegError, FFmpegProcess, ProgressCallback
+from .Progress import ProgressParser, Usage
+from .Scheduler import Limits
+from .Spec import ConversionSpec
+
+CHUNK_SIZE: int = 64 * 1024  # Bytes per read and write, a pipe's kernel buffer on Linux
+BUFFERED_CHUNKS: int = 64  # Output chunks (4 MiB) held for a slow consumer, ffmpeg waits once they are full
+PROBE_SIZE: int = 2 * 1024 * 1024  # Head of the source probed to plan copy-or-encode, then fed to ffmpeg first
+
+# Containers that keep their index in a moov box, which ffmpeg cannot find after the media data on a pipe
+_BMFF_FORMATS = frozenset({"MP4", "MOV", "M4A", "3GP"})
+
+# Muxer options of the targets that can be written front to back, without seeking back into the output.
+# MP4 and MOV are fragmented: an empty moov up front, then self-contained fragments from keyframe to keyframe
+MUXERS: Dict[File, List[str]] = {
+    Video.MP4: ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    Video.MOV: ["-f", "mov", "-movflags", "frag_keyframe+empty_moov"],
+    Video.MPEG: ["-f", "mpeg"],
+    # Audio has no keyframes to cut fragments at, a fragment per second instead
+    Audio.M4A: ["-f", "ipod", "-movflags", "empty_moov+default_base_moof", "-frag_duration", "1000000"],
+    Audio.MP3: ["-f", "mp3"],
+}
+
+
+class StreamError(RuntimeError):
+    pass
+
+
+def _check(spec: ConversionSpec) -> None:
+    if spec.target not in MUXERS:
+        raise StreamError(f"{spec.target.value} cannot be streamed, convert a file instead")
+    if spec.target_size:
+        raise StreamError("Encoding to a size takes two passes over the source, a stream cannot be rewound")
+    if spec.renditions:
+        raise StreamError("Renditions are further outputs, a stream has a single one")
+
+
+def peek(source: BinaryIO, size: int = PROBE_SIZE) -> bytes:
+    """Reads up to `size` bytes, fewer only when the stream ends first"""
+    chunks: List[bytes] = []
+    read = 0
+    while read < size:
+        chunk = source.read(min(CHUNK_SIZE, size - read))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        read += len(chunk)
+    return b"".join(chunks)
+
+
+def plan(spec: ConversionSpec, info: MediaInfo | None) -> Plan | None:
+    """Copy-or-encode from the probed head, None when it could not be probed"""
+    if info is None:
+        return None
+    return Planner.plan(
+        info, spec.target, spec.requires_encode,
+        requires_audio_encode=spec.changes_audio(info.audio),
+        drop_audio=spec.audio == "none",
+        audio_args=spec.audio_args(),
+    )
+
+
+def stream_args(spec: ConversionSpec, stream_plan: Plan | None, threads: int = 0) -> List[str]:
+    """ffmpeg arguments reading the source from standard input and writing the output to standard output"""
+    _check(spec)
+    encode = list(spec.compile())
+    args = stream_plan.args(encode) if stream_plan is not None else [*encode, *spec.audio_args()]
+    x264 = isinstance(spec.target, Video) and (stream_plan is None or stream_plan.video == Planner.Action.ENCODE)
+    return [
+        *Command.trim_args(spec.start, spec.end), *Command.decoder_thread_args(threads), "-i", "pipe:0",
+        *args, *Command.thread_args(threads, x264), *MUXERS[spec.target], "pipe:1",
+    ]
+
+
+class StreamEncode(FFmpegProcess):
+    """
+    Converts a stream: ffmpeg reads the source from a file-like object and the output is
+    pulled in chunks as it is muxed, nothing is written to disk.
+
+    Every buffer is bounded. The source is read a chunk at a time as fast as ffmpeg takes it,
+    and up to BUFFERED_CHUNKS of output wait for the consumer. Beyond that ffmpeg blocks on
+    its output and stops reading the source in turn, so a slow consumer slows the whole pipe
+    down instead of growing memory. Progress comes through a pipe of its own, standard output
+    carries the media.
+    """
+
+    def __init__(self, args: List[str], source: BinaryIO, head: bytes = b"", sink: BinaryIO | None = None,
+                 limits: Limits | None = None, usage: Usage | None = None):
+        super().__init__(args, limits, usage)
+        self.source = source
+        self.head = head  # Read from the source before, e.g. to probe it, fed first
+        self.sink = sink
+        self.plan: Plan | None = None
+        self._source_error: OSError | None = None
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        """Writes the output to `sink` as it comes, raises FFmpegError on failure"""
+        assert self.sink is not None
+        chunks = self.chunks(on_progress)
+        try:
+            for chunk in chunks:
+                self.sink.write(chunk)
+                # Downstream gets every chunk right away, not once a buffer fills
+                self.sink.flush()
+        finally:
+            chunks.close()
+        return self.returncode if self.returncode is not None else -1
+
+    def chunks(self, on_progress: ProgressCallback | None = None) -> Iterator[bytes]:
+        """
+        The output as it is muxed. Raises FFmpegError once exhausted when the conversion failed,
+        stopping early cancels it.
+        """
+        with self._lock:
+            if self._cancelled:
+                return
+            progress_fd: int | None = None
+            pass_fds: tuple[int, ...] = ()
+            if os.name == "posix":
+                progress_fd, write_fd = os.pipe()
+                self.progress = f"pipe:{write_fd}"
+                pass_fds = (write_fd,)
+            else:
+                self.progress = os.devnull
+            try:
+                self._process = subprocess.Popen(
+                    self.command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    pass_fds=pass_fds,
+                )
+            except OSError:
+                if progress_fd is not None:
+                    os.close(progress_fd)
+                raise
+            finally:
+                for fd in pass_fds:
+                    os.close(fd)
+            self.limits.confine(self._process.pid)
+
+        buffer: "queue.Queue[bytes | None]" = queue.Queue(maxsize=BUFFERED_CHUNKS)
+        # The feeder may block on a source that has nothing to read, it is never joined
+        threading.Thread(target=self._feed, daemon=True).start()
+        threads = [
+            threading.Thread(target=self._drain_stderr, daemon=True),
+            threading.Thread(target=self._read_output, args=(buffer,), daemon=True),
+        ]
+        if progress_fd is not None:
+            threads.append(threading.Thread(target=self._read_progress, args=(progress_fd, on_progress), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        finished = False
+        try:
+            while True:
+                try:
+                    chunk = buffer.get(timeout=0.1)
+                except queue.Empty:
+                    if self._cancelled:
+                        break
+                    continue
+                if chunk is None:
+                    finished = True
+                    break
+                yield chunk
+        finally:
+            if not finished:
+                # Cancelled, or the consumer stopped pulling
+                self.cancel()
+            self.returncode = self._wait()
+            for thread in threads:
+                thread.join()
+
+        if self._cancelled:
+            return
+        if self._source_error is not None:
+            raise OSError(f"Cannot read the source: {self._source_error}")
+        if self.returncode != 0:
+            raise FFmpegError(self.returncode, self.stderr)
+
+    def _feed(self) -> None:
+        assert self._process is not None and self._process.stdin is not None
+        stdin = self._process.stdin
+        # Whatever is available, instead of waiting for a whole chunk from a slow network
+        read = getattr(self.source, "read1", self.source.read)
+        try:
+            if self.head:
+                stdin.write(self.head)
+            while not self._cancelled:
+                try:
+                    chunk = read(CHUNK_SIZE)
+                except OSError as e:
+                    self._source_error = e
+                    break
+                if not chunk:
+                    break
+                stdin.write(chunk)
+        except OSError:
+            # ffmpeg stopped reading, it failed or was cancelled
+            pass
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _read_output(self, buffer: "queue.Queue[bytes | None]") -> None:
+        assert self._process is not None and self._process.stdout is not None
+        stdout = self._process.stdout
+        for chunk in chain(iter(lambda: stdout.read1(CHUNK_SIZE), b""), [None]):
+            # Waits for room while the consumer catches up, ffmpeg blocks on its output meanwhile
+            while True:
+                try:
+                    buffer.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._cancelled:
+                        return
+
+    def _read_progress(self, fd: int, on_progress: ProgressCallback | None) -> None:
+        parser = ProgressParser()
+        with open(fd, "r", encoding="utf-8", errors="replace") as file:
+            for line in file:
+                block = parser.feed(line)
+                if block is not None and on_progress is not None:
+                    on_progress(block)
+
+    def _drain_stderr(self) -> None:
+        assert self._process is not None and self._process.stderr is not None
+        for line in self._process.stderr:
+            text = line.decode(errors="replace").rstrip()
+            if text:
+                self._stderr.append(text)
+
+
+def open_stream(spec: ConversionSpec, source: BinaryIO, sink: BinaryIO | None = None, threads: int = 0,
+                limits: Limits | None = None, usage: Usage | None = None) -> StreamEncode:
+    """
+    Sets up the conversion of `source`, probing its first PROBE_SIZE bytes so compatible
+    streams are copied. Call `run` to write the output to `sink`, or iterate `chunks`.
+    """
+    _check(spec)
+    head = peek(source)
+    if sniff(head) in _BMFF_FORMATS and moov_first(head) is False:
+        raise StreamError(
+            "The source keeps its index (moov) after the media data, which cannot be read from a pipe. "
+            "Pass the file itself instead of -, or make it faststart, e.g. with "
+            "'ffmpeg -i INPUT -c copy -movflags +faststart OUTPUT'"
+        )
+    try:
+        info: MediaInfo | None = probe_head(head)
+    except ProbeError:
+        # Converted blindly, ffmpeg reports what it cannot read
+        info = None
+    video = info.video if info is not None else None
+    if video is not None and spec.resolution is not None and not spec.scales(*video.display_size):
+        # Already within the chosen size, which is never upscaled, copying may be possible after all
+        spec = spec.replace(width=0, height=0)
+    stream_plan = plan(spec, info)
+    process = StreamEncode(stream_args(spec, stream_plan, threads), source, head, sink, limits, usage)
+    process.plan = stream_plan
+    return process
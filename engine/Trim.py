@@ -0,0 +1,292 @@
+import dataclasses
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from . import Command
+from .Chunked import ChunkError, verify_continuity
+from .Job import Job
+from .Planner import Action
+from .Process import FFmpegProcess, ProgressCallback
+from .Progress import Metrics
+from .Probe import ProbeError, Stream, keyframes_cached, packet_times, probe, probe_cached
+
+# Seconds around each cut point searched for keyframes, longer GOPs fall back to reading every keyframe
+KEYFRAME_WINDOW: float = 30.0
+
+# Edge encodes must join the copied keyframes, only libx264 output is known to match the source
+EDGE_CODECS = frozenset({"h264"})
+EDGE_PIXEL_FORMATS = frozenset({"yuv420p"})
+
+# x264 profiles by ffprobe's H.264 profile names, 8-bit 4:2:0 only like EDGE_PIXEL_FORMATS
+EDGE_PROFILES: Dict[str, str] = {
+    "constrained baseline": "baseline",
+    "baseline": "baseline",
+    "main": "main",
+    "high": "high",
+}
+
+
+class TrimError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Part:
+    start: float
+    end: float
+    copy: bool  # Stream copied whole GOPs, otherwise re-encoded
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def edge_args(video: Stream) -> List[str] | None:
+    """
+    x264 options giving the edge encodes the sequence parameters of `video`, so they join
+    its copied GOPs in a single track. None when the source's parameters are unknown.
+    """
+    profile = EDGE_PROFILES.get(video.profile.lower())
+    if profile is None or not video.level:
+        return None
+    args = ["-profile:v", profile, "-level", f"{video.level // 10}.{video.level % 10}"]
+    if video.refs:
+        args += ["-refs", str(video.refs)]
+    if video.reorder == 0:
+        args += ["-bf", "0"]
+    elif video.reorder == 1:
+        # B-frames used as references need a second frame of reordering
+        args += ["-b-pyramid", "none"]
+    return args
+
+
+def _matches(source: Stream, edge: Stream) -> bool:
+    return (edge.codec, edge.pixel_format, edge.width, edge.height, edge.profile, edge.level, edge.refs) \
+        == (source.codec, source.pixel_format, source.width, source.height, source.profile, source.level, source.refs)
+
+
+def cut(keyframes: Tuple[float, ...], start: float, end: float, frame: float) -> List[Part]:
+    """
+    Splits the trim into re-encoded edges and the stream copied GOPs between them.
+    Cut points within half a frame of a keyframe count as on it.
+    """
+    tolerance = frame / 2
+    first = min((k for k in keyframes if k >= start - tolerance), default=None)
+    last = max((k for k in keyframes if k <= end + tolerance), default=None)
+    if first is None or last is None or last - first < tolerance:
+        # No whole GOP inside the trim, nothing to copy
+        return [Part(start, end, copy=False)]
+
+    parts: List[Part] = []
+    if first - start >= tolerance:
+        parts.append(Part(start, first, copy=False))
+    parts.append(Part(first, last, copy=True))
+    if end - last >= tolerance:
+        parts.append(Part(last, end, copy=False))
+    return parts
+
+
+class SmartCut:
+    """
+    Trims a stream copied video, re-encoding only the partial GOPs at its edges.
+
+    The keyframes are looked up around the cut points only, the whole GOPs between
+    them are copied as they are, and the parts are joined with the concat demuxer.
+    A short trim from a long file costs about as much as copying the trimmed seconds.
+    The edges are encoded with the source's profile, level and reference frames, so the
+    joined track keeps one set of sequence parameters. Sources the edge encoder cannot
+    match, or edges that came out different anyway, are re-encoded over the trimmed range instead.
+    Quacks like FFmpegProcess, so workers can run either.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self._process: FFmpegProcess | None = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._paused = False
+        self._resumed = threading.Event()  # Cleared while paused, the next part waits on it before starting
+        self._resumed.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        spec = self.job.spec
+        try:
+            info = probe_cached(self.job.input)
+        except ProbeError as e:
+            raise TrimError(f"Cannot trim {self.job.input}: {e}") from e
+        video = info.video
+        if spec is None or video is None:
+            raise TrimError(f"Cannot trim {self.job.input}, it has no video")
+
+        start = spec.start
+        end = start + spec.duration(info.duration)
+        if end <= start:
+            raise TrimError(f"Nothing to keep between {start:g}s and {end:g}s of {self.job.input}")
+
+        edge = edge_args(video)
+        if video.codec not in EDGE_CODECS or video.pixel_format not in EDGE_PIXEL_FORMATS or edge is None:
+            return self._encode_range(on_progress)
+
+        frame = 1 / video.frame_rate if video.frame_rate else 0.04
+        parts = cut(self._keyframes(start, end), start, end, frame)
+        if not any(part.copy for part in parts):
+            return self._encode_range(on_progress)
+
+        def report(offset: float, block: Dict[str, str]) -> None:
+            # Parts run one after another, each continues where the previous one ended
+            if on_progress is None:
+                return
+            out_time_us = int((Metrics.from_block(block).out_time + offset) * 1_000_000)
+            on_progress({**block, "out_time_us": str(out_time_us), "progress": "continue"})
+
+        workdir = tempfile.mkdtemp(prefix=".mediarage-", dir=os.path.dirname(os.path.abspath(self.job.partial)))
+        try:
+            paths: List[str] = []
+            for index, part in enumerate(parts):
+                if self._cancelled:
+                    return -1
+                # MPEG-TS carries the parameter sets in-band, so encoded and copied parts join cleanly
+                path = os.path.join(workdir, f"part-{index}.ts")
+                self._part(part, frame, edge, path, lambda block, offset=part.start - start: report(offset, block))
+                if not part.copy and not self._cancelled and not self._joins(video, path):
+                    return self._encode_range(on_progress)
+                paths.append(path)
+
+            audio = None
+            if info.audio is not None and self.job.plan is not None and self.job.plan.keeps_audio \
+                    and not self._cancelled:
+                audio = os.path.join(workdir, "audio.mka")
+                self._audio(start, end, audio)
+            if self._cancelled:
+                return -1
+
+            self._concat(workdir, paths, audio)
+            if not self._cancelled:
+                try:
+                    verify_continuity(self.job.partial, self.job.input, [part.start for part in parts[1:]], start)
+                except ChunkError as e:
+                    raise TrimError(f"Cannot join the cut of {self.job.input}: {e}") from e
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        if on_progress is not None and not self._cancelled:
+            on_progress({"out_time_us": str(int((end - start) * 1_000_000)), "progress": "end"})
+        return -1 if self._cancelled else 0
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            self._resumed.set()
+            process = self._process
+        if process is not None:
+            process.cancel()
+
+    def pause(self) -> None:
+        with self._lock:
+            self._paused = True
+            self._resumed.clear()
+            process = self._process
+        if process is not None:
+            process.pause()
+
+    def resume(self) -> None:
+        with self._lock:
+            self._paused = False
+            self._resumed.set()
+            process = self._process
+        if process is not None:
+            process.resume()
+
+    def _keyframes(self, start: float, end: float) -> Tuple[float, ...]:
+        """Keyframes around both cut points, only demuxing the packets near them"""
+        try:
+            keyframes = set()
+            for point in (start, end):
+                interval = f"{max(0.0, point - KEYFRAME_WINDOW):.3f}%{point + KEYFRAME_WINDOW:.3f}"
+                keyframes.update(packet_times(self.job.input, keyframes_only=True, interval=interval))
+            after_start = any(start <= k <= start + KEYFRAME_WINDOW for k in keyframes)
+            before_end = any(end - KEYFRAME_WINDOW <= k <= end for k in keyframes)
+            if after_start and before_end:
+                return tuple(sorted(keyframes))
+            # A GOP longer than the window, the nearest keyframes may lie anywhere in between
+            return keyframes_cached(self.job.input)
+        except ProbeError as e:
+            raise TrimError(f"Cannot find the keyframes of {self.job.input}: {e}") from e
+
+    def _joins(self, video: Stream, path: str) -> bool:
+        """Whether the encoded edge at `path` carries the sequence parameters of the source"""
+        try:
+            encoded = probe(path).video
+        except ProbeError:
+            return False
+        return encoded is not None and _matches(video, encoded)
+
+    def _part(self, part: Part, frame: float, edge: List[str], path: str, on_progress: ProgressCallback) -> None:
+        if part.copy:
+            # Stop half a frame early, so the keyframe starting the tail is not copied twice
+            trim = ["-ss", f"{part.start:.6f}", "-t", f"{part.duration - frame / 2:.6f}"]
+            video = ["-c:v", "copy"]
+        else:
+            trim = Command.trim_args(part.start, part.end)
+            video = [*self.job.args, *edge, *Command.thread_args(self.job.threads, x264=True)]
+        self._run([
+            *trim, *Command.decoder_thread_args(self.job.threads), "-i", self.job.input,
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            *video, "-f", "mpegts", path,
+        ], on_progress)
+
+    def _audio(self, start: float, end: float, path: str) -> None:
+        codec = self.job.plan.audio_codec_args() if self.job.plan is not None else ["-c:a", "aac"]
+        self._run([
+            *Command.trim_args(start, end), "-i", self.job.input,
+            "-map", "0:a:0", "-vn", "-sn", "-dn",
+            *codec,
+            path,
+        ])
+
+    def _concat(self, workdir: str, paths: List[str], audio: str | None) -> None:
+        playlist = os.path.join(workdir, "parts.txt")
+        with open(playlist, "w", encoding="utf-8") as file:
+            for path in paths:
+                # The concat demuxer expects single quotes escaped as '\''
+                path = path.replace("'", "'\\''")
+                file.write(f"file '{path}'\n")
+
+        args = ["-f", "concat", "-safe", "0", "-i", playlist]
+        if audio is not None:
+            args += ["-i", audio, "-map", "0:v:0", "-map", "1:a:0"]
+        self._run([*args, "-c", "copy", self.job.partial])
+
+    def _encode_range(self, on_progress: ProgressCallback | None) -> int:
+        """Re-encodes the whole trimmed range, frame accurate at any cut point"""
+        plan = self.job.plan
+        encode = dataclasses.replace(plan, video=Action.ENCODE, hvc1=False) if plan is not None else None
+        args = encode.args(self.job.args) if encode is not None else self.job.args
+        threads = Command.thread_args(self.job.threads, x264=True)
+        self._run([*self.job.input_args, *args, *threads, self.job.partial], on_progress)
+        return -1 if self._cancelled else 0
+
+    def _run(self, args: List[str], on_progress: ProgressCallback | None = None) -> None:
+        self._resumed.wait()
+        process = FFmpegProcess(args, self.job.limits, self.job.usage)
+        with self._lock:
+            if self._cancelled:
+                return
+            self._process = process
+        try:
+            process.run(on_progress)
+        finally:
+            with self._lock:
+                self._process = None
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List
+
+from . import Command
+from .Job import Job
+from .Planner import Action
+from .Process import FFmpegProcess, ProgressCallback
+from .Progress import Metrics, format_seconds
+from .Probe import ProbeError, probe_cached
+
+AUDIO_KBPS: int = 128  # Bitrate of re-encoded audio
+MUX_OVERHEAD: float = 0.02  # Container share of the file size
+MIN_VIDEO_KBPS: int = 32
+MAX_ATTEMPTS: int = 4  # Second passes tried before giving up on an overshooting size
+RETRY_MARGIN: float = 0.97  # Aim this much below the target again after an overshoot
+
+
+class TwoPassError(RuntimeError):
+    pass
+
+
+def video_bitrate(target_bytes: int, duration: float, audio_kbps: float) -> float:
+    """Video bitrate in kbit/s filling `target_bytes` over `duration` seconds next to the audio"""
+    total_kbps = target_bytes * 8 * (1 - MUX_OVERHEAD) / duration / 1000
+    return total_kbps - audio_kbps
+
+
+class TwoPassEncode:
+    """
+    Encodes a job to fit its spec's target size.
+
+    The bitrate follows from the probed duration. A first pass writes the rate control
+    statistics, the second pass encodes with them. Both passes use the same encoder
+    options, x264 rejects statistics gathered with other B-frame settings and already
+    speeds up first passes on its own. When the output still overshoots, only the second
+    pass runs again, at a bitrate scaled down by the overshoot, reusing the statistics
+    of the first.
+    Quacks like FFmpegProcess, so workers can run either.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self._process: FFmpegProcess | None = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._paused = False
+        self._resumed = threading.Event()  # Cleared while paused, the next pass waits on it before starting
+        self._resumed.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def target_bytes(self) -> int:
+        return int(self.job.spec.target_size * 1_000_000) if self.job.spec is not None else 0
+
+    def run(self, on_progress: ProgressCallback | None = None) -> int:
+        try:
+            info = probe_cached(self.job.input)
+        except ProbeError as e:
+            raise TwoPassError(f"Cannot size {self.job.input}: {e}") from e
+        duration = self.job.spec.duration(info.duration)
+        if duration <= 0:
+            raise TwoPassError(f"Cannot size {self.job.input}, its duration is unknown")
+
+        audio_args: List[str] = []
+        audio_kbps = 0.0
+        plan = self.job.plan
+        keeps_audio = info.audio is not None and (plan is None or plan.keeps_audio)
+        if keeps_audio:
+            if plan is not None and plan.audio == Action.COPY:
+                audio_kbps = info.audio.bit_rate / 1000 or AUDIO_KBPS
+            elif self.job.spec.audio_bitrate != "auto":
+                # Set by the plan's audio options
+                audio_kbps = float(self.job.spec.audio_bitrate)
+            else:
+                audio_kbps = AUDIO_KBPS
+                audio_args = ["-b:a", f"{AUDIO_KBPS}k"]
+
+        target = self.target_bytes
+        bitrate = video_bitrate(target, duration, audio_kbps)
+        if bitrate < MIN_VIDEO_KBPS:
+            raise TwoPassError(
+                f"{self.job.spec.target_size:g} MB is too small for {format_seconds(duration)} of video"
+            )
+
+        def report(offset: float, block: Dict[str, str]) -> None:
+            # Both passes cover the whole duration, each counts as half of the progress
+            if on_progress is None:
+                return
+            out_time_us = int((Metrics.from_block(block).out_time / 2 + offset) * 1_000_000)
+            final = block.get("progress") == "end" and offset > 0
+            on_progress({**block, "out_time_us": str(out_time_us), "progress": "end" if final else "continue"})
+
+        workdir = tempfile.mkdtemp(prefix=".mediarage-", dir=os.path.dirname(os.path.abspath(self.job.partial)))
+        passlog = os.path.join(workdir, "pass")
+        threads = Command.thread_args(self.job.threads, x264=True)
+        # The second pass must encode the very stream the first analysed, not ffmpeg's pick
+        maps = ["-map", "0:v:0", *(["-map", "0:a:0"] if keeps_audio else [])]
+        try:
+            self._run([
+                *self.job.input_args, "-map", "0:v:0", "-an", "-sn", "-dn", *self.job.args,
+                "-b:v", f"{bitrate:.0f}k", "-pass", "1", "-passlogfile", passlog, *threads,
+                "-f", "null", os.devnull,
+            ], lambda block: report(0.0, block))
+
+            for _ in range(MAX_ATTEMPTS):
+                if self._cancelled:
+                    return -1
+                encode = [*self.job.args, "-b:v", f"{bitrate:.0f}k", "-pass", "2", "-passlogfile", passlog]
+                args = self.job.plan.args(encode) if self.job.plan is not None else encode
+                self._run(
+                    [*self.job.input_args, *maps, *args, *audio_args, *threads, self.job.partial],
+                    lambda block: report(duration / 2, block),
+                )
+                if self._cancelled:
+                    return -1
+
+                size = os.path.getsize(self.job.partial)
+                if size <= target:
+                    return 0
+                bitrate *= target / size * RETRY_MARGIN
+                if bitrate < MIN_VIDEO_KBPS:
+                    break
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        raise TwoPassError(f"Could not fit {self.job.input} into {self.job.spec.target_size:g} MB")
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            self._resumed.set()
+            process = self._process
+        if process is not None:
+            process.cancel()
+
+    def pause(self) -> None:
+        with self._lock:
+            self._paused = True
+            self._resumed.clear()
+            process = self._process
+        if process is not None:
+            process.pause()
+
+    def resume(self) -> None:
+        with self._lock:
+            self._paused = False
+            self._resumed.set()
+            process = self._process
+        if process is not None:
+            process.resume()
+
+    def _run(self, args: List[str], on_progress: ProgressCallback) -> None:
+        self._resumed.wait()
+        process = FFmpegProcess(args, self.job.limits, self.job.usage)
+        with self._lock:
+            if self._cancelled:
+                return
+            self._process = process
+        try:
+            process.run(on_progress)
+        finally:
+            with self._lock:
+                self._process = None
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Collection, Dict, Iterable, List, Tuple
+
+from util.system import get_cache_directory
+
+from .Spec import ConversionSpec
+
+# Seconds a file must keep the same size and modification time before it is converted,
+# so files still being copied (e.g. from a camera card) are not picked up halfway
+SETTLE_SECONDS: float = 5.0
+
+# File states in the index
+PENDING = "pending"  # Found, waiting for it to stop growing
+QUEUED = "queued"  # Handed over for conversion
+IGNORED = "ignored"  # Cannot be converted to the target
+
+
+@dataclass
+class _Settling:
+    size: int
+    mtime: int
+    since: float  # When the size and modification time were first seen unchanged
+
+
+def watch_key(spec: ConversionSpec, output_dir: str | None = None) -> str:
+    """Identifies a watch by what it converts to, files are handled again for other settings"""
+    identity = f"{spec.key()}\n{os.path.abspath(output_dir) if output_dir else ''}"
+    return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+
+def _hidden(name: str) -> bool:
+    # Partial outputs and chunk directories are dot files too
+    return name.startswith(".")
+
+
+class Watcher:
+    """
+    Finds files appearing under watched folders, and tells when they are done being written.
+
+    Scans are incremental: every directory is recorded with its modification time and
+    only directories whose time changed (an entry was added, removed or renamed) are
+    listed again, the others are descended through their recorded subdirectories.
+    Files are recorded with their size and modification time once handed over, so
+    nothing is converted twice, also across restarts. Watching a tree of 100k files
+    costs a stat per directory per scan.
+
+    Call `scan` on change notifications or periodically, and `settled` to collect the
+    files that stopped growing. Files rewritten in place keep their directory's time,
+    they are not picked up again. Thread-safe.
+    """
+
+    def __init__(self, roots: Iterable[str], spec: ConversionSpec, output_dir: str | None = None,
+                 path: str | None = None, settle: float = SETTLE_SECONDS):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.spec = spec
+        self.output_dir = output_dir
+        self.settle = settle
+        self.key = watch_key(spec, output_dir)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or os.path.join(get_cache_directory(), "watch.sqlite3"),
+                                   check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS dirs (
+                watch TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime INTEGER NOT NULL,  -- Nanoseconds, as of the last listing
+                subdirs TEXT NOT NULL,  -- JSON list of the subdirectory paths
+                PRIMARY KEY (watch, path)
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                watch TEXT NOT NULL,
+                path TEXT NOT NULL,
+                dir TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (watch, path)
+            );
+            CREATE INDEX IF NOT EXISTS files_dir ON files (watch, dir);
+        """)
+
+        rows = self._db.execute("SELECT path, mtime, subdirs FROM dirs WHERE watch = ?", (self.key,)).fetchall()
+        self._dirs: Dict[str, Tuple[int, Tuple[str, ...]]] = {
+            path: (mtime, tuple(json.loads(subdirs))) for path, mtime, subdirs in rows
+        }
+        # Files still settling when the last run stopped start over
+        now = time.monotonic()
+        rows = self._db.execute(
+            "SELECT path, size, mtime FROM files WHERE watch = ? AND state = ?", (self.key, PENDING)
+        ).fetchall()
+        self._pending: Dict[str, _Settling] = {path: _Settling(size, mtime, now) for path, size, mtime in rows}
+
+    @property
+    def directories(self) -> List[str]:
+        """Every directory under the roots known so far, e.g. to subscribe to change notifications"""
+        with self._lock:
+            return list(self._dirs)
+
+    @property
+    def pending(self) -> int:
+        """Files waiting to stop growing"""
+        with self._lock:
+            return len(self._pending)
+
+    def scan(self, directories: Iterable[str] | None = None) -> None:
+        """Lists the changed directories under `directories`, by default the roots, new files start settling"""
+        stack = [os.path.abspath(directory) for directory in directories] if directories is not None else []
+        stack = stack or list(self.roots)
+        with self._lock:
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    # An unmounted root keeps its index, its files are not new when it comes back
+                    if directory not in self.roots:
+                        self._forget(directory)
+                    continue
+                known = self._dirs.get(directory)
+                if known is not None and known[0] == mtime:
+                    stack.extend(known[1])
+                    continue
+                # The time is read before listing, a change made meanwhile is listed on the next scan
+                stack.extend(self._list(directory, mtime))
+
+    def settled(self) -> List[str]:
+        """Files that kept their size and modification time for `settle` seconds, hand them to `handled`"""
+        now = time.monotonic()
+        ready: List[str] = []
+        with self._lock:
+            for path, settling in list(self._pending.items()):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    del self._pending[path]
+                    self._delete_files([path])
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) != (settling.size, settling.mtime):
+                    self._pending[path] = _Settling(stat.st_size, stat.st_mtime_ns, now)
+                elif stat.st_size and now - settling.since >= self.settle:
+                    ready.append(path)
+        return ready
+
+    def handled(self, paths: Iterable[str], queued: Collection[str]) -> None:
+        """Records settled `paths` as done with, those in `queued` were converted and the others ignored"""
+        with self._lock:
+            rows = []
+            for path in paths:
+                settling = self._pending.pop(path, None)
+                if settling is not None:
+                    state = QUEUED if path in queued else IGNORED
+                    rows.append((settling.size, settling.mtime, state, self.key, path))
+            with self._db:
+                self._db.executemany(
+                    "UPDATE files SET size = ?, mtime = ?, state = ? WHERE watch = ? AND path = ?", rows
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _list(self, directory: str, mtime: int) -> List[str]:
+        """Records the entries of a changed directory, returns its subdirectories"""
+        subdirs: List[str] = []
+        files: Dict[str, Tuple[int, int]] = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if _hidden(entry.name):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            if directory not in self.roots:
+                self._forget(directory)
+            return []
+
+        known = {
+            path: (size, file_mtime, state) for path, size, file_mtime, state in self._db.execute(
+                "SELECT path, size, mtime, state FROM files WHERE watch = ? AND dir = ?", (self.key, directory)
+            )
+        }
+        now = time.monotonic()
+        found = []
+        for path, (size, file_mtime) in files.items():
+            row = known.get(path)
+            if row is not None and (row[2] == PENDING or row[:2] == (size, file_mtime)):
+                continue
+            # New, or replaced by another file under the same name
+            found.append((self.key, path, directory, size, file_mtime, PENDING))
+            self._pending[path] = _Settling(size, file_mtime, now)
+
+        removed = [path for path in known if path not in files]
+        for path in removed:
+            self._pending.pop(path, None)
+        for subdir in self._dirs.get(directory, (0, ()))[1]:
+            if subdir not in subdirs:
+                self._forget(subdir)
+
+        self._dirs[directory] = (mtime, tuple(subdirs))
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", found)
+            self._db.executemany("DELETE FROM files WHERE watch = ? AND path = ?", [(self.key, p) for p in removed])
+            self._db.execute(
+                "INSERT OR REPLACE INTO dirs (watch, path, mtime, subdirs) VALUES (?, ?, ?, ?)",
+                (self.key, directory, mtime, json.dumps(subdirs)),
+            )
+        return subdirs
+
+    def _forget(self, directory: str) -> None:
+        """Drops a directory that disappeared, with everything below it"""
+        prefix = directory.rstrip(os.sep) + os.sep
+        for path in [path for path in self._dirs if path == directory or path.startswith(prefix)]:
+            del self._dirs[path]
+        for path in [path for path in self._pending if path.startswith(prefix)]:
+            del self._pending[path]
+        # Escaped for LIKE, paths may contain % and _
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._db:
+            self._db.execute(
+                "DELETE FROM dirs WHERE watch = ? AND (path = ? OR path LIKE ? ESCAPE '\\')",
+                (self.key, directory, pattern),
+            )
+            self._db.execute(
+                "DELETE FROM files WHERE watch = ? AND (dir = ? OR dir LIKE ? ESCAPE '\\')",
+                (self.key, directory, pattern),
+            )
+
+    def _delete_files(self, paths: List[str]) -> None:
+        with self._db:
+            self._db.executemany("DELETE FROM files WHERE watch = ? AND path = ?", [(self.key, p) for p in paths])
@@ -1,10 +1,28 @@
+import time
+
+started = time.perf_counter()
+
+from util import startup
+from util.system import is_startup_report_enabled
+
+if is_startup_report_enabled():
+    startup.begin(started)
+
 from PySide6.QtWidgets import QApplication
 
 app = QApplication([])
+startup.mark("QApplication")
 
 from pages.Main import Main
 
+startup.mark("imports")
+
 window = Main()
+startup.mark("window")
 window.show()
 
+if startup.enabled():
+    from util.ui import on_first_paint
+    on_first_paint(app, startup.finish)
+
 app.exec()
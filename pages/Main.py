@@ -1,10 +1,22 @@
+from typing import TYPE_CHECKING, List
+
 from PySide6.QtWidgets import QMainWindow, QVBoxLayout, QWidget
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 from components.FileInput import FileInput
-from components.converter.Converter import Converter
 from components.ui import Text
 from constant.File import File
+from util.ui import Task, run_in_background
+
+if TYPE_CHECKING:
+    from components.converter.Converter import Converter
+    from engine.Job import Job
+
+
+def _interrupted_jobs() -> List["Job"]:
+    from engine.Journal import get_journal
+    journal = get_journal()
+    return journal.unfinished() if journal is not None else []
 
 
 class Main(QMainWindow):
@@ -30,15 +42,45 @@ class Main(QMainWindow):
             size=10, wrap=True,
         ))
 
-        self.converter = Converter(parent=central, visible=False)
+        # The converter (forms, queue, engine) is only built once there is something to convert
+        self.converter: "Converter | None" = None
         self.fileInput = FileInput(parent=central)
+        self.fileInput.onFilesChange.connect(self._handleFilesSelected)
         self.fileInput.onChange.connect(self._handleFileSelected)
+        self.fileInput.onInfo.connect(lambda info: self._getConverter().setSourceInfo(info))
 
         layout.addWidget(self.fileInput)
-        layout.addWidget(self.converter, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.body = layout
 
         self.setCentralWidget(central)
 
+        # Looked up once the window is up, the journal is not needed for the first paint
+        self.interruptedTask: Task | None = None
+        QTimer.singleShot(0, self._checkInterrupted)
+
+    def _getConverter(self) -> "Converter":
+        if self.converter is None:
+            from components.converter.Converter import Converter
+            self.converter = Converter(parent=self.centralWidget(), visible=False)
+            self.body.addWidget(self.converter, alignment=Qt.AlignmentFlag.AlignCenter)
+        return self.converter
+
     def _handleFileSelected(self, path: str):
-        self.converter.select.setSource(File.from_path(path))
-        self.converter.show()
+        converter = self._getConverter()
+        converter.setInput(path)
+        converter.select.setSource(File.from_path(path, sniff=True))
+        converter.show()
+
+    def _handleFilesSelected(self, paths: list):
+        self._getConverter().setInputs(paths)
+
+    def _checkInterrupted(self):
+        self.interruptedTask = run_in_background(_interrupted_jobs, onDone=self._handleInterrupted)
+
+    def _handleInterrupted(self, jobs: List["Job"]):
+        self.interruptedTask = None
+        if not jobs:
+            return
+        converter = self._getConverter()
+        converter.setInterrupted(jobs)
+        converter.show()
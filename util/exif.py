@@ -0,0 +1,97 @@
+import struct
+import zlib
+from typing import BinaryIO
+
+# EXIF travels as an APP1 segment in JPEG and as an eXIf chunk in PNG, both hold the same TIFF structure
+_JPEG_EXIF_HEADER = b"Exif\x00\x00"
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_ORIENTATION_TAG = 0x0112
+
+
+def _read_jpeg(file: BinaryIO) -> bytes | None:
+    if file.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+            # End of image or start of the image data, metadata always comes before it
+            return None
+        length = struct.unpack(">H", file.read(2))[0]
+        if marker[1] == 0xE1:
+            segment = file.read(length - 2)
+            if segment.startswith(_JPEG_EXIF_HEADER):
+                return segment[len(_JPEG_EXIF_HEADER):]
+        else:
+            file.seek(length - 2, 1)
+
+
+def _read_png(file: BinaryIO) -> bytes | None:
+    if file.read(8) != _PNG_SIGNATURE:
+        return None
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            return None
+        length, kind = struct.unpack(">I4s", header)
+        if kind == b"eXIf":
+            return file.read(length)
+        if kind in (b"IDAT", b"IEND"):
+            return None
+        file.seek(length + 4, 1)  # Data and CRC
+
+
+def read_exif(path: str) -> bytes | None:
+    """TIFF-structured EXIF of a JPEG or PNG, reading only the headers before the image data"""
+    try:
+        with open(path, "rb") as file:
+            head = file.read(2)
+            file.seek(0)
+            if head == b"\xff\xd8":
+                return _read_jpeg(file)
+            if head == _PNG_SIGNATURE[:2]:
+                return _read_png(file)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def reset_orientation(exif: bytes) -> bytes:
+    """
+    Sets the orientation tag to "normal". For pixels that were already rotated upright,
+    which would otherwise be rotated a second time by viewers.
+    """
+    data = bytearray(exif)
+    try:
+        order = {b"II": "<", b"MM": ">"}[bytes(data[:2])]
+        ifd = struct.unpack_from(f"{order}I", data, 4)[0]
+        count = struct.unpack_from(f"{order}H", data, ifd)[0]
+        for i in range(count):
+            entry = ifd + 2 + i * 12
+            tag = struct.unpack_from(f"{order}H", data, entry)[0]
+            if tag == _ORIENTATION_TAG:
+                struct.pack_into(f"{order}H", data, entry + 8, 1)
+                break
+    except (KeyError, struct.error):
+        pass
+    return bytes(data)
+
+
+def insert_exif(image: bytes, exif: bytes) -> bytes:
+    """Returns the encoded JPEG or PNG `image` carrying `exif`, other formats are returned as they are"""
+    if image.startswith(b"\xff\xd8"):
+        segment = _JPEG_EXIF_HEADER + exif
+        if len(segment) + 2 > 0xFFFF:
+            return image
+        # After the start of image, and after a JFIF APP0 segment, which must come first by the JFIF convention
+        at = 2
+        if image[2:4] == b"\xff\xe0" and len(image) >= 6:
+            at = 4 + struct.unpack(">H", image[4:6])[0]
+        return image[:at] + b"\xff\xe1" + struct.pack(">H", len(segment) + 2) + segment + image[at:]
+
+    if image.startswith(_PNG_SIGNATURE):
+        # eXIf must come before the first IDAT, right after IHDR always is
+        ihdr_end = 8 + 8 + struct.unpack(">I", image[8:12])[0] + 4
+        chunk = struct.pack(">I", len(exif)) + b"eXIf" + exif + struct.pack(">I", zlib.crc32(b"eXIf" + exif))
+        return image[:ihdr_end] + chunk + image[ihdr_end:]
+
+    return image
@@ -0,0 +1,135 @@
+from typing import Dict, FrozenSet
+
+# Bytes read from the start of a file, enough for the ftyp box, Matroska EBML header and a few TS packets
+HEAD_SIZE = 4096
+
+_TS_PACKET = 188
+
+# ISO-BMFF (ftyp) brands, major brand first, then compatible brands
+_QUICKTIME_BRANDS: FrozenSet[bytes] = frozenset({b"qt  "})
+_MP4_BRANDS: FrozenSet[bytes] = frozenset({
+    b"isom", b"iso2", b"iso3", b"iso4", b"iso5", b"iso6", b"iso8", b"iso9",
+    b"mp41", b"mp42", b"mp71", b"avc1", b"hvc1", b"hev1", b"av01",
+    b"dash", b"M4V ", b"M4VH", b"M4VP", b"mmp4", b"MSNV", b"NDAS", b"XAVC", b"f4v ",
+})
+_BRANDS: Dict[bytes, str] = {
+    **{brand: "MOV" for brand in _QUICKTIME_BRANDS},
+    **{brand: "MP4" for brand in _MP4_BRANDS},
+    b"M4A ": "M4A",
+    b"M4B ": "M4A",
+    b"3gp4": "3GP", b"3gp5": "3GP", b"3gp6": "3GP", b"3g2a": "3GP",
+    b"heic": "HEIC", b"heix": "HEIC", b"mif1": "HEIC", b"msf1": "HEIC",
+    b"avif": "AVIF",
+}
+# Top level atoms of QuickTime files written without an ftyp box
+_QUICKTIME_ATOMS: FrozenSet[bytes] = frozenset({b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot"})
+
+_RIFF_FORMS: Dict[bytes, str] = {
+    b"AVI ": "AVI",
+    b"WEBP": "WEBP",
+    b"WAVE": "WAV",
+}
+
+_PREFIXES: Dict[bytes, str] = {
+    b"\x89PNG\r\n\x1a\n": "PNG",
+    b"\xff\xd8\xff": "JPEG",
+    b"GIF87a": "GIF",
+    b"GIF89a": "GIF",
+    b"\x00\x00\x01\xba": "MPEG",  # MPEG program stream pack header
+    b"\x00\x00\x01\xb3": "MPEG",  # MPEG-1/2 video sequence header
+    b"ID3": "MP3",  # ID3v2 tag in front of the MPEG audio frames
+}
+# Longest first, so a shorter prefix never shadows a longer one
+_PREFIX_LENGTHS = sorted({len(prefix) for prefix in _PREFIXES}, reverse=True)
+
+
+def _sniff_bmff(head: bytes) -> str | None:
+    box = head[4:8]
+    if box in _QUICKTIME_ATOMS:
+        return "MOV"
+    if box != b"ftyp":
+        return None
+
+    size = int.from_bytes(head[0:4], "big")
+    major = head[8:12]
+    if major in _BRANDS:
+        return _BRANDS[major]
+    # Unknown major brand, fall back to the first recognised compatible brand
+    for offset in range(16, min(size, len(head)) - 3, 4):
+        brand = head[offset:offset + 4]
+        if brand in _BRANDS:
+            return _BRANDS[brand]
+    return "MP4"
+
+
+def _sniff_matroska(head: bytes) -> str:
+    # The EBML DocType element (0x4282) holds "webm" or "matroska"
+    return "WEBM" if b"\x42\x82\x84webm" in head[:64] else "MKV"
+
+
+def _is_mpeg_audio(head: bytes) -> bool:
+    # Frame sync, then a layer other than the reserved 00 that ADTS (raw AAC) uses
+    return len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0 and head[1] & 0x06 != 0
+
+
+def _is_transport_stream(head: bytes) -> bool:
+    packets = len(head) // _TS_PACKET
+    return packets >= 2 and all(head[i * _TS_PACKET] == 0x47 for i in range(min(packets, 4)))
+
+
+def sniff(head: bytes) -> str | None:
+    """
+    Detects the container from the first bytes of a file.
+    Returns a format name such as MP4, MOV, MKV, AVI, MPEG, TS, M4A, MP3, PNG, JPEG or GIF, or None when unknown.
+    """
+    for length in _PREFIX_LENGTHS:
+        name = _PREFIXES.get(head[:length])
+        if name is not None:
+            return name
+
+    if head[:4] == b"RIFF":
+        return _RIFF_FORMS.get(head[8:12])
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return _sniff_matroska(head)
+    if len(head) >= 12:
+        name = _sniff_bmff(head)
+        if name is not None:
+            return name
+    if _is_transport_stream(head):
+        return "TS"
+    if _is_mpeg_audio(head):
+        return "MP3"
+    return None
+
+
+def moov_first(head: bytes) -> bool | None:
+    """
+    Whether the moov box (the index) of an ISO-BMFF file comes before its media data (mdat),
+    as in files written for streaming with `-movflags +faststart`. None when the head of the
+    file ends before either box, or it is not made of boxes.
+    """
+    offset = 0
+    while offset + 8 <= len(head):
+        size = int.from_bytes(head[offset:offset + 4], "big")
+        box = head[offset + 4:offset + 8]
+        if box == b"moov":
+            return True
+        if box == b"mdat":
+            return False
+        if size == 1 and offset + 16 <= len(head):
+            # 64-bit size following the box type
+            size = int.from_bytes(head[offset + 8:offset + 16], "big")
+        if size < 8:
+            # Up to the end of the file, or not a box at all
+            return None
+        offset += size
+    return None
+
+
+def sniff_file(path: str) -> str | None:
+    """Sniffs a file with a single small read, None when it is unreadable or unknown"""
+    try:
+        with open(path, "rb") as file:
+            return sniff(file.read(HEAD_SIZE))
+    except OSError:
+        return None
@@ -0,0 +1,79 @@
+import builtins
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# Startup timing, enabled through MEDIARAGE_STARTUP_REPORT. Imports are timed like `python -X importtime`:
+# cumulative time of each module's first import, and its self time without the modules it imported.
+
+_started: float = 0.0
+_marks: List[Tuple[str, float]] = []
+_imports: Dict[str, Tuple[float, float]] = {}  # Module -> (self, cumulative) seconds
+_stack: List[float] = []  # Time spent in nested imports, one entry per import in progress
+_original_import: Callable[..., Any] | None = None
+
+
+def _absolute(name: str, globals_: Dict[str, Any] | None, level: int) -> str:
+    if not level or not globals_ or not globals_.get("__package__"):
+        return name
+    base = globals_["__package__"].rsplit(".", level - 1)[0]
+    return f"{base}.{name}" if name else base
+
+
+def _timed_import(name: str, globals_: Dict[str, Any] | None = None, locals_: Any = None,
+                  fromlist: Any = (), level: int = 0) -> Any:
+    assert _original_import is not None
+    name = _absolute(name, globals_, level) if level else name
+    if name in sys.modules:
+        return _original_import(name, globals_, locals_, fromlist, 0)
+    _stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals_, locals_, fromlist, 0)
+    finally:
+        cumulative = time.perf_counter() - started
+        nested = _stack.pop()
+        if _stack:
+            _stack[-1] += cumulative
+        if name not in _imports:
+            _imports[name] = (cumulative - nested, cumulative)
+
+
+def begin(started: float) -> None:
+    """Starts timing, `started` is the perf_counter reading taken first thing in the entry point"""
+    global _started, _original_import
+    _started = started
+    if _original_import is None:
+        _original_import = builtins.__import__
+        builtins.__import__ = _timed_import
+
+
+def enabled() -> bool:
+    return _original_import is not None
+
+
+def mark(name: str) -> None:
+    """Records the time since start of a startup milestone"""
+    if enabled():
+        _marks.append((name, time.perf_counter() - _started))
+
+
+def report(limit: int = 25) -> str:
+    lines = ["Startup milestones (s since start):"]
+    lines += [f"  {elapsed:8.3f}  {name}" for name, elapsed in _marks]
+    lines.append(f"Slowest imports (ms), of {len(_imports)}:")
+    lines.append(f"  {'self':>8} {'cumulative':>10}  module")
+    slowest = sorted(_imports.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    lines += [f"  {own * 1000:8.1f} {cumulative * 1000:10.1f}  {name}" for name, (own, cumulative) in slowest]
+    return "\n".join(lines)
+
+
+def finish() -> None:
+    """Stops timing imports and prints the report to stderr"""
+    global _original_import
+    if _original_import is None:
+        return
+    builtins.__import__ = _original_import
+    _original_import = None
+    _marks.append(("first paint", time.perf_counter() - _started))
+    print(report(), file=sys.stderr, flush=True)
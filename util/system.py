@@ -1,4 +1,82 @@
 import os
+import shutil
+import sys
+from typing import Collection, Iterable, Iterator
+
 
 def get_home_directory() -> str:
-    return os.path.expanduser("~").__str__()
\ No newline at end of file
+    return os.path.expanduser("~").__str__()
+
+
+def get_cache_directory() -> str:
+    """Returns (and creates) the per-user cache directory, overridable through MEDIARAGE_CACHE_DIR"""
+    directory = os.environ.get("MEDIARAGE_CACHE_DIR")
+    if not directory:
+        if sys.platform == "win32":
+            base = os.environ.get("LOCALAPPDATA") or get_home_directory()
+        elif sys.platform == "darwin":
+            base = os.path.join(get_home_directory(), "Library", "Caches")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(get_home_directory(), ".cache")
+        directory = os.path.join(base, "mediarage")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def get_ffmpeg_path() -> str:
+    """Returns the ffmpeg binary, overridable through MEDIARAGE_FFMPEG"""
+    return os.environ.get("MEDIARAGE_FFMPEG") or shutil.which("ffmpeg") or "ffmpeg"
+
+
+def get_ffprobe_path() -> str:
+    """Returns the ffprobe binary, overridable through MEDIARAGE_FFPROBE"""
+    return os.environ.get("MEDIARAGE_FFPROBE") or shutil.which("ffprobe") or "ffprobe"
+
+
+def get_metrics_log_path() -> str | None:
+    """JSON-lines file receiving conversion metrics, set through MEDIARAGE_METRICS_LOG"""
+    return os.environ.get("MEDIARAGE_METRICS_LOG") or None
+
+
+def is_startup_report_enabled() -> bool:
+    """Whether the GUI prints its startup timing to stderr, set through MEDIARAGE_STARTUP_REPORT"""
+    return os.environ.get("MEDIARAGE_STARTUP_REPORT", "") not in ("", "0")
+
+
+def get_output_cache_limit() -> int:
+    """Bytes of converted outputs kept for reuse, in megabytes through MEDIARAGE_OUTPUT_CACHE_MB, 0 disables it"""
+    try:
+        return max(0, int(os.environ.get("MEDIARAGE_OUTPUT_CACHE_MB", 10 * 1024))) * 1024 * 1024
+    except ValueError:
+        return 10 * 1024 * 1024 * 1024
+
+
+def get_output_path(input_path: str, extension: str, reserved: Collection[str] = (),
+                    directory: str | None = None) -> str:
+    """
+    Returns a non-existing output path with the given extension, next to the input unless
+    `directory` is given. Paths in `reserved` are treated as taken, e.g. outputs of queued jobs.
+    """
+    input_directory, filename = os.path.split(input_path)
+    directory = directory or input_directory
+    stem, _ = os.path.splitext(filename)
+    extension = extension.lower().strip(".")
+
+    output = os.path.join(directory, f"{stem}.{extension}")
+    counter = 1
+    while output in reserved or os.path.exists(output):
+        output = os.path.join(directory, f"{stem} ({counter}).{extension}")
+        counter += 1
+    return output
+
+
+def walk_files(paths: Iterable[str]) -> Iterator[str]:
+    """Yields the given files, and the files found recursively in the given directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    yield os.path.join(root, filename)
+        elif os.path.isfile(path):
+            yield path
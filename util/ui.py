@@ -1,3 +1,7 @@
+from typing import Any, Callable
+
+from PySide6.QtCore import QEvent, QObject, QRunnable, QSize, QThreadPool, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader
 from PySide6.QtWidgets import QWidget
 
 
@@ -8,4 +12,81 @@ def reset_layout(widget: QWidget):
             child = old_layout.takeAt(0)
             if child.widget():
                 child.widget().setParent(None)
-        QWidget().setLayout(old_layout)  # Detach safely
\ No newline at end of file
+        QWidget().setLayout(old_layout)  # Detach safely
+
+
+class TaskSignals(QObject):
+    done = Signal(object)  # Return value
+    failed = Signal(object)  # Raised exception
+
+
+class Task(QRunnable):
+    """Runs a blocking call on a QThreadPool thread, results come back as queued signals"""
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self) -> None:
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:  # Reported to the GUI thread instead of dying silently in the pool
+            self.signals.failed.emit(e)
+            return
+        self.signals.done.emit(result)
+
+
+def run_in_background(
+        fn: Callable[..., Any], *args: Any,
+        onDone: Callable[[Any], None] | None = None,
+        onFailed: Callable[[Exception], None] | None = None,
+) -> Task:
+    """Starts `fn(*args)` on the global thread pool, keep a reference to the task until it signals"""
+    task = Task(fn, *args)
+    if onDone is not None:
+        task.signals.done.connect(onDone)
+    if onFailed is not None:
+        task.signals.failed.connect(onFailed)
+    QThreadPool.globalInstance().start(task)
+    return task
+
+
+def load_scaled_image(path: str, bounds: QSize) -> QImage:
+    """
+    Decodes an image at no more than `bounds`, keeping its aspect ratio.
+    Formats that support it (e.g. JPEG) decode straight at the smaller size, so an 8K
+    photo never sits in memory at full resolution. Safe off the GUI thread.
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > bounds.width() or size.height() > bounds.height()):
+        reader.setScaledSize(size.scaled(bounds, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"Cannot read {path}: {reader.errorString()}")
+    return image
+
+
+class _FirstPaint(QObject):
+    def __init__(self, target: QObject, callback: Callable[[], None]):
+        super().__init__(target)
+        self.target = target
+        self.callback = callback
+        target.installEventFilter(self)
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            self.target.removeEventFilter(self)
+            self.callback()
+        return False
+
+
+def on_first_paint(target: QObject, callback: Callable[[], None]) -> None:
+    """
+    Calls `callback` once, on the first paint event `target` sees. Pass the
+    QApplication to catch the first paint of any widget.
+    """
+    _FirstPaint(target, callback)